@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark assess_caption_quality against the previous four-pass implementation.
+
+Usage (from backend/):
+    python -m benchmarks.assess_quality
+    python -m benchmarks.assess_quality --sizes 10000 50000 100000 --repeat 10
+"""
+
+import argparse
+import random
+import timeit
+
+from src.assess_quality import (
+    assess_caption_quality,
+    count_no_punctuation,
+    count_overlapping_text,
+    count_short_segments,
+    count_unique_texts,
+)
+
+WORDS = "so we are going to look at how this works and why it matters today".split()
+
+
+def make_captions(size: int, seed: int = 0) -> list:
+    """Generates YouTube-like captions: mixed lengths, some repeats and overlaps."""
+    rng = random.Random(seed)
+    captions = []
+    start = 0.0
+    text = ""
+    for _ in range(size):
+        if captions and rng.random() < 0.1:
+            text = text + " " + rng.choice(WORDS)  # rolling auto-caption overlap
+        else:
+            text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 10)))
+            if rng.random() < 0.5:
+                text += rng.choice(".!?")
+        duration = rng.uniform(0.2, 4.0)
+        captions.append({"start": round(start, 2), "end": round(start + duration, 2), "text": text})
+        start += duration
+    return captions
+
+
+def four_pass_counts(captions: list) -> dict:
+    return {
+        "overlapping_count": count_overlapping_text(captions),
+        "short_segments": count_short_segments(captions),
+        "no_punctuation_count": count_no_punctuation(captions),
+        "unique_texts": count_unique_texts(captions),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'segments':>10} {'four-pass ms':>14} {'assess ms':>12} {'speedup':>8}")
+    for size in args.sizes:
+        captions = make_captions(size)
+
+        # Both must agree on every count
+        result = assess_caption_quality(captions)
+        for key, value in four_pass_counts(captions).items():
+            assert result[key] == value, (key, result[key], value)
+
+        four_pass = timeit.timeit(lambda: four_pass_counts(captions), number=args.repeat) / args.repeat
+        fused = timeit.timeit(lambda: assess_caption_quality(captions), number=args.repeat) / args.repeat
+        print(f"{size:>10} {four_pass * 1000:>14.1f} {fused * 1000:>12.1f} {four_pass / fused:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
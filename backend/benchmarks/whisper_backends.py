@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark transcription backends for speed and word error rate (WER).
+
+The first backend is the reference: its transcript is used to compute the WER
+of the others unless a reference transcript is given with --reference.
+
+Usage (from backend/):
+    python -m benchmarks.whisper_backends
+    python -m benchmarks.whisper_backends clip.mp4 --backends openai-whisper faster-whisper
+"""
+
+import argparse
+import glob
+import os
+import re
+import time
+
+# Every run transcribes from scratch: chunk cache hits from earlier runs
+# would be timed as transcription. Set before src.constants is imported.
+os.environ["CHUNK_CACHE_ENABLED"] = "0"
+
+from src.constants import TS_DIR, WHISPER_MODEL
+from src.whisper_infer import get_backend, transcribe_with_whisper
+
+
+def normalize_words(text: str) -> list:
+    """Lower-cases text and splits it into words, ignoring punctuation."""
+    return re.findall(r"[\w']+", text.lower())
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """Computes WER as the word-level edit distance over the reference length."""
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, start=1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, start=1):
+            current[j] = min(
+                previous[j] + 1,  # deletion
+                current[j - 1] + 1,  # insertion
+                previous[j - 1] + (ref_word != hyp_word),  # substitution
+            )
+        previous = current
+
+    return previous[-1] / len(ref)
+
+
+def get_media_duration(file_path: str) -> float:
+    import ffmpeg
+
+    probe = ffmpeg.probe(file_path)
+    return float(probe["format"]["duration"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*",
+                        help=f"Media files to transcribe (default: media in {TS_DIR}/)")
+    parser.add_argument("--backends", nargs="+",
+                        default=["openai-whisper", "faster-whisper"])
+    parser.add_argument("--model", default=WHISPER_MODEL)
+    parser.add_argument("--reference",
+                        help="Text file with the reference transcript (single input file only)")
+    args = parser.parse_args()
+
+    files = args.files or sorted(
+        glob.glob(os.path.join(TS_DIR, "*.mp4")) + glob.glob(os.path.join(TS_DIR, "*.m4a")))
+    if not files:
+        parser.error("No media files to benchmark")
+    if args.reference and len(files) > 1:
+        parser.error("--reference can only be used with a single input file")
+
+    print(f"{'backend':<16} {'file':<40} {'load s':>8} {'wall s':>8} {'RTF':>6} {'WER':>6}")
+    for file_path in files:
+        duration = get_media_duration(file_path)
+        reference = None
+        if args.reference:
+            with open(args.reference, "r", encoding="utf-8") as f:
+                reference = f.read()
+
+        for name in args.backends:
+            load_start = time.perf_counter()
+            backend = get_backend(name, args.model)
+            load_seconds = time.perf_counter() - load_start
+
+            start = time.perf_counter()
+            captions = transcribe_with_whisper(file_path, backend=backend)
+            wall_seconds = time.perf_counter() - start
+
+            text = " ".join(c["text"] for c in captions)
+            if reference is None:
+                reference = text
+            wer = word_error_rate(reference, text)
+
+            print(f"{name:<16} {os.path.basename(file_path):<40} "
+                  f"{load_seconds:>8.2f} {wall_seconds:>8.2f} "
+                  f"{wall_seconds / duration:>6.3f} {wer:>6.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,88 @@
-from fastapi import Body, FastAPI, File, UploadFile
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import Body, Depends, FastAPI, File, Form, Query, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 
+import src.caption_window as caption_window
 import src.server as server
+from src.admission import AdmissionRejected, set_client
+from src.cancellation import run_until_disconnected
+from src.cache import setup_cache_directory, sync_search_index
+from src.clips import CLIP_CACHE_CONTROL, CLIP_MEDIA_TYPE, get_clip_cache
+from src.constants import (
+    DEFAULT_CAPTION_LANGUAGE,
+    SCRATCH_SWEEP_INTERVAL,
+    SEARCH_MAX_PAGE_SIZE,
+    SEARCH_PAGE_SIZE,
+    WHISPER_UPGRADE_INTERVAL,
+)
+from src.http_cache import caption_response, conditional_captions, passthrough_response, variant_min_duration
+from src.log import setup_logging, shutdown_logging
+from src.metrics import render as render_metrics
+from src.peaks import get_peaks_window
+from src.responses import body_response
+from src.scratch import get_scratch_space
+from src.search import get_search_index
+from src.stages import run_stage
+from src.timing import ServerTimingMiddleware
+from src.whisper_infer import get_backend
+
+logger = logging.getLogger(__name__)
+
+
+async def run_upgrade_passes():
+    while True:
+        await asyncio.sleep(WHISPER_UPGRADE_INTERVAL)
+        try:
+            await server.upgrade_cached_transcriptions(limit=1)
+        except Exception:
+            logger.exception("Upgrade pass failed")
+
+
+async def run_scratch_sweeps():
+    while True:
+        await asyncio.sleep(SCRATCH_SWEEP_INTERVAL)
+        try:
+            await asyncio.to_thread(get_scratch_space().sweep_orphans)
+        except Exception:
+            logger.exception("Scratch sweep failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging()
+    setup_cache_directory()
+    # Load the configured transcription model once, before serving requests
+    get_backend()
+    # Remove temp files left behind by a previous crash
+    get_scratch_space().sweep_orphans()
+
+    tasks = [
+        asyncio.create_task(run_scratch_sweeps()),
+        # Index entries written while the search index was missing or offline
+        asyncio.create_task(asyncio.to_thread(sync_search_index)),
+    ]
+    if WHISPER_UPGRADE_INTERVAL > 0:
+        tasks.append(asyncio.create_task(run_upgrade_passes()))
+    yield
+    for task in tasks:
+        task.cancel()
+    shutdown_logging()
+
+
+async def identify_client(request: Request):
+    # Admission control shares Whisper capacity fairly between clients; the
+    # frontend may send a stable X-Client-Id, otherwise the address is used
+    client_id = request.headers.get("x-client-id")
+    if not client_id and request.client:
+        client_id = request.client.host
+    set_client(client_id or "unknown")
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, dependencies=[Depends(identify_client)])
 
 # Set up CORS to be reachable from frontend side
 app.add_middleware(
@@ -13,37 +92,196 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ServerTimingMiddleware)
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": str(exc), "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 
 @app.post("/transcribe")
-async def upload_video(file: UploadFile = File(...)):
-    return await server.upload_video(file)
+async def upload_video(
+    request: Request,
+    file: UploadFile = File(...),
+    subtitles: UploadFile = File(None),
+    min_duration: float = Form(2.5)
+):
+    return await caption_response(request, await run_until_disconnected(
+        server.upload_video(file, subtitles, min_duration), request.is_disconnected))
+
+
+@app.get("/transcribe-youtube")
+async def get_transcribe_youtube(request: Request, url: str, language: str = DEFAULT_CAPTION_LANGUAGE):
+    return await conditional_captions(
+        request, url, ("transcribe-youtube", language),
+        lambda: server.transcribe_youtube(url, language),
+        lambda: server.serves_from_cache(url, language))
 
 
 @app.post("/transcribe-youtube")
-async def transcribe_youtube(url: str = Body(..., embed=True)):
-    return await server.transcribe_youtube(url)
+async def transcribe_youtube(
+    request: Request,
+    url: str = Body(..., embed=True),
+    language: str = Body(DEFAULT_CAPTION_LANGUAGE, embed=True)
+):
+    view = server.open_cached_captions(url, language)
+    if view is not None:
+        return passthrough_response(request, view)
+    return await caption_response(request, await run_until_disconnected(
+        server.transcribe_youtube(url, language), request.is_disconnected))
+
+
+@app.get("/extract-youtube-captions")
+async def get_youtube_captions_only(request: Request, url: str, language: str = DEFAULT_CAPTION_LANGUAGE):
+    return await conditional_captions(
+        request, url, ("extract-youtube-captions", language),
+        lambda: server.extract_youtube_captions_only(url, language),
+        lambda: server.serves_from_cache(url, language, youtube_only=True))
 
 
 @app.post("/extract-youtube-captions")
-async def extract_youtube_captions_only(url: str = Body(..., embed=True)):
-    return await server.extract_youtube_captions_only(url)
+async def extract_youtube_captions_only(
+    request: Request,
+    url: str = Body(..., embed=True),
+    language: str = Body(DEFAULT_CAPTION_LANGUAGE, embed=True)
+):
+    view = server.open_cached_captions(url, language, youtube_only=True)
+    if view is not None:
+        return passthrough_response(request, view)
+    return await caption_response(request, await server.extract_youtube_captions_only(url, language))
+
+
+@app.get("/extract-youtube-captions-with-duration")
+async def get_youtube_captions_with_duration(
+    request: Request,
+    url: str,
+    min_duration: float = 2.5,
+    language: str = DEFAULT_CAPTION_LANGUAGE
+):
+    min_duration = variant_min_duration(min_duration)
+    return await conditional_captions(
+        request, url, ("extract-youtube-captions-with-duration", min_duration, language),
+        lambda: server.extract_youtube_captions_with_duration(url, min_duration, language),
+        lambda: server.serves_from_cache(url, language))
 
 
 @app.post("/extract-youtube-captions-with-duration")
 async def extract_youtube_captions_with_duration(
+    request: Request,
     url: str = Body(..., embed=True),
-    min_duration: float = Body(2.5, embed=True)
+    min_duration: float = Body(2.5, embed=True),
+    language: str = Body(DEFAULT_CAPTION_LANGUAGE, embed=True)
 ):
-    return await server.extract_youtube_captions_with_duration(url, min_duration)
+    return await caption_response(
+        request, await server.extract_youtube_captions_with_duration(url, min_duration, language))
+
+
+@app.get("/smart-extract-captions")
+async def get_smart_extract_captions(
+    request: Request,
+    url: str,
+    min_duration: float = 2.5,
+    language: str = DEFAULT_CAPTION_LANGUAGE
+):
+    min_duration = variant_min_duration(min_duration)
+    return await conditional_captions(
+        request, url, ("smart-extract-captions", min_duration, language),
+        lambda: server.smart_extract_captions(url, min_duration, language),
+        lambda: server.serves_from_cache(url, language))
 
 
 @app.post("/smart-extract-captions")
 async def smart_extract_captions(
+    request: Request,
     url: str = Body(..., embed=True),
-    min_duration: float = Body(2.5, embed=True)
+    min_duration: float = Body(2.5, embed=True),
+    language: str = Body(DEFAULT_CAPTION_LANGUAGE, embed=True)
+):
+    return await caption_response(request, await run_until_disconnected(
+        server.smart_extract_captions(url, min_duration, language), request.is_disconnected))
+
+
+@app.get("/caption-window")
+async def get_caption_window(
+    request: Request,
+    url: str,
+    start: float = 0.0,
+    end: float = None,
+    count: int = Query(None, ge=1),
+    language: str = DEFAULT_CAPTION_LANGUAGE,
+    min_duration: float = None
+):
+    if (end is None) == (count is None):
+        return {"error": "Give either end or count"}
+    if min_duration is not None:
+        min_duration = variant_min_duration(min_duration)
+    result = await asyncio.to_thread(
+        caption_window.get_caption_window, url, start, end, count, language, min_duration)
+    if isinstance(result, dict):
+        return JSONResponse(status_code=404, content=result)
+    return await asyncio.to_thread(body_response, result, request.headers.get("accept-encoding"))
+
+
+@app.get("/clip")
+async def get_clip(url: str, start: float, end: float):
+    # Range requests are answered by FileResponse, so players can seek and
+    # resume within a clip
+    result = await run_stage("network", get_clip_cache().get_clip, url, start, end)
+    if isinstance(result, dict):
+        return result
+    return FileResponse(result, media_type=CLIP_MEDIA_TYPE, headers={"Cache-Control": CLIP_CACHE_CONTROL})
+
+
+@app.get("/peaks")
+async def get_peaks(
+    request: Request,
+    url: str = None,
+    cache_key: str = Query(None, pattern="^[0-9a-f]{64}$"),
+    start: float = 0.0,
+    end: float = None
 ):
-    return await server.smart_extract_captions(url, min_duration)
+    # Uploads have no URL; their responses carry the cache key instead
+    if not url and not cache_key:
+        return JSONResponse(status_code=400, content={"error": "Give url or cache_key"})
+    result = await asyncio.to_thread(get_peaks_window, url, start, end, cache_key)
+    if result is None:
+        return JSONResponse(status_code=404, content={
+            "error": "No waveform for this media; it is computed when its audio is transcribed"})
+    return await caption_response(request, result)
+
+
+@app.get("/search")
+async def search_captions(
+    q: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=SEARCH_MAX_PAGE_SIZE)
+):
+    return await asyncio.to_thread(get_search_index().search, q, offset, limit)
+
+
+@app.post("/ingest")
+async def start_ingest(
+    urls: list[str] = Body(None, embed=True),
+    playlist_url: str = Body(None, embed=True),
+    min_duration: float = Body(2.5, embed=True),
+    language: str = Body(DEFAULT_CAPTION_LANGUAGE, embed=True)
+):
+    return await server.start_ingest(urls, playlist_url, min_duration, language)
+
+
+@app.get("/ingest/{job_id}")
+async def get_ingest_job(job_id: str):
+    return await server.get_ingest_job(job_id)
+
+
+@app.post("/cache/upgrade")
+async def upgrade_cached_transcriptions(limit: int = Body(1, embed=True)):
+    return await server.upgrade_cached_transcriptions(limit)
 
 
 @app.get("/cache/info")
@@ -59,3 +297,9 @@ async def clear_cache():
 @app.delete("/cache/{cache_key}")
 async def delete_cache_entry(cache_key: str):
     return await server.delete_cache_entry(cache_key)
+
+
+@app.get("/metrics")
+def get_metrics():
+    # Sync so the cache directory scan runs in the threadpool
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
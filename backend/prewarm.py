@@ -0,0 +1,174 @@
+"""Pre-populate the caption cache without going through the HTTP API.
+
+Usage (from backend/):
+    python prewarm.py --dir /path/to/media
+    python prewarm.py --urls course-urls.txt --workers 2
+
+Media files and URLs go through the same hashing, caption extraction, quality
+assessment and Whisper logic as /transcribe and /smart-extract-captions, in a
+pool of worker processes. Entries already in the cache are skipped, so an
+interrupted run is resumed by starting it again.
+
+Each worker loads its own Whisper model, and the CPU cores are split between
+the workers (WHISPER_CPU_THREADS and torch's intra-op threads), so more
+workers mostly overlap downloads with transcription rather than adding
+compute. A few workers are enough.
+"""
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+MEDIA_EXTENSIONS = (".mp4", ".m4a", ".mp3", ".wav", ".webm", ".mkv", ".mov", ".flac", ".ogg")
+
+DEFAULT_WORKERS = 2
+
+
+def threads_per_worker(workers: int) -> int:
+    """CPU threads each worker's model gets, so the workers together use every core once."""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def init_worker(threads: int):
+    """Limits a worker process's PyTorch threads to its share of the cores."""
+    try:
+        import torch
+    except ImportError:
+        return  # faster-whisper only; it reads WHISPER_CPU_THREADS
+    torch.set_num_threads(threads)
+
+
+def collect_media_files(directory: str) -> list:
+    """Media files under a directory, in a stable order."""
+    paths = []
+    for root, _dirs, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(MEDIA_EXTENSIONS):
+                paths.append(os.path.abspath(os.path.join(root, name)))
+    return sorted(paths)
+
+
+def read_url_list(path: str) -> list:
+    """URLs from a text file, one per line; blank lines and # comments are ignored."""
+    with open(path) as f:
+        urls = [line.split("#", 1)[0].strip() for line in f]
+    return list(dict.fromkeys(url for url in urls if url))
+
+
+def prewarm_item(kind: str, target: str, min_duration: float, language: str) -> dict:
+    """Caches one media file or URL. Runs in a worker process."""
+    from src.server import smart_extract_captions, transcribe_media_file
+
+    started = time.monotonic()
+    summary = {"kind": kind, "target": target, "status": "done", "method": None,
+               "media_seconds": 0.0, "error": None}
+    try:
+        if kind == "url":
+            result = asyncio.run(smart_extract_captions(target, min_duration, language))
+        else:
+            result = asyncio.run(transcribe_media_file(target, min_duration=min_duration))
+
+        if "error" in result:
+            summary["status"] = "failed"
+            summary["error"] = result["error"]
+        else:
+            if result.get("cached"):
+                summary["status"] = "skipped"
+            summary["method"] = result.get("method") or result["metadata"].get("method")
+            if result["captions"]:
+                summary["media_seconds"] = result["captions"][-1]["end"]
+    except Exception as e:
+        summary["status"] = "failed"
+        summary["error"] = str(e)
+
+    summary["seconds"] = time.monotonic() - started
+    return summary
+
+
+def run(items: list, workers: int, min_duration: float, language: str) -> dict:
+    """Processes (kind, target) items in a process pool, printing progress.
+
+    Returns:
+        dict: Counts per status and throughput figures for the run.
+    """
+    started = time.monotonic()
+    counts = {"done": 0, "skipped": 0, "failed": 0}
+    media_seconds = 0.0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(threads_per_worker(workers),)) as pool:
+        futures = [pool.submit(prewarm_item, kind, target, min_duration, language)
+                   for kind, target in items]
+        for n, future in enumerate(as_completed(futures), start=1):
+            summary = future.result()
+            counts[summary["status"]] += 1
+            if summary["status"] == "done":
+                media_seconds += summary["media_seconds"]
+
+            detail = summary["error"] or summary["method"] or ""
+            print(f"[{n}/{len(items)}] {summary['status']:<7} {summary['seconds']:6.1f}s "
+                  f"{summary['target']} {detail}")
+
+    elapsed = time.monotonic() - started
+    return {
+        "counts": counts,
+        "elapsed_seconds": elapsed,
+        "items_per_minute": len(items) / elapsed * 60 if elapsed else 0.0,
+        "media_seconds": media_seconds,
+        "realtime_factor": media_seconds / elapsed if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-populate the caption cache.")
+    parser.add_argument("--dir", help="directory of media files to transcribe")
+    parser.add_argument("--urls", help="text file with one YouTube URL per line")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"worker processes, each with its own model and a share of "
+                             f"the CPU cores (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--min-duration", type=float, default=2.5,
+                        help="min_duration used for smart extraction of URLs")
+    parser.add_argument("--language", default=None,
+                        help="caption language for URLs (default: DEFAULT_CAPTION_LANGUAGE)")
+    args = parser.parse_args()
+
+    if not args.dir and not args.urls:
+        parser.error("give --dir, --urls or both")
+
+    items = []
+    if args.dir:
+        items += [("file", path) for path in collect_media_files(args.dir)]
+    if args.urls:
+        items += [("url", url) for url in read_url_list(args.urls)]
+
+    # Set before src.constants is imported here, so workers inherit it
+    threads = threads_per_worker(args.workers)
+    os.environ.setdefault("WHISPER_CPU_THREADS", str(threads))
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+
+    # Cache and scratch paths are relative to backend/, as for the API server
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    from src.cache import setup_cache_directory
+    from src.constants import DEFAULT_CAPTION_LANGUAGE
+    setup_cache_directory()
+
+    print(f"Pre-warming {len(items)} items with {args.workers} workers, "
+          f"{threads} CPU threads each")
+    try:
+        stats = run(items, args.workers, args.min_duration,
+                    args.language or DEFAULT_CAPTION_LANGUAGE)
+    except KeyboardInterrupt:
+        print("Interrupted; run again to resume from the cache")
+        raise SystemExit(130)
+
+    counts = stats["counts"]
+    print(f"Done: {counts['done']} cached now, {counts['skipped']} already cached, "
+          f"{counts['failed']} failed in {stats['elapsed_seconds']:.1f}s")
+    print(f"Throughput: {stats['items_per_minute']:.1f} items/min, "
+          f"{stats['media_seconds'] / 60:.1f} min of media "
+          f"({stats['realtime_factor']:.1f}x realtime)")
+
+
+if __name__ == "__main__":
+    main()
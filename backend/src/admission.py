@@ -0,0 +1,159 @@
+import asyncio
+import contextvars
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from src.constants import WHISPER_MAX_ACTIVE, WHISPER_MAX_PER_CLIENT, WHISPER_MAX_QUEUED
+from src.metrics import Gauge
+from src.timing import span
+
+# Client making the current request, set per request by main.py
+_client_id = contextvars.ContextVar("client_id", default="local")
+
+
+def set_client(client_id: str):
+    _client_id.set(client_id)
+
+
+def get_client() -> str:
+    return _client_id.get()
+
+
+class AdmissionRejected(Exception):
+    """New Whisper work was refused; main.py turns this into a 429/503 response."""
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounds how much Whisper work (download, temp file, transcription) runs at once.
+
+    At most max_active jobs hold a slot and at most max_queued wait for one;
+    beyond that new work is rejected with 503. A client may have at most
+    max_per_client jobs admitted or waiting (429 beyond that), and freed slots
+    go to waiting clients in round-robin order, so one client's burst cannot
+    monopolize the workers. Callers with wait=True (batch ingestion) skip both
+    limits and always wait their turn; they count toward neither, so a large
+    batch never makes interactive requests look over the queue or client
+    limits.
+    """
+
+    def __init__(self,
+                 max_active: int = WHISPER_MAX_ACTIVE,
+                 max_queued: int = WHISPER_MAX_QUEUED,
+                 max_per_client: int = WHISPER_MAX_PER_CLIENT,
+                 initial_job_seconds: float = 30.0,
+                 smoothing: float = 0.3):
+        self.max_active = max(1, max_active)
+        self.max_queued = max_queued
+        self.max_per_client = max(1, max_per_client)
+        self.smoothing = smoothing
+        self.active = 0
+        self._job_seconds = initial_job_seconds
+        self._waiting = OrderedDict()  # client -> deque of futures, in turn order
+        self._per_client = {}
+        self._background = set()  # futures of wait=True callers
+
+    def queued(self, background: bool = True) -> int:
+        """Jobs waiting for a slot, including wait=True ones unless background=False."""
+        return sum(1 for waiters in self._waiting.values() for future in waiters
+                   if background or future not in self._background)
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to be free for a new job."""
+        rounds = (self.queued() + 1) / self.max_active
+        return max(1, math.ceil(self._job_seconds * rounds))
+
+    def _check(self, client: str):
+        if self._per_client.get(client, 0) >= self.max_per_client:
+            raise AdmissionRejected(
+                f"Too many transcriptions in progress for this client (max {self.max_per_client})",
+                429, self.retry_after())
+        if self.active >= self.max_active and self.queued(background=False) >= self.max_queued:
+            raise AdmissionRejected("Transcription queue is full", 503, self.retry_after())
+
+    @asynccontextmanager
+    async def admit(self, client: str = None, wait: bool = False):
+        """Holds a Whisper slot for the duration of the block.
+
+        Raises:
+            AdmissionRejected: When the queue or the client's share is full.
+        """
+        client = client or get_client()
+        if not wait:
+            self._check(client)
+            self._per_client[client] = self._per_client.get(client, 0) + 1
+        try:
+            if self.active < self.max_active and not self._waiting:
+                self.active += 1
+            else:
+                await self._wait_for_slot(client, background=wait)
+
+            started = time.monotonic()
+            try:
+                yield
+            finally:
+                elapsed = time.monotonic() - started
+                self._job_seconds += self.smoothing * (elapsed - self._job_seconds)
+                self._release()
+        finally:
+            if not wait:
+                self._per_client[client] -= 1
+                if not self._per_client[client]:
+                    del self._per_client[client]
+
+    async def _wait_for_slot(self, client: str, background: bool = False):
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(client, deque()).append(future)
+        if background:
+            self._background.add(future)
+        try:
+            with span("admission_wait"):
+                await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just before the cancellation
+                self._release()
+            else:
+                self._forget(client, future)
+            raise
+        finally:
+            self._background.discard(future)
+
+    def _forget(self, client: str, future):
+        waiters = self._waiting.get(client)
+        if waiters and future in waiters:
+            waiters.remove(future)
+            if not waiters:
+                del self._waiting[client]
+
+    def _release(self):
+        # Hand the slot straight to the next client in turn, or free it
+        while self._waiting:
+            client, waiters = next(iter(self._waiting.items()))
+            future = waiters.popleft()
+            if waiters:
+                self._waiting.move_to_end(client)
+            else:
+                del self._waiting[client]
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+_controller = AdmissionController()
+
+Gauge("shadowing_whisper_admitted_jobs", "Whisper jobs holding an admission slot",
+      lambda: _controller.active)
+Gauge("shadowing_whisper_queued_jobs", "Whisper jobs waiting for an admission slot",
+      lambda: _controller.queued())
+
+
+def get_admission_controller() -> AdmissionController:
+    return _controller
@@ -1,3 +1,10 @@
+from operator import itemgetter
+
+import numpy as np
+
+from src.timing import timed
+
+
 def count_overlapping_text(captions: list) -> int:
     """Counts the number of overlapping text segments in a list of captions.
     
@@ -68,6 +75,53 @@ def count_unique_texts(captions: list) -> int:
             unique_texts.add(text)
     return len(unique_texts)
 
+def scan_captions(captions: list) -> dict:
+    """Computes all per-caption quality counts in a single pass.
+
+    Gives the same results as count_overlapping_text, count_short_segments,
+    count_no_punctuation and count_unique_texts, but strips and lower-cases
+    each text once and checks durations over NumPy start/end arrays.
+
+    Args:
+        captions (list): A list of captions.
+
+    Returns:
+        dict: "overlapping_count", "short_segments", "no_punctuation_count"
+            and "unique_texts".
+    """
+    overlapping_count = 0
+    no_punctuation_count = 0
+    unique_texts = set()
+    prev_text = None
+
+    for caption in captions:
+        text = caption["text"].strip()
+        lowered = text.lower()
+
+        # Current text starts with the previous text (overlap)
+        if prev_text is not None and len(prev_text) > 10 and lowered.startswith(prev_text):
+            overlapping_count += 1
+        prev_text = lowered
+
+        if text and "." not in text and "!" not in text and "?" not in text:
+            no_punctuation_count += 1
+
+        if len(lowered) > 5:  # Only count meaningful text
+            unique_texts.add(lowered)
+
+    count = len(captions)
+    starts = np.fromiter(map(itemgetter("start"), captions), dtype=np.float64, count=count)
+    ends = np.fromiter(map(itemgetter("end"), captions), dtype=np.float64, count=count)
+
+    return {
+        "overlapping_count": overlapping_count,
+        "short_segments": int(np.count_nonzero(ends - starts < 1.0)),
+        "no_punctuation_count": no_punctuation_count,
+        "unique_texts": len(unique_texts),
+    }
+
+
+@timed("quality")
 def assess_caption_quality(captions: list) -> dict:
     """Assesses the quality of YouTube captions.
 
@@ -88,22 +142,23 @@ def assess_caption_quality(captions: list) -> dict:
 
     issues = []
     quality_score = 100
+    counts = scan_captions(captions)
 
     # Check for overlapping text (same text in consecutive segments)
-    overlapping_count = count_overlapping_text(captions)
+    overlapping_count = counts["overlapping_count"]
     if overlapping_count > 0:
         quality_score -= overlapping_count * 20
         issues.append(f"Found {overlapping_count} overlapping segments")
 
     # Check for very short segments (likely poor segmentation)
-    short_segments = count_short_segments(captions)
+    short_segments = counts["short_segments"]
     if short_segments > len(captions) * 0.3:  # More than 30% are very short
         quality_score -= 30
         issues.append(
             f"Too many short segments: {short_segments}/{len(captions)}")
 
     # Check for missing punctuation (indicates poor transcription)
-    no_punctuation_count = count_no_punctuation(captions)
+    no_punctuation_count = counts["no_punctuation_count"]
     if no_punctuation_count > len(
             captions) * 0.5:  # More than 50% lack punctuation
         quality_score -= 25
@@ -112,7 +167,7 @@ def assess_caption_quality(captions: list) -> dict:
         )
 
     # Check for repetitive text
-    unique_texts = count_unique_texts(captions)
+    unique_texts = counts["unique_texts"]
     if unique_texts < len(captions) * 0.7:  # Less than 70% unique content
         quality_score -= 20
         issues.append(
@@ -132,3 +187,53 @@ def assess_caption_quality(captions: list) -> dict:
         "no_punctuation_count": no_punctuation_count,
         "unique_texts": unique_texts,
     }
+
+
+def assess_caption_windows(captions: list, window_seconds: float = 60.0) -> list:
+    """Assesses caption quality separately for each fixed-length time window.
+
+    Captions are assigned to the window their start time falls in; empty
+    windows are skipped.
+
+    Args:
+        captions (list): A list of captions.
+        window_seconds (float): Length of each window in seconds.
+
+    Returns:
+        list: One assess_caption_quality() dict per window, with the window's
+            "start" and "end" (bounds of its captions) added.
+    """
+    windows = {}
+    for caption in captions:
+        index = int(caption["start"] // window_seconds)
+        windows.setdefault(index, []).append(caption)
+
+    assessments = []
+    for index in sorted(windows):
+        window_captions = windows[index]
+        assessment = assess_caption_quality(window_captions)
+        assessment["start"] = window_captions[0]["start"]
+        assessment["end"] = max(c["end"] for c in window_captions)
+        assessments.append(assessment)
+    return assessments
+
+
+def poor_quality_ranges(window_assessments: list) -> list:
+    """Merges adjacent windows that recommend Whisper into time ranges.
+
+    Args:
+        window_assessments (list): Output of assess_caption_windows().
+
+    Returns:
+        list: (start, end) tuples in seconds, in time order.
+    """
+    ranges = []
+    previous_poor = False
+    for assessment in window_assessments:
+        if assessment["recommend_whisper"]:
+            if previous_poor:
+                ranges[-1] = (ranges[-1][0], max(ranges[-1][1], assessment["end"]))
+            else:
+                ranges.append((assessment["start"], assessment["end"]))
+        previous_poor = assessment["recommend_whisper"]
+    return ranges
@@ -0,0 +1,104 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from src.constants import WHISPER_BATCH_MAX_WAIT_MS, WHISPER_BATCH_SIZE
+from src.metrics import Gauge
+
+
+class BatchScheduler:
+    """Gathers concurrently queued audio windows into batched backend passes.
+
+    Callers submit windows of at most 30 seconds and get a Future back. A single
+    worker thread takes the first queued window, waits up to max_wait_ms for
+    more to arrive (or until max_batch_size is reached), runs them through
+    backend.transcribe_batch() in one encoder/decoder pass and resolves each
+    Future with its own segments.
+    """
+
+    def __init__(self,
+                 backend,
+                 max_batch_size: int = WHISPER_BATCH_SIZE,
+                 max_wait_ms: int = WHISPER_BATCH_MAX_WAIT_MS):
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, audio) -> Future:
+        """Queues a window of 16 kHz mono samples for transcription.
+
+        Returns:
+            Future: Resolves to the window's segments, timed from its start.
+        """
+        future = Future()
+        self._queue.put((audio, future))
+        self._ensure_worker()
+        return future
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="whisper-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Skip windows whose request was cancelled while they were queued
+            batch = [(audio, future) for audio, future in self._collect_batch()
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            futures = [future for _, future in batch]
+            try:
+                results = self.backend.transcribe_batch([audio for audio, _ in batch])
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            if len(results) != len(futures):
+                e = RuntimeError(f"Backend returned {len(results)} results for a batch of {len(futures)}")
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            for future, segments in zip(futures, results):
+                future.set_result(segments)
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+Gauge("shadowing_whisper_batch_queue_depth", "Audio windows waiting for a batched Whisper pass",
+      lambda: sum(scheduler.queue_depth() for scheduler in list(_schedulers.values())))
+
+
+def get_scheduler(backend) -> BatchScheduler:
+    """Returns the shared scheduler for a backend instance."""
+    with _schedulers_lock:
+        scheduler = _schedulers.get(id(backend))
+        if scheduler is None or scheduler.backend is not backend:
+            scheduler = BatchScheduler(backend)
+            _schedulers[id(backend)] = scheduler
+        return scheduler
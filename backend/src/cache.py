@@ -1,13 +1,39 @@
 import hashlib
 import json
+import logging
+import mmap
 import os
+import re
+import shutil
+import time
 import uuid
 
-from src.constants import CACHE_DIR
+import numpy as np
+
+from src.constants import (
+    CACHE_DIR,
+    CAPTION_INDEX_DIR,
+    CAPTION_PIPELINE_VERSION,
+    CHUNK_CACHE_DIR,
+    CLIP_CACHE_DIR,
+    DEFAULT_CAPTION_LANGUAGE,
+    NEGATIVE_CACHE_DIR,
+    NEGATIVE_CACHE_TTLS,
+    PEAKS_CACHE_DIR,
+    RESPONSE_CACHE_DIR,
+    RESPONSE_VARIANTS_PER_ENTRY,
+)
+from src.metrics import Gauge
+from src.search import get_search_index
+from src.timing import timed
+
+logger = logging.getLogger(__name__)
 
 
 def setup_cache_directory():
     os.makedirs(CACHE_DIR, exist_ok=True)
+    os.makedirs(CHUNK_CACHE_DIR, exist_ok=True)
+    os.makedirs(NEGATIVE_CACHE_DIR, exist_ok=True)
 
 
 def get_cache_key(url: str = None, file_hash: str = None) -> str:
@@ -18,6 +44,25 @@ def get_cache_key(url: str = None, file_hash: str = None) -> str:
     else:
         raise ValueError("Either url or file_hash must be provided")
 
+
+# Entries start with their version (cached_at) and the byte lengths of their
+# metadata and captions, which are written first, so hits can send the
+# captions without parsing the entry (lengths are space-padded to a fixed
+# width, as JSON numbers cannot have leading zeros)
+_ENTRY_HEADER = b'{"layout":2,"cached_at":"%s","metadata_bytes":%10d,"captions_bytes":%10d,"metadata":'
+_ENTRY_HEADER_PATTERN = re.compile(
+    rb'\{"layout":2,"cached_at":"([0-9a-f-]{36})","metadata_bytes": *(\d+),"captions_bytes": *(\d+),"metadata":')
+_CAPTIONS_KEY = b',"captions":'
+_LAYOUT_FIELDS = ("layout", "metadata_bytes", "captions_bytes")
+
+# Per-caption start and end times and byte ranges within the captions array
+CAPTION_INDEX_DTYPE = np.dtype([("start", "<f8"), ("end", "<f8"), ("offset", "<i8"), ("length", "<i8")])
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
 def get_cache_path(cache_key: str) -> str:
     return os.path.join(CACHE_DIR, f"{cache_key}.json")
 
@@ -25,27 +70,304 @@ def is_cached(cache_key: str) -> bool:
     return os.path.exists(get_cache_path(cache_key))
 
 
+def get_entry_etag(cache_key: str, *variant) -> str:
+    """Strong ETag for one representation of a cache entry, or None if it is not cached.
+
+    The entry file's size and modification time stand in for its content, so
+    validating a request costs a single stat(). `variant` holds everything
+    else the response depends on (endpoint, merge parameters, language).
+    """
+    try:
+        stat = os.stat(get_cache_path(cache_key))
+    except FileNotFoundError:
+        return None
+    parts = [CAPTION_PIPELINE_VERSION, cache_key, stat.st_mtime_ns, stat.st_size, *variant]
+    return '"' + hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()[:32] + '"'
+
+
+@timed("cache_write")
 def save_to_cache(cache_key: str,
                   captions: list,
-                  metadata: dict = None) -> None:
+                  metadata: dict = None,
+                  words: dict = None,
+                  tracks: dict = None) -> None:
+    """Save captions to the cache.
+
+    words are the packed word timings from segmentation.pack_words(); when
+    present, any segmentation can be rebuilt from the entry without Whisper.
+    tracks map language codes to the original subtitle captions of a video;
+    when not given, those of an existing entry are kept, so re-saving the
+    captions of one language never drops the others.
+    Entries are written without indentation to keep word arrays compact.
+    """
+    if tracks is None and is_cached(cache_key):
+        tracks = load_from_cache(cache_key).get("tracks")
+
+    cached_at = str(uuid.uuid4())
+    rest = {}
+    if words:
+        rest["words"] = words
+    if tracks:
+        rest["tracks"] = tracks
+
+    metadata_bytes = _dumps(metadata)
+    # Serialized caption by caption to record where each one is in the array
+    caption_bytes = [_dumps(caption) for caption in captions]
+    captions_bytes = b"[" + b",".join(caption_bytes) + b"]"
+    body = b"".join([
+        _ENTRY_HEADER % (cached_at.encode(), len(metadata_bytes), len(captions_bytes)),
+        metadata_bytes,
+        _CAPTIONS_KEY,
+        captions_bytes,
+        b"," + _dumps(rest)[1:] if rest else b"}",
+    ])
+
+    # The index of the new version is in place before the entry refers to it
+    save_caption_index(cache_key, cached_at, captions, caption_bytes)
+
+    # Replaced atomically: readers streaming the old file keep its inode
     cache_path = get_cache_path(cache_key)
-    with open(cache_path, "w") as f:
-        json.dump(
-            {
-                "captions": captions,
-                "metadata": metadata,
-                "cached_at": str(uuid.uuid4())
-            },
-            f,
-            ensure_ascii=False,
-            indent=2,
-        )
+    tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(body)
+    os.replace(tmp_path, cache_path)
+    # Responses and indexes of the previous version of the entry are stale
+    delete_response_variants(cache_key)
+    delete_caption_indexes(cache_key, keep=cached_at)
+    get_search_index().update(cache_key, captions, metadata, cached_at)
+
+
+def serves_language(cached_data: dict, language: str) -> bool:
+    """Whether an entry's captions are the ones to serve for `language`.
+
+    Whisper transcribes whatever is spoken, so its entries serve every
+    language; caption entries serve the language they were made for
+    (English for entries written before languages were recorded).
+    """
+    metadata = cached_data.get("metadata") or {}
+    if metadata.get("method") == "whisper_transcription":
+        return True
+    return metadata.get("language", DEFAULT_CAPTION_LANGUAGE) == language
+
 
+def get_caption_index_path(cache_key: str, cached_at: str) -> str:
+    return os.path.join(CAPTION_INDEX_DIR, cache_key, f"{cached_at}.npy")
 
+
+def save_caption_index(cache_key: str, cached_at: str, captions: list, caption_bytes: list) -> None:
+    """Stores the start-time index of one version of an entry's captions.
+
+    Nothing is stored when the captions are not in start-time order, since
+    a window of them would then not be one byte range; such entries are
+    windowed from the decoded captions instead.
+    """
+    index = np.empty(len(captions), dtype=CAPTION_INDEX_DTYPE)
+    index["start"] = [caption["start"] for caption in captions]
+    index["end"] = [caption["end"] for caption in captions]
+    index["length"] = [len(data) for data in caption_bytes]
+    # Each caption follows the array's "[" or the previous caption and a ","
+    index["offset"] = np.cumsum(index["length"] + 1) - index["length"]
+    if np.any(np.diff(index["start"]) < 0):
+        return
+
+    path = get_caption_index_path(cache_key, cached_at)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, "wb") as f:
+        np.save(f, index)
+    os.replace(temp_path, path)
+
+
+def load_caption_index(cache_key: str, cached_at: str):
+    """The start-time index of an entry version, or None if none was stored."""
+    try:
+        return np.load(get_caption_index_path(cache_key, cached_at))
+    except (OSError, ValueError):
+        return None
+
+
+def delete_caption_indexes(cache_key: str, keep: str = None) -> None:
+    """Removes the indexes of an entry, except that of version `keep`."""
+    directory = os.path.join(CAPTION_INDEX_DIR, cache_key)
+    if keep is None:
+        shutil.rmtree(directory, ignore_errors=True)
+        return
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if not name.startswith(keep):
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+@timed("cache_read")
 def load_from_cache(cache_key: str) -> dict:
     cache_path = get_cache_path(cache_key)
     with open(cache_path, "r") as f:
-        return json.load(f)
+        entry = json.load(f)
+    for field in _LAYOUT_FIELDS:
+        entry.pop(field, None)
+    return entry
+
+
+class CaptionsView:
+    """An open cache entry whose captions are sent as stored, without decoding.
+
+    The metadata is decoded (it is small); the captions are read in chunks
+    straight from a memory map of the entry file.
+    """
+
+    def __init__(self, file, cached_at: str, metadata_bytes: bytes, captions_offset: int, captions_length: int):
+        self.file = file
+        self.cached_at = cached_at
+        self.metadata_bytes = metadata_bytes
+        self.metadata = json.loads(metadata_bytes) or {}
+        self.captions_offset = captions_offset
+        self.captions_length = captions_length
+
+    def iter_captions(self, chunk_size: int = 256 * 1024):
+        """Yields the captions JSON array as stored, chunk_size bytes at a time."""
+        with mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            end = self.captions_offset + self.captions_length
+            for start in range(self.captions_offset, end, chunk_size):
+                yield mapped[start:min(start + chunk_size, end)]
+
+    def read_captions(self, start: int, stop: int) -> bytes:
+        """Bytes start:stop of the stored captions array."""
+        self.file.seek(self.captions_offset + start)
+        return self.file.read(stop - start)
+
+    def close(self):
+        self.file.close()
+
+
+def open_captions_view(cache_key: str):
+    """Opens a cache entry for serving its captions as stored.
+
+    Returns:
+        CaptionsView: The open entry, or None if it is not cached or was
+            written before entries recorded where their captions are.
+    """
+    try:
+        f = open(get_cache_path(cache_key), "rb")
+    except FileNotFoundError:
+        return None
+    try:
+        match = _ENTRY_HEADER_PATTERN.match(f.read(len(_ENTRY_HEADER % (b"0" * 36, 0, 0))))
+        if match is None:
+            f.close()
+            return None
+        cached_at = match.group(1).decode()
+        metadata_length, captions_length = int(match.group(2)), int(match.group(3))
+        metadata_bytes = f.read(metadata_length)
+        captions_offset = match.end() + metadata_length + len(_CAPTIONS_KEY)
+        return CaptionsView(f, cached_at, metadata_bytes, captions_offset, captions_length)
+    except (OSError, ValueError):
+        f.close()
+        return None
+
+
+def get_negative_cache_path(cache_key: str) -> str:
+    return os.path.join(NEGATIVE_CACHE_DIR, f"{cache_key}.json")
+
+
+def _load_negative_records(cache_key: str) -> dict:
+    try:
+        with open(get_negative_cache_path(cache_key), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _negative_record_key(reason: str, language: str = None) -> str:
+    return reason if language is None else f"{reason}:{language}"
+
+
+def save_negative_result(cache_key: str,
+                         reason: str,
+                         error: str,
+                         detail: str = None,
+                         ttl: int = None,
+                         language: str = None) -> None:
+    """Remember that a lookup failed, so retries skip straight past it.
+
+    Args:
+        cache_key (str): Cache key of the URL or file.
+        reason (str): One of NEGATIVE_CACHE_TTLS, e.g. "no_captions".
+        error (str): Error message to return on later hits.
+        detail (str): Optional error detail.
+        ttl (int): Seconds to keep the record. Defaults to the reason's TTL.
+        language (str): Caption language the failure is about, for failures
+            that do not hold for the video's other languages.
+    """
+    ttl = ttl if ttl is not None else NEGATIVE_CACHE_TTLS[reason]
+    records = _load_negative_records(cache_key)
+    records[_negative_record_key(reason, language)] = {
+        "error": error, "detail": detail, "expires_at": time.time() + ttl}
+
+    os.makedirs(NEGATIVE_CACHE_DIR, exist_ok=True)
+    with open(get_negative_cache_path(cache_key), "w") as f:
+        json.dump(records, f, ensure_ascii=False)
+
+
+@timed("cache_read")
+def get_negative_result(cache_key: str, reason: str, language: str = None):
+    """Return the unexpired negative record {"error", "detail", "expires_at"} for a reason
+    (and language, see save_negative_result), or None"""
+    record = _load_negative_records(cache_key).get(_negative_record_key(reason, language))
+    if record and record["expires_at"] > time.time():
+        return record
+    return None
+
+
+def delete_negative_results(cache_key: str) -> None:
+    path = get_negative_cache_path(cache_key)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def iter_cache_entries():
+    """Yield (cache_key, entry) for every readable cache entry"""
+    for cache_file in os.listdir(CACHE_DIR):
+        if not cache_file.endswith('.json'):
+            continue
+        cache_key = cache_file[:-len('.json')]
+        try:
+            yield cache_key, load_from_cache(cache_key)
+        except (OSError, ValueError) as e:
+            logger.warning("Skipping unreadable cache entry %s: %s", cache_key, e)
+
+
+def sync_search_index() -> dict:
+    """Brings the search index and caption indexes in line with the entries in CACHE_DIR.
+
+    Entries removed other than through delete_cache_entry (by hand, or by
+    an older version) leave search rows and index directories behind;
+    both are dropped here.
+    """
+    try:
+        cache_keys = [f[:-len(".json")] for f in os.listdir(CACHE_DIR) if f.endswith(".json")]
+    except FileNotFoundError:
+        cache_keys = []
+    result = get_search_index().sync(cache_keys, load_from_cache)
+    if result["added"] or result["removed"]:
+        logger.info("Search index synced: %d entries added, %d removed", result["added"], result["removed"])
+
+    try:
+        indexed_keys = os.listdir(CAPTION_INDEX_DIR)
+    except FileNotFoundError:
+        indexed_keys = []
+    orphans = set(indexed_keys) - set(cache_keys)
+    for cache_key in orphans:
+        delete_caption_indexes(cache_key)
+    if orphans:
+        logger.info("Removed caption indexes of %d deleted entries", len(orphans))
+    result["pruned_indexes"] = len(orphans)
+    return result
 
 
 def get_file_hash(file_path: str) -> str:
@@ -57,6 +379,128 @@ def get_file_hash(file_path: str) -> str:
     return hash_sha256.hexdigest()
 
 
+def delete_clips(cache_key: str) -> None:
+    """Removes the stored audio clips of an entry's video (see src/clips.py)."""
+    try:
+        names = os.listdir(CLIP_CACHE_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.startswith(f"{cache_key}_"):
+            try:
+                os.remove(os.path.join(CLIP_CACHE_DIR, name))
+            except FileNotFoundError:
+                pass
+
+
+def get_peaks_path(cache_key: str) -> str:
+    """Path of the waveform peaks of a cache entry's audio (see src/peaks.py)."""
+    return os.path.join(PEAKS_CACHE_DIR, f"{cache_key}.npy")
+
+
+def get_chunk_key(samples, model_id: str) -> str:
+    """Generate a chunk cache key from decoded PCM samples and the model that
+    transcribes them, so different models never share chunk results."""
+    hash_sha256 = hashlib.sha256(model_id.encode())
+    hash_sha256.update(samples.tobytes())
+    return hash_sha256.hexdigest()
+
+
+def get_chunk_cache_path(chunk_key: str) -> str:
+    return os.path.join(CHUNK_CACHE_DIR, f"{chunk_key}.json")
+
+
+def get_response_path(cache_key: str, etag: str, encoding: str = None) -> str:
+    """Path of the stored response body with the given ETag and content encoding."""
+    suffix = {None: "", "gzip": ".gz", "br": ".br"}[encoding]
+    name = etag.strip('"') + ".json" + suffix
+    return os.path.join(RESPONSE_CACHE_DIR, cache_key, name)
+
+
+def save_response_variants(cache_key: str, etag: str, variants: dict) -> None:
+    """Stores a response body in each encoding (None for identity) for later hits.
+
+    Files are written under a temporary name and renamed, so a concurrent
+    hit never serves a partial body.
+    """
+    directory = os.path.join(RESPONSE_CACHE_DIR, cache_key)
+    os.makedirs(directory, exist_ok=True)
+    for encoding, body in variants.items():
+        path = get_response_path(cache_key, etag, encoding)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(body)
+        os.replace(temp_path, path)
+    prune_response_variants(cache_key)
+
+
+def prune_response_variants(cache_key: str, keep: int = RESPONSE_VARIANTS_PER_ENTRY) -> None:
+    """Drops all but the `keep` most recently stored representations of an entry."""
+    directory = os.path.join(RESPONSE_CACHE_DIR, cache_key)
+    stored = {}  # ETag -> (newest mtime, files)
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    mtime = entry.stat().st_mtime
+                except OSError:
+                    continue
+                tag = entry.name.split(".", 1)[0]
+                newest, files = stored.get(tag, (0, []))
+                stored[tag] = (max(newest, mtime), files + [entry.path])
+    except FileNotFoundError:
+        return
+
+    for _, files in sorted(stored.values(), reverse=True)[keep:]:
+        for path in files:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def delete_response_variants(cache_key: str) -> None:
+    shutil.rmtree(os.path.join(RESPONSE_CACHE_DIR, cache_key), ignore_errors=True)
+
+
+def save_chunk_to_cache(chunk_key: str, segments: list) -> None:
+    """Store Whisper segments of one audio chunk, timed from the chunk start"""
+    os.makedirs(CHUNK_CACHE_DIR, exist_ok=True)
+    with open(get_chunk_cache_path(chunk_key), "w") as f:
+        json.dump({"segments": segments}, f, ensure_ascii=False)
+
+
+def load_chunk_from_cache(chunk_key: str):
+    """Return cached segments of an audio chunk, or None on a miss"""
+    try:
+        with open(get_chunk_cache_path(chunk_key), "r") as f:
+            return json.load(f)["segments"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def get_cache_stats() -> dict:
+    """Number of cache entries and their total size in bytes."""
+    entries, size = 0, 0
+    try:
+        with os.scandir(CACHE_DIR) as it:
+            for entry in it:
+                if entry.name.endswith(".json"):
+                    entries += 1
+                    size += entry.stat().st_size
+    except FileNotFoundError:
+        pass
+    return {"entries": entries, "size_bytes": size}
+
+
+Gauge("shadowing_cache_entries", "Cached transcription entries",
+      lambda: get_cache_stats()["entries"])
+Gauge("shadowing_cache_size_bytes", "Total size of the cached transcription entries",
+      lambda: get_cache_stats()["size_bytes"])
+
+
 async def get_cache_info():
     """Get information about the cache directory and cached entries"""
     try:
@@ -105,11 +549,34 @@ async def clear_cache():
                 os.remove(cache_path)
                 deleted_count += 1
             except Exception as e:
-                print(f"Failed to delete {cache_file}: {e}")
+                logger.warning("Failed to delete %s: %s", cache_file, e)
+
+        deleted_chunks = 0
+        if os.path.isdir(CHUNK_CACHE_DIR):
+            for chunk_file in os.listdir(CHUNK_CACHE_DIR):
+                try:
+                    os.remove(os.path.join(CHUNK_CACHE_DIR, chunk_file))
+                    deleted_chunks += 1
+                except Exception as e:
+                    logger.warning("Failed to delete chunk %s: %s", chunk_file, e)
+
+        shutil.rmtree(RESPONSE_CACHE_DIR, ignore_errors=True)
+        shutil.rmtree(CAPTION_INDEX_DIR, ignore_errors=True)
+        shutil.rmtree(CLIP_CACHE_DIR, ignore_errors=True)
+        shutil.rmtree(PEAKS_CACHE_DIR, ignore_errors=True)
+        get_search_index().clear()
+
+        if os.path.isdir(NEGATIVE_CACHE_DIR):
+            for negative_file in os.listdir(NEGATIVE_CACHE_DIR):
+                try:
+                    os.remove(os.path.join(NEGATIVE_CACHE_DIR, negative_file))
+                except Exception as e:
+                    logger.warning("Failed to delete negative record %s: %s", negative_file, e)
 
         return {
             "message": f"Cache cleared successfully",
-            "deleted_entries": deleted_count
+            "deleted_entries": deleted_count,
+            "deleted_chunks": deleted_chunks
         }
     except Exception as e:
         return {"error": f"Failed to clear cache: {str(e)}"}
@@ -118,6 +585,15 @@ async def clear_cache():
 async def delete_cache_entry(cache_key: str):
     """Delete a specific cache entry"""
     try:
+        # Forget failures too, so the next request retries from scratch
+        delete_negative_results(cache_key)
+        delete_response_variants(cache_key)
+        delete_caption_indexes(cache_key)
+        get_search_index().delete(cache_key)
+        delete_clips(cache_key)
+        if os.path.exists(get_peaks_path(cache_key)):
+            os.remove(get_peaks_path(cache_key))
+
         cache_path = get_cache_path(cache_key)
         if os.path.exists(cache_path):
             os.remove(cache_path)
@@ -0,0 +1,192 @@
+import asyncio
+import contextlib
+import contextvars
+import logging
+import subprocess
+import threading
+
+from src.constants import CANCEL_FINISH_FRACTION, CANCEL_ON_DISCONNECT
+
+logger = logging.getLogger(__name__)
+
+# How often blocking waits look at the cancel token, in seconds
+POLL_SECONDS = 0.25
+
+# Token of the request the current task (or worker thread, which inherits the
+# context through asyncio.to_thread) works for; None when nobody can go away
+_current_token = contextvars.ContextVar("cancel_token", default=None)
+
+# (progress before the running step, the step's share of the whole), so a
+# step reporting its own progress moves the request's; see progress_share()
+_progress_share = contextvars.ContextVar("progress_share", default=(0.0, 1.0))
+
+
+class JobCancelled(Exception):
+    """The caller went away and the job stopped before finishing."""
+
+
+class CancelToken:
+    """Cooperative cancellation of one request's downloads and transcription.
+
+    Blocking steps call check_cancelled() between units of work and kill
+    their subprocesses once cancel() was called. Transcription reports its
+    progress; a job at least finish_fraction done, or inside an
+    uninterruptible() step, is left to finish into the cache instead of
+    being cancelled.
+    """
+
+    def __init__(self, finish_fraction: float = CANCEL_FINISH_FRACTION):
+        self.finish_fraction = finish_fraction
+        self.progress = 0.0
+        self.uninterruptible = 0  # depth of uninterruptible() blocks running
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> bool:
+        """Asks the job to stop.
+
+        Returns:
+            bool: False when the job is nearly complete and keeps running.
+        """
+        with self._lock:
+            if self.progress >= self.finish_fraction or self.uninterruptible:
+                return False
+            self._event.set()
+            return True
+
+
+def set_current_token(token: CancelToken):
+    _current_token.set(token)
+
+
+def check_cancelled():
+    """Raises JobCancelled if the current request was cancelled."""
+    token = _current_token.get()
+    if token is not None and token.cancelled:
+        raise JobCancelled()
+
+
+@contextlib.contextmanager
+def uninterruptible():
+    """Marks a step that has no point to stop at, e.g. one blocking model call.
+
+    A cancel() during the block is refused, so the job finishes into the
+    cache rather than running on with its result thrown away.
+
+    Raises:
+        JobCancelled: If the request was cancelled before the block.
+    """
+    token = _current_token.get()
+    if token is None:
+        yield
+        return
+    with token._lock:
+        if token.cancelled:
+            raise JobCancelled()
+        token.uninterruptible += 1
+    try:
+        yield
+    finally:
+        with token._lock:
+            token.uninterruptible -= 1
+
+
+def report_progress(fraction: float):
+    """Records how much of the current request's transcription is done.
+
+    Inside progress_share(), `fraction` is of the running step only.
+    """
+    token = _current_token.get()
+    if token is not None:
+        done, share = _progress_share.get()
+        token.progress = done + share * fraction
+
+
+@contextlib.contextmanager
+def progress_share(done: float, share: float):
+    """Makes report_progress() calls within the block cover one step of a longer job.
+
+    Args:
+        done (float): Fraction of the whole job finished before the step.
+        share (float): Fraction of the whole job the step accounts for.
+    """
+    reset = _progress_share.set((done, share))
+    try:
+        yield
+    finally:
+        _progress_share.reset(reset)
+
+
+def communicate(process: subprocess.Popen):
+    """Popen.communicate() that kills the process when the request is cancelled."""
+    token = _current_token.get()
+    if token is None:
+        return process.communicate()
+
+    while True:
+        try:
+            return process.communicate(timeout=POLL_SECONDS)
+        except subprocess.TimeoutExpired:
+            if token.cancelled:
+                process.kill()
+                process.communicate()
+                raise JobCancelled()
+
+
+def run_subprocess(args: list, capture_output: bool = False, text: bool = False):
+    """subprocess.run() for yt-dlp and ffmpeg calls that a cancelled request kills.
+
+    Without a request to cancel it is plain subprocess.run().
+    """
+    if _current_token.get() is None:
+        return subprocess.run(args, capture_output=capture_output, text=text)
+
+    check_cancelled()
+    pipe = subprocess.PIPE if capture_output else None
+    process = subprocess.Popen(args, stdout=pipe, stderr=pipe, text=text)
+    stdout, stderr = communicate(process)
+    return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
+
+
+async def run_until_disconnected(coro, is_disconnected):
+    """Runs a request's work, cancelling it if the client disconnects first.
+
+    Args:
+        coro: The request handler's coroutine.
+        is_disconnected: Async callable, e.g. starlette's Request.is_disconnected.
+
+    Returns:
+        The handler's result, or an error dict when the work was cancelled.
+    """
+    if not CANCEL_ON_DISCONNECT:
+        return await coro
+
+    token = CancelToken()
+    context = contextvars.copy_context()
+    context.run(set_current_token, token)
+    task = context.run(asyncio.ensure_future, coro)
+
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=POLL_SECONDS * 4)
+        if done:
+            return task.result()
+        if await is_disconnected():
+            break
+
+    if not token.cancel():
+        logger.info("Client disconnected at %.0f%%; finishing into the cache", token.progress * 100)
+        return await task
+
+    logger.info("Client disconnected; cancelling its downloads and transcription")
+    # Threads stop at their next check; the task itself may be waiting
+    # for an admission slot or a stage limit
+    task.cancel()
+    try:
+        await task
+    except (asyncio.CancelledError, JobCancelled):
+        pass
+    return {"error": "Request cancelled"}
@@ -0,0 +1,107 @@
+import numpy as np
+
+from src.cache import (
+    get_cache_key,
+    load_caption_index,
+    load_from_cache,
+    open_captions_view,
+    serves_language,
+)
+from src.constants import DEFAULT_CAPTION_LANGUAGE
+from src.responses import dumps
+from src.segmentation import segment_cached_captions
+from src.timing import timed
+
+
+def window_bounds(starts, ends, start: float, end: float = None, count: int = None) -> tuple:
+    """Index range [first, last) of the captions in a time window.
+
+    The window opens with the caption showing at `start` (or the first one
+    after it) and runs up to, not including, the first caption starting at
+    `end`, or for `count` captions.
+
+    Args:
+        starts: Caption start times in ascending order.
+        ends: Caption end times, in the same order.
+        start (float): Window start in seconds.
+        end (float): Window end in seconds; None to use count.
+        count (int): Number of captions; used when end is None.
+    """
+    first = int(np.searchsorted(starts, start, side="right"))
+    if first > 0 and ends[first - 1] > start:
+        first -= 1
+    if end is not None:
+        last = max(first, int(np.searchsorted(starts, end, side="left")))
+    else:
+        last = min(first + count, len(starts))
+    return first, last
+
+
+def _window_info(index_starts, first: int, last: int, method: str) -> dict:
+    return {
+        "first": first,
+        "total": len(index_starts),
+        # Where the next window starts, for prefetching; None at the end
+        "next_start": float(index_starts[last]) if last < len(index_starts) else None,
+        "method": method,
+        "cached": True,
+    }
+
+
+@timed("caption_window")
+def get_caption_window(url: str,
+                       start: float,
+                       end: float = None,
+                       count: int = None,
+                       language: str = DEFAULT_CAPTION_LANGUAGE,
+                       min_duration: float = None):
+    """Cached captions of a URL within a time window (see window_bounds).
+
+    Without min_duration the window is over the captions as stored, which
+    transcribe_youtube serves. It is found by binary search over the entry's
+    stored start-time index, and its captions are read as one byte range of
+    the entry file, so the cost does not grow with the length of the video.
+    With min_duration (or for entries without an index) the entry is decoded
+    and the window is over the captions the min_duration endpoints serve
+    (see segment_cached_captions), so caption indexes line up with theirs.
+
+    Returns:
+        bytes: The JSON response body, with the window's captions, the
+            index of its first caption, the total number of captions and the
+            start of the next window. A dict with an error when the video's
+            captions in `language` are not cached.
+    """
+    cache_key = get_cache_key(url=url)
+    view = open_captions_view(cache_key) if min_duration is None else None
+    if view is not None:
+        try:
+            index = load_caption_index(cache_key, view.cached_at)
+            if index is not None:
+                if not serves_language({"metadata": view.metadata}, language):
+                    return {"error": f"No cached {language} captions for this video"}
+                first, last = window_bounds(index["start"], index["end"], start, end, count)
+                captions = b"[]"
+                if last > first:
+                    stop = int(index["offset"][last - 1] + index["length"][last - 1])
+                    captions = b"[" + view.read_captions(int(index["offset"][first]), stop) + b"]"
+                info = _window_info(index["start"], first, last, view.metadata.get("method", "unknown"))
+                return b'{"captions":' + captions + b"," + dumps(info)[1:]
+        finally:
+            view.close()
+
+    try:
+        cached_data = load_from_cache(cache_key)
+    except FileNotFoundError:
+        cached_data = None
+    if not cached_data or not serves_language(cached_data, language):
+        return {"error": f"No cached {language} captions for this video"}
+
+    captions = cached_data["captions"]
+    if min_duration is not None:
+        captions = segment_cached_captions(cached_data, min_duration)
+    captions = sorted(captions, key=lambda caption: caption["start"])
+    starts = np.array([caption["start"] for caption in captions], dtype=float)
+    ends = np.array([caption["end"] for caption in captions], dtype=float)
+    first, last = window_bounds(starts, ends, start, end, count)
+    method = (cached_data.get("metadata") or {}).get("method", "unknown")
+    return dumps({"captions": captions[first:last], **_window_info(starts, first, last, method)})
@@ -0,0 +1,218 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from src.cache import get_cache_key, is_cached
+from src.cancellation import run_subprocess
+from src.constants import CLIP_BITRATE, CLIP_CACHE_DIR, CLIP_CACHE_MAX_BYTES, CLIP_MAX_SECONDS
+from src.metrics import Counter, Gauge
+from src.timing import span
+from src.ytdlp import run_ytdlp
+
+logger = logging.getLogger(__name__)
+
+CLIP_MEDIA_TYPE = "audio/mp4"
+# A clip's audio never changes for its URL and time range
+CLIP_CACHE_CONTROL = "public, max-age=86400, immutable"
+
+# yt-dlp's direct stream URLs stay valid for hours; reusing one spares a
+# yt-dlp run for every further sentence of the same video
+STREAM_URL_TTL = 1800
+# Stream URLs kept at most, least recently used dropped first
+STREAM_URL_MAX_ENTRIES = 256
+
+CLIP_REQUESTS = Counter(
+    "shadowing_clip_requests_total", "Audio clip requests by result (hit, miss, error)",
+    ("result",))
+
+
+class ClipCache:
+    """Audio clips of caption segments, bounded to max_bytes on disk.
+
+    Clips are stored as {media_key}_{start_ms}_{end_ms}.m4a. Serving a clip
+    refreshes its modification time, and the least recently served clips
+    are evicted once the directory exceeds max_bytes. Concurrent requests
+    for the same clip wait for one cut instead of each running ffmpeg.
+
+    Clips are only cut from videos with a cache entry, so the yt-dlp and
+    ffmpeg runs are bounded by what the app has already transcribed or
+    extracted captions for.
+    """
+
+    def __init__(self, directory: str = CLIP_CACHE_DIR, max_bytes: int = CLIP_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._cutting = {}  # clip path -> lock held while it is cut
+        self._stream_urls = OrderedDict()  # url -> (stream url, expiry), least recent first
+
+    def clip_path(self, media_key: str, start: float, end: float) -> str:
+        name = f"{media_key}_{round(start * 1000)}_{round(end * 1000)}.m4a"
+        return os.path.join(self.directory, name)
+
+    def lookup(self, path: str) -> bool:
+        """Whether a clip is stored, marking it as recently served if so."""
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def usage(self) -> int:
+        total = 0
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    try:
+                        total += entry.stat().st_size
+                    except OSError:
+                        pass  # removed while scanning
+        except FileNotFoundError:
+            pass
+        return total
+
+    def evict(self, keep: str = None) -> int:
+        """Removes the least recently served clips until within max_bytes.
+
+        Returns:
+            int: The number of clips removed.
+        """
+        clips = []
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    clips.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            return 0
+
+        total = sum(size for _, size, _ in clips)
+        removed = 0
+        for _, size, path in sorted(clips):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    def stream_url(self, url: str):
+        """Direct URL of a video's best audio stream, from yt-dlp or memory.
+
+        Expired URLs are dropped on each call, and at most
+        STREAM_URL_MAX_ENTRIES are kept.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for known_url, (_, expiry) in list(self._stream_urls.items()):
+                if expiry <= now:
+                    del self._stream_urls[known_url]
+            cached = self._stream_urls.get(url)
+            if cached:
+                self._stream_urls.move_to_end(url)
+                return cached[0]
+
+        result = run_ytdlp("audio_url", ["-f", "bestaudio[ext=m4a]/bestaudio", "-g", url])
+        if result.returncode != 0 or not result.stdout.strip():
+            logger.warning("Failed to get audio stream of %s: %s", url, result.stderr.strip()[-500:])
+            return None
+        stream_url = result.stdout.strip().splitlines()[0]
+        with self._lock:
+            self._stream_urls[url] = (stream_url, time.monotonic() + STREAM_URL_TTL)
+            self._stream_urls.move_to_end(url)
+            while len(self._stream_urls) > STREAM_URL_MAX_ENTRIES:
+                self._stream_urls.popitem(last=False)
+        return stream_url
+
+    def cut(self, url: str, start: float, end: float, path: str):
+        """Cuts [start, end) of a video's audio into `path`. Returns an error dict on failure.
+
+        ffmpeg seeks in the remote stream before reading, so only about the
+        clip's share of the audio is downloaded.
+        """
+        stream_url = self.stream_url(url)
+        if stream_url is None:
+            return {"error": "Failed to get the video's audio"}
+
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with span("clip_cut"):
+            result = run_subprocess([
+                "ffmpeg", "-nostdin", "-y", "-loglevel", "error",
+                "-ss", f"{start:.3f}", "-i", stream_url, "-t", f"{end - start:.3f}",
+                "-vn", "-c:a", "aac", "-b:a", CLIP_BITRATE,
+                # moov atom first, so playback starts before the clip is fully loaded
+                "-movflags", "+faststart", "-f", "mp4", temp_path,
+            ], capture_output=True, text=True)
+
+        if result.returncode != 0:
+            # The stream URL may have expired; the next request fetches a new one
+            with self._lock:
+                self._stream_urls.pop(url, None)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return {"error": "Failed to cut audio clip", "detail": result.stderr.strip()[-500:]}
+        os.replace(temp_path, path)
+        return None
+
+    def get_clip(self, url: str, start: float, end: float):
+        """Path of the audio clip of [start, end) seconds of a video, cut on first use.
+
+        Returns:
+            str: Path of the stored clip, or a dict with an error.
+        """
+        if start < 0 or end <= start:
+            return {"error": "Clip end must be after its start"}
+        if end - start > CLIP_MAX_SECONDS:
+            return {"error": f"Clips can be at most {CLIP_MAX_SECONDS:g} seconds long"}
+
+        media_key = get_cache_key(url=url)
+        path = self.clip_path(media_key, start, end)
+        if self.lookup(path):
+            CLIP_REQUESTS.inc(result="hit")
+            return path
+        if not is_cached(media_key):
+            CLIP_REQUESTS.inc(result="error")
+            return {"error": "Clips are only available for videos with cached captions"}
+
+        with self._lock:
+            cutting = self._cutting.setdefault(path, threading.Lock())
+        try:
+            with cutting:
+                # Cut by a concurrent request while this one waited
+                if self.lookup(path):
+                    CLIP_REQUESTS.inc(result="hit")
+                    return path
+                error = self.cut(url, start, end, path)
+        finally:
+            with self._lock:
+                self._cutting.pop(path, None)
+
+        if error:
+            CLIP_REQUESTS.inc(result="error")
+            return error
+        CLIP_REQUESTS.inc(result="miss")
+        self.evict(keep=path)
+        return path
+
+
+_clip_cache = ClipCache()
+
+
+def get_clip_cache() -> ClipCache:
+    return _clip_cache
+
+
+Gauge("shadowing_clip_cache_size_bytes", "Total size of the stored audio clips",
+      lambda: get_clip_cache().usage())
@@ -1,2 +1,164 @@
+import os
+
 TS_DIR = "transcribe"
 CACHE_DIR = "cache"
+CHUNK_CACHE_DIR = os.path.join(CACHE_DIR, "chunks")
+NEGATIVE_CACHE_DIR = os.path.join(CACHE_DIR, "negative")
+RESPONSE_CACHE_DIR = os.path.join(CACHE_DIR, "responses")
+CAPTION_INDEX_DIR = os.path.join(CACHE_DIR, "index")
+SEARCH_DB_PATH = os.path.join(CACHE_DIR, "search.sqlite3")
+CLIP_CACHE_DIR = os.path.join(CACHE_DIR, "clips")
+PEAKS_CACHE_DIR = os.path.join(CACHE_DIR, "peaks")
+
+# Transcription engine used by transcribe_with_whisper:
+#   "openai-whisper" - reference PyTorch implementation
+#   "faster-whisper" - CTranslate2 runtime, int8-quantized on CPU by default
+WHISPER_BACKEND = os.getenv("WHISPER_BACKEND", "openai-whisper")
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", "0"))  # 0 = runtime default
+
+# Dynamic batching of short clips: clips up to WHISPER_BATCH_MAX_CLIP_SECONDS are
+# split into <=30 s windows that a scheduler batches across concurrent requests,
+# waiting at most WHISPER_BATCH_MAX_WAIT_MS for a batch to fill.
+WHISPER_BATCHING = os.getenv("WHISPER_BATCHING", "1") == "1"
+WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "8"))
+WHISPER_BATCH_MAX_WAIT_MS = int(os.getenv("WHISPER_BATCH_MAX_WAIT_MS", "100"))
+WHISPER_BATCH_MAX_CLIP_SECONDS = float(os.getenv("WHISPER_BATCH_MAX_CLIP_SECONDS", "180"))
+
+# Chunk-level cache: Whisper output is stored per decoded-audio window, keyed by
+# a hash of its PCM samples, the model and its decode settings, so windows that
+# decode to the same samples (e.g. a retried run) are not transcribed again. It
+# applies where clips are transcribed in batched windows (WHISPER_BATCHING, up
+# to WHISPER_BATCH_MAX_CLIP_SECONDS). Windows are cut at the quietest point in
+# the last CHUNK_SEARCH_SECONDS before the 30 s limit.
+CHUNK_CACHE_ENABLED = os.getenv("CHUNK_CACHE_ENABLED", "1") == "1"
+CHUNK_SEARCH_SECONDS = float(os.getenv("CHUNK_SEARCH_SECONDS", "10"))
+
+# Capture word-level timestamps so captions can be re-segmented from the cache
+WHISPER_WORD_TIMESTAMPS = os.getenv("WHISPER_WORD_TIMESTAMPS", "1") == "1"
+
+# Latency-budget model selection: the largest model in WHISPER_MODELS (smallest
+# first) whose estimated completion time, including the queued backlog, fits
+# WHISPER_TARGET_SECONDS is used. Throughputs are audio seconds transcribed per
+# wall-clock second; these are starting estimates refined from measured jobs.
+WHISPER_MODELS = os.getenv("WHISPER_MODELS", f"tiny,{WHISPER_MODEL}").split(",")
+WHISPER_TARGET_SECONDS = float(os.getenv("WHISPER_TARGET_SECONDS", "300"))
+WHISPER_INITIAL_THROUGHPUT = {
+    "tiny": 32.0,
+    "base": 16.0,
+    "small": 6.0,
+    "medium": 2.0,
+    "large": 1.0,
+}
+# Seconds between idle-time passes that re-transcribe entries made with a
+# smaller model; 0 disables the background pass (POST /cache/upgrade still works)
+WHISPER_UPGRADE_INTERVAL = float(os.getenv("WHISPER_UPGRADE_INTERVAL", "0"))
+
+# Hybrid re-transcription: when YouTube captions are poor overall, captions are
+# scored per QUALITY_WINDOW_SECONDS window and Whisper only re-transcribes the
+# poor windows, as long as they cover at most HYBRID_MAX_POOR_FRACTION of the video
+HYBRID_ENABLED = os.getenv("HYBRID_ENABLED", "1") == "1"
+QUALITY_WINDOW_SECONDS = float(os.getenv("QUALITY_WINDOW_SECONDS", "60"))
+HYBRID_MAX_POOR_FRACTION = float(os.getenv("HYBRID_MAX_POOR_FRACTION", "0.5"))
+
+# Negative cache: how long (seconds) a failed lookup is remembered per reason
+NEGATIVE_CACHE_TTLS = {
+    "no_captions": int(os.getenv("NEGATIVE_TTL_NO_CAPTIONS", str(6 * 3600))),
+    "too_long": int(os.getenv("NEGATIVE_TTL_TOO_LONG", str(7 * 24 * 3600))),
+    "unavailable": int(os.getenv("NEGATIVE_TTL_UNAVAILABLE", str(10 * 60))),
+}
+
+# Batch ingestion (POST /ingest): every URL of a job runs concurrently, with at
+# most INGEST_NETWORK_CONCURRENCY yt-dlp calls and INGEST_WHISPER_CONCURRENCY
+# transcriptions of the job in flight. Finished jobs beyond INGEST_MAX_JOBS are
+# forgotten, oldest first.
+INGEST_NETWORK_CONCURRENCY = int(os.getenv("INGEST_NETWORK_CONCURRENCY", "4"))
+INGEST_WHISPER_CONCURRENCY = int(os.getenv("INGEST_WHISPER_CONCURRENCY", "2"))
+INGEST_MAX_ITEMS = int(os.getenv("INGEST_MAX_ITEMS", "200"))
+INGEST_MAX_JOBS = int(os.getenv("INGEST_MAX_JOBS", "50"))
+
+# Subtitle languages: every caption extraction downloads these tracks (plus the
+# requested language) in one yt-dlp run and stores them in the video's entry,
+# so other languages are served later without network calls
+DEFAULT_CAPTION_LANGUAGE = os.getenv("DEFAULT_CAPTION_LANGUAGE", "en")
+CAPTION_LANGUAGES = os.getenv("CAPTION_LANGUAGES", DEFAULT_CAPTION_LANGUAGE).split(",")
+
+# Admission control for Whisper work (download, temp file and transcription):
+# at most WHISPER_MAX_ACTIVE jobs run and WHISPER_MAX_QUEUED wait; beyond that
+# requests get 503, and a client with WHISPER_MAX_PER_CLIENT jobs admitted or
+# waiting gets 429. Cache hits are always served.
+WHISPER_MAX_ACTIVE = int(os.getenv("WHISPER_MAX_ACTIVE", "2"))
+WHISPER_MAX_QUEUED = int(os.getenv("WHISPER_MAX_QUEUED", "8"))
+WHISPER_MAX_PER_CLIENT = int(os.getenv("WHISPER_MAX_PER_CLIENT", "2"))
+
+# Cancellation on client disconnect: downloads and transcription of a request
+# whose client went away are stopped, unless the transcription is at least
+# CANCEL_FINISH_FRACTION done, in which case it finishes into the cache
+CANCEL_ON_DISCONNECT = os.getenv("CANCEL_ON_DISCONNECT", "1") == "1"
+CANCEL_FINISH_FRACTION = float(os.getenv("CANCEL_FINISH_FRACTION", "0.8"))
+
+# Scratch space (TS_DIR): temp files may take at most SCRATCH_QUOTA_BYTES, with
+# SCRATCH_DOWNLOAD_RESERVE_BYTES reserved up front for each audio download;
+# new work is refused with 503 beyond that. Files left behind by crashed runs
+# are swept once older than SCRATCH_ORPHAN_SECONDS, at startup and every
+# SCRATCH_SWEEP_INTERVAL seconds.
+SCRATCH_QUOTA_BYTES = int(os.getenv("SCRATCH_QUOTA_BYTES", str(2 * 1024 ** 3)))
+SCRATCH_DOWNLOAD_RESERVE_BYTES = int(os.getenv("SCRATCH_DOWNLOAD_RESERVE_BYTES", str(200 * 1024 ** 2)))
+SCRATCH_ORPHAN_SECONDS = int(os.getenv("SCRATCH_ORPHAN_SECONDS", str(6 * 3600)))
+SCRATCH_SWEEP_INTERVAL = int(os.getenv("SCRATCH_SWEEP_INTERVAL", "600"))
+
+# Server-Timing: every response carries the time spent per stage (cache, yt-dlp,
+# parsing, quality checks, audio download, Whisper) in a Server-Timing header,
+# also logged as one JSON line per request. Set to 0 to turn timing off.
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") == "1"
+
+# Logging: records go through a queue to a background writer as JSON lines
+# (LOG_FORMAT=text for plain lines). At the default INFO level a cache hit logs
+# only its request summary; LOG_LEVEL=DEBUG adds per-step detail such as yt-dlp
+# output. Records logged with a sample key (e.g. cache hits) are kept one in
+# LOG_SAMPLE_EVERY.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "100"))
+
+# Version of the caption pipeline (parsing, merging, segmentation), part of
+# every caption ETag; bump it when a change alters the captions served from
+# existing cache entries so browsers and proxies refetch them
+CAPTION_PIPELINE_VERSION = os.getenv("CAPTION_PIPELINE_VERSION", "1")
+
+# Response compression: caption responses of at least COMPRESSION_MIN_BYTES
+# are gzip- or brotli-encoded when the client accepts it, at GZIP_LEVEL and
+# BROTLI_QUALITY. Responses stored for cache hits are compressed once at the
+# maximum level instead, since every later hit reuses them.
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+# Stored responses are keyed by the request parameters, so GET caption URLs
+# round min_duration to MIN_DURATION_STEP seconds within [0,
+# MAX_MIN_DURATION], and at most RESPONSE_VARIANTS_PER_ENTRY representations
+# of an entry are stored (least recently written dropped first)
+MIN_DURATION_STEP = float(os.getenv("MIN_DURATION_STEP", "0.1"))
+MAX_MIN_DURATION = float(os.getenv("MAX_MIN_DURATION", "30"))
+RESPONSE_VARIANTS_PER_ENTRY = int(os.getenv("RESPONSE_VARIANTS_PER_ENTRY", "16"))
+
+# Caption search (GET /search): the captions of every cache entry are kept in a
+# SQLite FTS5 index at SEARCH_DB_PATH, updated on each cache write and delete;
+# results are paged SEARCH_PAGE_SIZE at a time (at most SEARCH_MAX_PAGE_SIZE)
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "20"))
+SEARCH_MAX_PAGE_SIZE = int(os.getenv("SEARCH_MAX_PAGE_SIZE", "100"))
+
+# Sentence clips (GET /clip): the audio of one caption, at most CLIP_MAX_SECONDS
+# long, is cut once with ffmpeg as AAC at CLIP_BITRATE and kept in
+# CLIP_CACHE_DIR; the least recently served clips are evicted beyond
+# CLIP_CACHE_MAX_BYTES
+CLIP_MAX_SECONDS = float(os.getenv("CLIP_MAX_SECONDS", "60"))
+CLIP_BITRATE = os.getenv("CLIP_BITRATE", "64k")
+CLIP_CACHE_MAX_BYTES = int(os.getenv("CLIP_CACHE_MAX_BYTES", str(500 * 1024 ** 2)))
+
+# Waveform peaks (GET /peaks): whenever audio is decoded for Whisper, the
+# minimum and maximum of every 1/PEAKS_PER_SECOND of it are stored as int8
+# pairs in PEAKS_CACHE_DIR. It must divide the 16 kHz sample rate. Stored peaks
+# record the rate they were computed at and are served at it.
+PEAKS_PER_SECOND = int(os.getenv("PEAKS_PER_SECOND", "50"))
@@ -0,0 +1,167 @@
+import asyncio
+import os
+
+from fastapi import Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+
+from src.cache import get_cache_key, get_entry_etag, get_response_path, save_response_variants
+from src.constants import COMPRESSION_MIN_BYTES, MAX_MIN_DURATION, MIN_DURATION_STEP
+from src.metrics import Counter
+from src.responses import (
+    JSON_MEDIA_TYPE,
+    choose_encoding,
+    dumps,
+    encode_variants,
+    encoded_response,
+    gzip_stream,
+    json_response,
+    supported_encodings,
+)
+
+# Browsers and proxies may store caption responses but must revalidate them,
+# since upgrades and re-extractions rewrite cache entries
+CACHE_CONTROL = "no-cache"
+
+HTTP_CACHE_RESPONSES = Counter(
+    "shadowing_http_cache_responses_total",
+    "Caption requests answered without running the handler: 304s, stored bodies and misses",
+    ("kind",))
+
+_CODING_SUFFIXES = {"gzip": "gz", "br": "br"}
+
+
+def coded_etag(etag: str, encoding: str = None) -> str:
+    """The ETag of one content-coding of a representation.
+
+    Strong validators must differ when the bytes do, so compressed bodies get
+    a suffix, e.g. "abc-gz" for gzip.
+    """
+    if not etag or not encoding:
+        return etag
+    return f'{etag[:-1]}-{_CODING_SUFFIXES[encoding]}"'
+
+
+def variant_min_duration(min_duration: float) -> float:
+    """min_duration rounded to MIN_DURATION_STEP within [0, MAX_MIN_DURATION].
+
+    Stored responses are keyed by it, so it must not take arbitrary values.
+    """
+    steps = round(min(max(min_duration, 0.0), MAX_MIN_DURATION) / MIN_DURATION_STEP)
+    return round(steps * MIN_DURATION_STEP, 3)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an If-None-Match header matches `etag` (weak comparison, RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in tags
+
+
+async def caption_response(request: Request, result) -> Response:
+    """Serializes a caption result once, compressed if the client accepts it."""
+    if isinstance(result, Response):
+        return result
+    return await asyncio.to_thread(json_response, result, request.headers.get("accept-encoding"))
+
+
+def passthrough_response(request: Request, view) -> StreamingResponse:
+    """Streams a cache hit's captions from the entry file inside the hit wrapper.
+
+    The body equals the handler's cache hit result, but the captions are
+    never decoded or re-encoded. Clients accepting gzip get it compressed
+    on the fly; others get the stored bytes with a Content-Length.
+
+    Args:
+        request: The incoming request, for its Accept-Encoding header.
+        view (CaptionsView): The open entry, closed once the body is sent.
+    """
+    prefix = b'{"captions":'
+    suffix = b"".join([
+        b',"method":', dumps(view.metadata.get("method", "unknown")),
+        b',"cached":true,"metadata":', view.metadata_bytes, b"}",
+    ])
+
+    def body():
+        try:
+            yield prefix
+            yield from view.iter_captions()
+            yield suffix
+        finally:
+            view.close()
+
+    headers = {"Vary": "Accept-Encoding"}
+    length = len(prefix) + view.captions_length + len(suffix)
+    encoding = None
+    if length >= COMPRESSION_MIN_BYTES:
+        encoding = choose_encoding(request.headers.get("accept-encoding"), ["gzip"])
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        return StreamingResponse(gzip_stream(body()), headers=headers, media_type=JSON_MEDIA_TYPE)
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(body(), headers=headers, media_type=JSON_MEDIA_TYPE)
+
+
+def stored_response(cache_key: str, etag: str, encoding: str, headers: dict):
+    """The response body stored for `etag`, streamed from disk as is, or None."""
+    path = get_response_path(cache_key, etag, encoding)
+    if not os.path.exists(path):
+        return None
+    headers = dict(headers, Vary="Accept-Encoding")
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return FileResponse(path, headers=headers, media_type=JSON_MEDIA_TYPE)
+
+
+def store_response(cache_key: str, etag: str, result: dict) -> dict:
+    variants = encode_variants(dumps(result))
+    save_response_variants(cache_key, etag, variants)
+    return variants
+
+
+async def conditional_captions(request: Request, url: str, variant: tuple, produce, is_hit):
+    """Serves a URL's cached caption result with an ETag, or 304 when the client has it.
+
+    Only cache hits are served: a miss gets a 404 without starting any work,
+    which is left to the POST route. Results get an ETag per content-coding
+    (see coded_etag) while their cache entry is unchanged. The first hit of
+    each representation stores its body in every supported encoding; later
+    hits send the stored bytes without loading the entry.
+
+    Args:
+        request: The incoming request, for its If-None-Match header.
+        url (str): The video URL, whose cache entry the result comes from.
+        variant (tuple): Endpoint name and the parameters shaping the response.
+        produce: Async callable returning the result dict of a hit.
+        is_hit: Callable telling whether the cache answers the request.
+    """
+    cache_key = get_cache_key(url=url)
+    etag = get_entry_etag(cache_key, *variant)
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    headers = {"ETag": coded_etag(etag, encoding), "Cache-Control": CACHE_CONTROL}
+
+    if etag:
+        # A body the client stored in any coding is still current
+        if_none_match = request.headers.get("if-none-match")
+        if any(etag_matches(if_none_match, coded_etag(etag, coding))
+               for coding in (None, *supported_encodings())):
+            HTTP_CACHE_RESPONSES.inc(kind="not_modified")
+            return Response(status_code=304, headers=headers)
+        stored = stored_response(cache_key, etag, encoding, headers)
+        if stored is not None:
+            HTTP_CACHE_RESPONSES.inc(kind="stored")
+            return stored
+
+    if not etag or not await asyncio.to_thread(is_hit):
+        HTTP_CACHE_RESPONSES.inc(kind="miss")
+        return JSONResponse({"error": "Captions are not cached yet; POST to this route to create them"},
+                            status_code=404)
+
+    result = await produce()
+    if (etag and isinstance(result, dict) and result.get("cached") and "error" not in result
+            and get_entry_etag(cache_key, *variant) == etag):
+        variants = await asyncio.to_thread(store_response, cache_key, etag, result)
+        return encoded_response(variants[encoding], encoding, headers=headers)
+    return await caption_response(request, result)
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+
+from src.constants import (
+    DEFAULT_CAPTION_LANGUAGE,
+    INGEST_MAX_ITEMS,
+    INGEST_MAX_JOBS,
+    INGEST_NETWORK_CONCURRENCY,
+    INGEST_WHISPER_CONCURRENCY,
+)
+from src.stages import StageLimits, run_stage, set_current_item
+from src.timing import detach_spans
+from src.ytdlp import run_ytdlp
+
+logger = logging.getLogger(__name__)
+
+_jobs = OrderedDict()
+
+
+class IngestJob:
+    """A batch of URLs pre-warmed into the cache through smart extraction.
+
+    Every item runs concurrently; its yt-dlp calls and Whisper passes are
+    throttled by the job's StageLimits, so at most `network` fetches and
+    `whisper` transcriptions of this job are in flight at any time.
+    """
+
+    def __init__(self,
+                 urls: list,
+                 playlist_url: str = None,
+                 min_duration: float = 2.5,
+                 language: str = DEFAULT_CAPTION_LANGUAGE,
+                 network: int = INGEST_NETWORK_CONCURRENCY,
+                 whisper: int = INGEST_WHISPER_CONCURRENCY):
+        self.id = uuid.uuid4().hex
+        self.playlist_url = playlist_url
+        self.min_duration = min_duration
+        self.language = language
+        self.network = network
+        self.whisper = whisper
+        self.status = "queued"
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.items = [_new_item(url) for url in urls]
+        self.task = None
+
+    def to_dict(self) -> dict:
+        counts = {}
+        for item in self.items:
+            counts[item["status"]] = counts.get(item["status"], 0) + 1
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "playlist_url": self.playlist_url,
+            "language": self.language,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "limits": {"network": self.network, "whisper": self.whisper},
+            "total": len(self.items),
+            "counts": counts,
+            "items": [dict(item) for item in self.items],
+        }
+
+    async def run(self):
+        """Expands the playlist, if any, and processes every item."""
+        from src.server import smart_extract_captions
+
+        # The task copied the context of the request that started it
+        detach_spans()
+        self.status = "running"
+        limits = StageLimits(self.network, self.whisper)
+        try:
+            if self.playlist_url:
+                urls = await run_stage("network", expand_playlist, self.playlist_url)
+                self.items.extend(_new_item(url) for url in urls[:INGEST_MAX_ITEMS - len(self.items)])
+
+            async def process(item):
+                set_current_item(limits, item)
+                item["status"] = "running"
+                started = time.monotonic()
+                try:
+                    result = await smart_extract_captions(
+                        item["url"], self.min_duration, self.language)
+                except Exception as e:
+                    result = {"error": str(e)}
+                item["seconds"] = round(time.monotonic() - started, 2)
+
+                if "error" in result:
+                    item["status"] = "failed"
+                    item["error"] = result["error"]
+                else:
+                    item["cached"] = result.get("cached", False)
+                    item["status"] = "cached" if item["cached"] else "done"
+                    item["method"] = result.get("method")
+                    item["segments"] = len(result["captions"])
+
+            # Each item gets its own task so its stage is tracked separately
+            await asyncio.gather(*(process(item) for item in self.items))
+            self.status = "finished"
+        except Exception as e:
+            logger.exception("Ingest job %s failed", self.id)
+            self.status = "failed"
+            self.error = str(e)
+        finally:
+            self.finished_at = time.time()
+
+
+def _new_item(url: str) -> dict:
+    return {
+        "url": url,
+        "status": "queued",
+        "stage": None,
+        "method": None,
+        "cached": None,
+        "segments": None,
+        "seconds": None,
+        "error": None,
+    }
+
+
+def expand_playlist(playlist_url: str) -> list:
+    """Lists the video URLs of a YouTube playlist without downloading anything."""
+    result = run_ytdlp("playlist", ["--flat-playlist", "--print", "url", playlist_url])
+
+    if result.returncode != 0:
+        raise RuntimeError(f"Failed to list playlist: {result.stderr.strip()}")
+
+    return [line.strip() for line in result.stdout.splitlines() if line.strip()]
+
+
+def start_job(urls: list = None,
+              playlist_url: str = None,
+              min_duration: float = 2.5,
+              language: str = DEFAULT_CAPTION_LANGUAGE) -> dict:
+    """Registers a batch job and starts it in the background of the running loop.
+
+    Returns:
+        dict: The job's initial progress, or an error dict.
+    """
+    urls = list(dict.fromkeys(urls or []))  # drop duplicates, keep order
+    if not urls and not playlist_url:
+        return {"error": "Provide a list of URLs or a playlist URL"}
+    if len(urls) > INGEST_MAX_ITEMS:
+        return {"error": f"Too many URLs (max {INGEST_MAX_ITEMS} per job)"}
+
+    job = IngestJob(urls, playlist_url, min_duration, language)
+    _jobs[job.id] = job
+    _prune_jobs()
+    job.task = asyncio.get_running_loop().create_task(job.run())
+    logger.info("Started ingest job %s with %d URLs", job.id, len(urls),
+                extra={"playlist_url": playlist_url})
+    return job.to_dict()
+
+
+def get_job(job_id: str):
+    return _jobs.get(job_id)
+
+
+def _prune_jobs():
+    # Forget the oldest finished jobs beyond INGEST_MAX_JOBS
+    finished = [job_id for job_id, job in _jobs.items() if job.finished_at is not None]
+    for job_id in finished[:max(0, len(_jobs) - INGEST_MAX_JOBS)]:
+        del _jobs[job_id]
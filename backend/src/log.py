@@ -0,0 +1,104 @@
+import copy
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from collections import defaultdict
+
+from src.constants import LOG_FORMAT, LOG_LEVEL, LOG_SAMPLE_EVERY
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object, with `extra` fields as keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRS)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps one in `every` records logged with extra={"sample": key}, per key.
+
+    Kept records get a "sampled" field saying how many occurrences each
+    stands for. Records without a sample key always pass.
+    """
+
+    def __init__(self, every: int = LOG_SAMPLE_EVERY):
+        super().__init__()
+        self.every = max(1, every)
+        self._counters = defaultdict(itertools.count)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "sample", None)
+        if key is None or self.every == 1:
+            return True
+        if next(self._counters[key]) % self.every:
+            return False
+        record.sampled = self.every
+        return True
+
+
+class ExceptionKeepingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves exceptions to the writing handler's formatter.
+
+    The stock prepare() merges the traceback into the message and clears
+    exc_info, so JsonFormatter would never emit an "exception" field. Records
+    go through an in-process queue, so exc_info need not be picklable.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    """Sends all log records through a queue to a background thread writing stdout.
+
+    Request handlers only enqueue records, so a slow stdout or log pipeline
+    never blocks them. Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = ExceptionKeepingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter())
+
+    root = logging.getLogger()
+    root.addHandler(queue_handler)
+    root.setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Writes out the records still queued and stops the background thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
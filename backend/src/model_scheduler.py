@@ -0,0 +1,109 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from src.constants import (
+    WHISPER_INITIAL_THROUGHPUT,
+    WHISPER_MODELS,
+    WHISPER_TARGET_SECONDS,
+)
+from src.metrics import Counter, Gauge
+
+AUDIO_SECONDS = Counter(
+    "shadowing_whisper_audio_seconds_total", "Seconds of audio transcribed, by model", ("model",))
+BUSY_SECONDS = Counter(
+    "shadowing_whisper_busy_seconds_total", "Wall-clock seconds spent transcribing, by model", ("model",))
+
+
+class ModelScheduler:
+    """Picks the Whisper model for a job from a latency budget.
+
+    Throughput (audio seconds per wall-clock second) is tracked per model as an
+    exponential moving average of finished jobs. The backlog is the estimated
+    wall time of jobs already running, so a busy queue pushes new jobs towards
+    smaller models and an idle one lets them use the largest.
+    """
+
+    def __init__(self,
+                 models: list = WHISPER_MODELS,
+                 target_seconds: float = WHISPER_TARGET_SECONDS,
+                 initial_throughput: dict = WHISPER_INITIAL_THROUGHPUT,
+                 smoothing: float = 0.3):
+        self.models = list(models)
+        self.target_seconds = target_seconds
+        self.smoothing = smoothing
+        self._throughput = {
+            model: initial_throughput.get(model.split(".")[0], 1.0) for model in self.models
+        }
+        self._backlog_seconds = 0.0
+        self._jobs = 0
+        self._lock = threading.Lock()
+
+    def throughput(self, model: str) -> float:
+        with self._lock:
+            return self._throughput_of(model)
+
+    def _throughput_of(self, model: str) -> float:
+        # Models outside the ladder (e.g. forced by an upgrade pass) start at 1x
+        return self._throughput.setdefault(
+            model, WHISPER_INITIAL_THROUGHPUT.get(model.split(".")[0], 1.0))
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            return self._jobs
+
+    def estimate_seconds(self, model: str, media_seconds: float) -> float:
+        """Estimated wall time until a job submitted now would finish."""
+        with self._lock:
+            return self._backlog_seconds + media_seconds / self._throughput_of(model)
+
+    def choose_model(self, media_seconds: float, target_seconds: float = None) -> str:
+        """Returns the largest model expected to finish within the budget,
+        or the smallest model when none does."""
+        target_seconds = target_seconds or self.target_seconds
+        for model in reversed(self.models):
+            if self.estimate_seconds(model, media_seconds) <= target_seconds:
+                return model
+        return self.models[0]
+
+    def record(self, model: str, media_seconds: float, wall_seconds: float) -> None:
+        """Folds a finished job's measured throughput into the estimate."""
+        if media_seconds <= 0 or wall_seconds <= 0:
+            return
+        measured = media_seconds / wall_seconds
+        with self._lock:
+            previous = self._throughput_of(model)
+            self._throughput[model] = previous + self.smoothing * (measured - previous)
+
+    @contextmanager
+    def track(self, model: str, media_seconds: float):
+        """Counts a job in the backlog while it runs and records its throughput."""
+        with self._lock:
+            estimate = media_seconds / self._throughput_of(model)
+            self._backlog_seconds += estimate
+            self._jobs += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._backlog_seconds -= estimate
+                self._jobs -= 1
+        wall_seconds = time.monotonic() - start
+        self.record(model, media_seconds, wall_seconds)
+        AUDIO_SECONDS.inc(media_seconds, model=model)
+        BUSY_SECONDS.inc(wall_seconds, model=model)
+
+    def can_upgrade(self, model: str) -> bool:
+        """True when model is one of the configured models but not the largest."""
+        return model in self.models[:-1]
+
+
+_scheduler = ModelScheduler()
+
+Gauge("shadowing_whisper_inflight_jobs", "Transcription jobs currently running",
+      lambda: _scheduler.queue_depth())
+
+
+def get_model_scheduler() -> ModelScheduler:
+    return _scheduler
@@ -0,0 +1,121 @@
+import logging
+import math
+import os
+import uuid
+
+import numpy as np
+
+from src.cache import get_cache_key, get_peaks_path
+from src.constants import PEAKS_PER_SECOND
+
+logger = logging.getLogger(__name__)
+
+
+def compute_peaks(audio: np.ndarray, sample_rate: int, per_second: int = PEAKS_PER_SECOND) -> np.ndarray:
+    """Downsamples audio to per-bin minimum and maximum amplitudes.
+
+    Args:
+        audio: Mono float32 samples in [-1, 1].
+        sample_rate (int): Samples per second of `audio`.
+        per_second (int): Bins per second of audio; must divide sample_rate,
+            so that bins span exactly 1/per_second seconds.
+
+    Returns:
+        np.ndarray: int8 array of shape (bins, 2) holding each bin's minimum
+            and maximum, scaled to [-127, 127]. A partial last bin is kept.
+
+    Raises:
+        ValueError: When per_second does not divide sample_rate.
+    """
+    if per_second <= 0 or sample_rate % per_second:
+        raise ValueError(f"{per_second} peaks per second do not divide the {sample_rate} Hz sample rate")
+    bin_size = sample_rate // per_second
+    full = len(audio) // bin_size * bin_size
+    # A reshaped view of the samples; only the partial last bin is copied
+    bins = audio[:full].reshape(-1, bin_size)
+    lows, highs = bins.min(axis=1), bins.max(axis=1)
+    if full < len(audio):
+        tail = audio[full:]
+        lows = np.append(lows, tail.min())
+        highs = np.append(highs, tail.max())
+
+    peaks = np.stack([lows, highs], axis=1)
+    return np.clip(np.round(peaks * 127), -127, 127).astype(np.int8)
+
+
+def save_peaks(cache_key: str, audio: np.ndarray, sample_rate: int) -> None:
+    """Computes and stores the waveform peaks of a cache entry's audio.
+
+    The file holds two arrays in .npy format: the sample rate and bin size
+    the peaks were computed with, then the peaks, so stored peaks are served
+    at their own rate after PEAKS_PER_SECOND changes. A failure is logged;
+    waveforms never fail a transcription.
+    """
+    try:
+        peaks = compute_peaks(audio, sample_rate, PEAKS_PER_SECOND)
+        path = get_peaks_path(cache_key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "wb") as f:
+            np.save(f, np.array([sample_rate, sample_rate // PEAKS_PER_SECOND], dtype=np.int64))
+            np.save(f, peaks)
+        os.replace(temp_path, path)
+    except (OSError, ValueError) as e:
+        logger.warning("Failed to store waveform peaks of %s: %s", cache_key, e)
+
+
+def _read_array_header(f) -> tuple:
+    """Shape and dtype of the .npy array at the file position, which is left at its data."""
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, _fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+    else:
+        shape, _fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+    return shape, dtype
+
+
+def get_peaks_window(url: str = None, start: float = 0.0, end: float = None, cache_key: str = None):
+    """Waveform peaks of a video or upload between `start` and `end` seconds.
+
+    Only the requested bins are read from the stored array. Peaks are served
+    at the rate they were stored with.
+
+    Args:
+        url (str): The video URL.
+        start (float): Start of the window in seconds.
+        end (float): End of the window in seconds; the end of the media if None.
+        cache_key (str): Cache key of the media instead of `url`, e.g. the
+            "cache_key" of an upload's /transcribe response.
+
+    Returns:
+        dict: peaks_per_second, the start time of the first bin, and the
+            bins' "min" and "max" lists (-127 to 127). None when no peaks
+            are stored, since they are only computed when the audio is
+            decoded for Whisper.
+    """
+    try:
+        with open(get_peaks_path(cache_key or get_cache_key(url=url)), "rb") as f:
+            rate = np.load(f)
+            if rate.shape != (2,):
+                return None  # written before peaks recorded their rate
+            sample_rate, bin_size = int(rate[0]), int(rate[1])
+            (bins, _pair), dtype = _read_array_header(f)
+            if dtype != np.int8:
+                return None
+            per_second = sample_rate // bin_size
+
+            first = max(0, int(start * per_second))
+            last = bins if end is None else min(bins, math.ceil(end * per_second))
+            last = max(first, last)
+            f.seek(first * 2, os.SEEK_CUR)
+            window = np.frombuffer(f.read((last - first) * 2), dtype=np.int8).reshape(-1, 2)
+    except (OSError, ValueError):
+        return None
+
+    return {
+        "peaks_per_second": per_second,
+        "start": first / per_second,
+        "duration": bins / per_second,
+        "min": window[:, 0].tolist(),
+        "max": window[:, 1].tolist(),
+    }
@@ -0,0 +1,126 @@
+import gzip
+import json
+import zlib
+
+from fastapi.responses import Response
+
+from src.constants import BROTLI_QUALITY, COMPRESSION_MIN_BYTES, GZIP_LEVEL
+
+# Optional accelerators: orjson serializes caption lists several times faster
+# than the json module, and brotli compresses them tighter than gzip
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+def _default(value):
+    # numpy scalars and arrays from the quality assessment
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    """Serializes a response body to compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def supported_encodings() -> list:
+    """Content encodings this server can produce, most preferred first."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def choose_encoding(accept_encoding: str, encodings: list = None) -> str:
+    """Picks the preferred encoding the client accepts, or None for identity.
+
+    encodings limits the choice, most preferred first; by default every
+    supported encoding is considered.
+    """
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+
+    for encoding in encodings or supported_encodings():
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str, best: bool = False) -> bytes:
+    """Compresses a body; best=True spends more CPU for bodies stored and reused."""
+    if encoding == "br":
+        # Quality 10-11 takes seconds on hour-long transcripts for little gain
+        return brotli.compress(body, quality=9 if best else BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=9 if best else GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def gzip_stream(chunks):
+    """Gzip-compresses an iterable of byte chunks as they are produced."""
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def encode_variants(body: bytes) -> dict:
+    """The body in every supported encoding, keyed by encoding (None for identity)."""
+    variants = {None: body}
+    for encoding in supported_encodings():
+        variants[encoding] = compress(body, encoding, best=True)
+    return variants
+
+
+def encoded_response(body: bytes,
+                     encoding: str = None,
+                     status_code: int = 200,
+                     headers: dict = None) -> Response:
+    """A JSON response from `body` already compressed with `encoding` (None for identity)."""
+    headers = dict(headers or {}, Vary="Accept-Encoding")
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, status_code=status_code, headers=headers, media_type=JSON_MEDIA_TYPE)
+
+
+def json_response(content,
+                  accept_encoding: str = None,
+                  status_code: int = 200,
+                  headers: dict = None) -> Response:
+    """Serializes `content` once and compresses it if large and the client accepts it.
+
+    Returning this from a route also skips FastAPI's jsonable_encoder pass
+    over the caption list.
+    """
+    return body_response(dumps(content), accept_encoding, status_code, headers)
+
+
+def body_response(body: bytes,
+                  accept_encoding: str = None,
+                  status_code: int = 200,
+                  headers: dict = None) -> Response:
+    """A response from an already serialized JSON body, compressed like json_response."""
+    encoding = choose_encoding(accept_encoding) if len(body) >= COMPRESSION_MIN_BYTES else None
+    if encoding:
+        body = compress(body, encoding)
+    return encoded_response(body, encoding, status_code, headers)
@@ -0,0 +1,165 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from src.admission import AdmissionRejected
+from src.constants import (
+    SCRATCH_DOWNLOAD_RESERVE_BYTES,
+    SCRATCH_ORPHAN_SECONDS,
+    SCRATCH_QUOTA_BYTES,
+    SCRATCH_SWEEP_INTERVAL,
+    TS_DIR,
+)
+
+logger = logging.getLogger(__name__)
+
+# Names of the files scratch_path() creates start with this, so sweeping never
+# touches other files in the directory (e.g. the sample media benchmarks use)
+SCRATCH_PREFIX = "scratch-"
+
+
+class ScratchSpace:
+    """Owns the temporary files under a scratch directory.
+
+    Every temp file is created through scratch_path(), which removes it (and
+    any siblings yt-dlp or ffmpeg wrote next to it, such as ".part" files or
+    per-language subtitles) when the block exits, however it exits. New files
+    are refused once the directory's size plus the space reserved by files
+    being written would exceed the quota. Scratch files that no scratch_path()
+    owns are orphans of crashed runs and are removed by sweep_orphans().
+    """
+
+    def __init__(self,
+                 directory: str = TS_DIR,
+                 quota_bytes: int = SCRATCH_QUOTA_BYTES,
+                 orphan_seconds: float = SCRATCH_ORPHAN_SECONDS):
+        self.directory = directory
+        self.quota_bytes = quota_bytes
+        self.orphan_seconds = orphan_seconds
+        self._live = {}  # path -> bytes reserved for it
+        self._lock = threading.Lock()
+
+    def usage(self) -> int:
+        """Bytes currently used by files in the scratch directory."""
+        total = 0
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file():
+                            total += entry.stat().st_size
+                    except OSError:
+                        pass  # removed while scanning
+        except FileNotFoundError:
+            pass
+        return total
+
+    def _owned_by(self, name: str):
+        for path in self._live:
+            base = os.path.basename(path)
+            if name == base or name.startswith(base + "."):
+                return path
+        return None
+
+    def _reserved(self) -> int:
+        # Reservations count only for the part not yet written to disk
+        reserved = 0
+        for path, reserve_bytes in self._live.items():
+            written = os.path.getsize(path) if os.path.exists(path) else 0
+            reserved += max(0, reserve_bytes - written)
+        return reserved
+
+    @contextmanager
+    def scratch_path(self, suffix: str = "", reserve_bytes: int = 0, name: str = None):
+        """Reserves a fresh path in the scratch directory for the block.
+
+        Args:
+            suffix (str): File extension, e.g. ".mp4"; empty for a prefix
+                that tools extend themselves (e.g. "{path}.en.vtt").
+            reserve_bytes (int): Space the file is expected to take.
+            name (str): File name without prefix and suffix; a random UUID
+                by default.
+
+        Raises:
+            AdmissionRejected: When the reservation would exceed the quota.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{SCRATCH_PREFIX}{name or uuid.uuid4()}{suffix}")
+
+        with self._lock:
+            needed = self.usage() + self._reserved() + reserve_bytes
+            if needed > self.quota_bytes:
+                logger.warning("Scratch quota exceeded: %d of %d bytes needed", needed, self.quota_bytes)
+                raise AdmissionRejected("Scratch space is full", 503, SCRATCH_SWEEP_INTERVAL)
+            self._live[path] = reserve_bytes
+
+        try:
+            yield path
+        finally:
+            with self._lock:
+                del self._live[path]
+            self._remove_with_siblings(path)
+
+    def _remove_with_siblings(self, path: str):
+        base = os.path.basename(path)
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name == base or (name.startswith(base + ".") and not self._owned_by(name)):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def sweep_orphans(self) -> dict:
+        """Removes scratch files no scratch_path() owns that are older than orphan_seconds.
+
+        Only names with SCRATCH_PREFIX are considered. The age limit protects files that other processes sharing the
+        directory (e.g. prewarm.py) are still writing.
+        """
+        cutoff = time.time() - self.orphan_seconds
+        removed, freed = [], 0
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            entries = []
+
+        for entry in entries:
+            try:
+                if not entry.name.startswith(SCRATCH_PREFIX) or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                with self._lock:
+                    if self._owned_by(entry.name) or stat.st_mtime > cutoff:
+                        continue
+                os.remove(entry.path)
+            except OSError:
+                continue
+            removed.append(entry.name)
+            freed += stat.st_size
+
+        if removed:
+            logger.info("Swept %d orphaned scratch files (%d bytes)", len(removed), freed)
+        return {"removed": removed, "freed_bytes": freed}
+
+
+_scratch = ScratchSpace()
+
+
+def get_scratch_space() -> ScratchSpace:
+    return _scratch
+
+
+def scratch_path(suffix: str = "", reserve_bytes: int = 0, name: str = None):
+    """Context manager for a temp file under TS_DIR; see ScratchSpace.scratch_path."""
+    return _scratch.scratch_path(suffix, reserve_bytes, name)
+
+
+def download_path(name: str = None):
+    """Scratch path for a downloaded audio file, reserving the typical download size."""
+    return scratch_path(".mp4", SCRATCH_DOWNLOAD_RESERVE_BYTES, name)
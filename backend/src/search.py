@@ -0,0 +1,186 @@
+import logging
+import os
+import sqlite3
+import threading
+
+from src.constants import SEARCH_DB_PATH, SEARCH_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    cache_key TEXT PRIMARY KEY,
+    url TEXT,
+    filename TEXT,
+    method TEXT,
+    language TEXT,
+    cached_at TEXT
+);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    cache_key TEXT NOT NULL,
+    start_time REAL NOT NULL,
+    end_time REAL NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_by_video ON segments (cache_key);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    text, content='segments', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS segments_insert AFTER INSERT ON segments BEGIN
+    INSERT INTO segments_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_delete AFTER DELETE ON segments BEGIN
+    INSERT INTO segments_fts (segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+
+def phrase_query(text: str) -> str:
+    """An FTS5 query matching `text` as a phrase, whatever characters it has."""
+    return '"' + " ".join(text.split()).replace('"', '""') + '"'
+
+
+class SearchIndex:
+    """Full-text index of the captions of every cache entry (SQLite FTS5).
+
+    Each entry's captions are rows of `segments`, mirrored into the FTS5
+    table by triggers, so replacing or dropping an entry touches only its
+    own rows. save_to_cache and the cache deletions keep the index in step
+    with the cache; sync() catches up with entries written without it.
+    Index failures are logged and never fail the cache operation.
+    """
+
+    def __init__(self, path: str = SEARCH_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def update(self, cache_key: str, captions: list, metadata: dict = None, cached_at: str = None) -> None:
+        """Replaces the indexed captions of a cache entry."""
+        metadata = metadata or {}
+        try:
+            with self._lock:
+                connection = self._connect()
+                with connection:
+                    connection.execute("DELETE FROM segments WHERE cache_key = ?", (cache_key,))
+                    connection.execute(
+                        "INSERT OR REPLACE INTO videos VALUES (?, ?, ?, ?, ?, ?)",
+                        (cache_key, metadata.get("url"), metadata.get("filename"),
+                         metadata.get("method"), metadata.get("language"), cached_at))
+                    connection.executemany(
+                        "INSERT INTO segments (cache_key, start_time, end_time, text) VALUES (?, ?, ?, ?)",
+                        [(cache_key, caption["start"], caption["end"], caption["text"]) for caption in captions])
+        except sqlite3.Error as e:
+            logger.warning("Failed to index captions of %s: %s", cache_key, e)
+
+    def delete(self, cache_key: str) -> None:
+        """Drops a cache entry from the index."""
+        try:
+            with self._lock:
+                connection = self._connect()
+                with connection:
+                    connection.execute("DELETE FROM segments WHERE cache_key = ?", (cache_key,))
+                    connection.execute("DELETE FROM videos WHERE cache_key = ?", (cache_key,))
+        except sqlite3.Error as e:
+            logger.warning("Failed to drop %s from the search index: %s", cache_key, e)
+
+    def clear(self) -> None:
+        try:
+            with self._lock:
+                connection = self._connect()
+                with connection:
+                    connection.execute("DELETE FROM segments")
+                    connection.execute("DELETE FROM videos")
+        except sqlite3.Error as e:
+            logger.warning("Failed to clear the search index: %s", e)
+
+    def indexed_keys(self) -> set:
+        with self._lock:
+            return {row[0] for row in self._connect().execute("SELECT cache_key FROM videos")}
+
+    def sync(self, cache_keys, load) -> dict:
+        """Indexes cache entries missing from the index and drops removed ones.
+
+        Args:
+            cache_keys: Keys of every entry currently in the cache.
+            load: Callable returning the entry of a cache key.
+
+        Returns:
+            dict: Numbers of entries added and removed.
+        """
+        cache_keys = set(cache_keys)
+        indexed = self.indexed_keys()
+        added = 0
+        for cache_key in cache_keys - indexed:
+            try:
+                entry = load(cache_key)
+            except (OSError, ValueError) as e:
+                logger.warning("Skipping unreadable cache entry %s: %s", cache_key, e)
+                continue
+            self.update(cache_key, entry.get("captions", []), entry.get("metadata"), entry.get("cached_at"))
+            added += 1
+        for cache_key in indexed - cache_keys:
+            self.delete(cache_key)
+        return {"added": added, "removed": len(indexed - cache_keys)}
+
+    def search(self, query: str, offset: int = 0, limit: int = SEARCH_PAGE_SIZE) -> dict:
+        """Captions containing `query` as a phrase, best matches first.
+
+        Returns:
+            dict: The page of results, each with the video's cache key, URL
+                (or uploaded filename), language and the caption's start, end
+                and text, plus next_offset (None on the last page).
+        """
+        if not query or not query.strip():
+            return {"error": "Empty search query"}
+        try:
+            with self._lock:
+                rows = self._connect().execute(
+                    """
+                    SELECT s.cache_key, v.url, v.filename, v.language, s.start_time, s.end_time, s.text
+                    FROM segments_fts
+                    JOIN segments s ON s.id = segments_fts.rowid
+                    JOIN videos v ON v.cache_key = s.cache_key
+                    WHERE segments_fts MATCH ?
+                    ORDER BY rank
+                    LIMIT ? OFFSET ?
+                    """,
+                    (phrase_query(query), limit + 1, offset)).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("Search for %r failed: %s", query, e)
+            return {"error": f"Search failed: {e}"}
+
+        results = [
+            {"cache_key": cache_key, "url": url, "filename": filename, "language": language,
+             "start": start, "end": end, "text": text}
+            for cache_key, url, filename, language, start, end, text in rows[:limit]
+        ]
+        return {
+            "query": query,
+            "results": results,
+            "offset": offset,
+            "next_offset": offset + limit if len(rows) > limit else None,
+        }
+
+
+_search_index = SearchIndex()
+
+
+def get_search_index() -> SearchIndex:
+    return _search_index
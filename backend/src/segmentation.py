@@ -0,0 +1,187 @@
+from src.timing import timed
+
+SENTENCE_END = ".!?"
+
+
+def to_ms(seconds: float) -> int:
+    return int(round(seconds * 1000))
+
+
+def to_seconds(ms: int) -> float:
+    return round(ms / 1000, 3)
+
+
+def pack_words(words: list) -> dict:
+    """Packs word timings into the compact form stored in cache entries.
+
+    Args:
+        words (list): Dicts with "start" and "end" in seconds and "word", the
+            word text including its leading whitespace as emitted by Whisper.
+
+    Returns:
+        dict: Parallel "start"/"end" arrays in integer milliseconds and a
+            "text" array of words.
+    """
+    return {
+        "start": [to_ms(w["start"]) for w in words],
+        "end": [to_ms(w["end"]) for w in words],
+        "text": [w["word"] for w in words],
+    }
+
+
+def iter_words(words: dict):
+    """Yields (start_ms, end_ms, text) tuples from packed word timings."""
+    if not words:
+        return iter(())
+    return zip(words["start"], words["end"], words["text"])
+
+
+def _make_caption(start_ms: int, end_ms: int, text_parts: list) -> dict:
+    return {
+        "start": to_seconds(start_ms),
+        "end": to_seconds(end_ms),
+        "text": "".join(text_parts).strip(),
+    }
+
+
+def segment_words(words: dict,
+                  min_duration: float = 2.5,
+                  max_duration: float = 10.0,
+                  max_chars: int = 120,
+                  max_gap: float = 1.0) -> list:
+    """Builds shadowing captions from packed word timings.
+
+    A caption ends at a sentence boundary once it is at least min_duration
+    long, and is always broken before it would exceed max_duration or
+    max_chars, or at a pause of max_gap seconds or more.
+
+    Args:
+        words (dict): Packed word timings from pack_words().
+        min_duration (float): Shortest caption, in seconds, ended at a sentence boundary.
+        max_duration (float): Longest caption in seconds.
+        max_chars (int): Longest caption text in characters.
+        max_gap (float): Pause in seconds that always ends a caption.
+
+    Returns:
+        list: Captions with "start", "end" and "text" keys.
+    """
+    min_ms = to_ms(min_duration)
+    max_ms = to_ms(max_duration)
+    max_gap_ms = to_ms(max_gap)
+
+    captions = []
+    parts = []
+    start_ms = end_ms = 0
+    length = 0
+
+    for word_start, word_end, text in iter_words(words):
+        if parts:
+            at_sentence_end = parts[-1].rstrip().endswith(tuple(SENTENCE_END))
+            if (word_start - end_ms >= max_gap_ms
+                    or word_end - start_ms > max_ms
+                    or length + len(text) > max_chars
+                    or (at_sentence_end and end_ms - start_ms >= min_ms)):
+                captions.append(_make_caption(start_ms, end_ms, parts))
+                parts = []
+
+        if not parts:
+            start_ms = word_start
+            length = 0
+        parts.append(text)
+        end_ms = word_end
+        length += len(text)
+
+    if parts:
+        captions.append(_make_caption(start_ms, end_ms, parts))
+
+    return captions
+
+
+def splice_captions(captions: list, ranges: list, replacements: list) -> list:
+    """Replaces the captions that start inside the given time ranges.
+
+    Args:
+        captions (list): Original captions in time order.
+        ranges (list): (start, end) tuples in seconds to replace.
+        replacements (list): Captions covering those ranges, e.g. from Whisper.
+
+    Returns:
+        list: Captions outside the ranges plus the replacements, sorted by start.
+    """
+    def in_ranges(caption):
+        return any(start <= caption["start"] < end for start, end in ranges)
+
+    kept = [c for c in captions if not in_ranges(c)]
+    return sorted(kept + list(replacements), key=lambda c: c["start"])
+
+
+@timed("merge")
+def merge_short_captions(captions: list, min_duration: float = 2.5):
+    """Merge short caption segments into longer ones for better shadowing practice"""
+    if not captions:
+        return captions
+
+    # Work in integer milliseconds so durations and gaps compare exactly
+    min_ms = to_ms(min_duration)
+    merged = []
+    current_segment = {
+        "start": to_ms(captions[0]["start"]),
+        "end": to_ms(captions[0]["end"]),
+        "text": captions[0]["text"]
+    }
+
+    def finalize(segment):
+        return {
+            "start": to_seconds(segment["start"]),
+            "end": to_seconds(segment["end"]),
+            "text": segment["text"]
+        }
+
+    for i in range(1, len(captions)):
+        current_caption = {
+            "start": to_ms(captions[i]["start"]),
+            "end": to_ms(captions[i]["end"]),
+            "text": captions[i]["text"]
+        }
+        current_duration = current_segment["end"] - current_segment["start"]
+
+        # If current segment is too short, try to merge with next caption
+        if current_duration < min_ms:
+            # Check if there's a reasonable gap (less than 1 second)
+            gap = current_caption["start"] - current_segment["end"]
+            if gap < 1000:
+                # Merge the captions
+                current_segment["end"] = current_caption["end"]
+                current_segment["text"] += " " + current_caption["text"]
+            else:
+                # Gap is too large, finalize current segment and start new one
+                if current_duration >= 500:  # Only add if it's at least 0.5 seconds
+                    merged.append(finalize(current_segment))
+                current_segment = current_caption
+        else:
+            # Current segment is long enough, finalize it and start new one
+            merged.append(finalize(current_segment))
+            current_segment = current_caption
+
+    # Add the last segment if it's long enough
+    final_duration = current_segment["end"] - current_segment["start"]
+    if final_duration >= 500:
+        merged.append(finalize(current_segment))
+
+    return merged
+
+
+def segment_cached_captions(cached_data: dict, min_duration: float) -> list:
+    """The captions of a cache entry as served for `min_duration`.
+
+    Caption entries (and hybrid ones) store the unmerged captions, which are
+    merged here; Whisper entries are re-segmented from their word timings
+    when stored, otherwise served as they are.
+    """
+    metadata = cached_data.get("metadata") or {}
+    if metadata.get("method") in ("youtube_captions", "hybrid"):
+        return merge_short_captions(cached_data["captions"], min_duration=min_duration)
+    words = cached_data.get("words")
+    if words:
+        return segment_words(words, min_duration=min_duration)
+    return cached_data["captions"]
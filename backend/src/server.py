@@ -1,282 +1,245 @@
+import asyncio
+import functools
 import hashlib
+import logging
 import os
-import re
 import shutil
-import subprocess
-import uuid
 
 from fastapi import Body, File, UploadFile
 
-from src.assess_quality import assess_caption_quality
+from src.admission import AdmissionRejected, get_admission_controller
+from src.assess_quality import (
+    assess_caption_quality,
+    assess_caption_windows,
+    poor_quality_ranges,
+)
 from src.cache import (
     get_cache_key,
     get_cache_path,
+    get_negative_result,
     is_cached,
+    iter_cache_entries,
     load_from_cache,
+    open_captions_view,
+    save_negative_result,
     save_to_cache,
+    serves_language,
     get_file_hash,
 )
-from src.whisper_infer import transcribe_with_whisper
-
-TS_DIR = "transcribe"
-os.makedirs(TS_DIR, exist_ok=True)
-
-
-def merge_short_captions(captions: list, min_duration: float = 2.5):
-    """Merge short caption segments into longer ones for better shadowing practice"""
-    if not captions:
-        return captions
-
-    merged = []
-    current_segment = {
-        "start": captions[0]["start"],
-        "end": captions[0]["end"],
-        "text": captions[0]["text"]
-    }
-
-    for i in range(1, len(captions)):
-        current_caption = captions[i]
-        current_duration = current_segment["end"] - current_segment["start"]
-
-        # If current segment is too short, try to merge with next caption
-        if current_duration < min_duration:
-            # Check if there's a reasonable gap (less than 1 second)
-            gap = current_caption["start"] - current_segment["end"]
-            if gap < 1.0:
-                # Merge the captions
-                current_segment["end"] = current_caption["end"]
-                current_segment["text"] += " " + current_caption["text"]
-            else:
-                # Gap is too large, finalize current segment and start new one
-                if current_duration >= 0.5:  # Only add if it's at least 0.5 seconds
-                    merged.append(current_segment)
-                current_segment = {
-                    "start": current_caption["start"],
-                    "end": current_caption["end"],
-                    "text": current_caption["text"]
-                }
-        else:
-            # Current segment is long enough, finalize it and start new one
-            merged.append(current_segment)
-            current_segment = {
-                "start": current_caption["start"],
-                "end": current_caption["end"],
-                "text": current_caption["text"]
-            }
+from src.cancellation import JobCancelled
+from src.constants import (
+    CAPTION_LANGUAGES,
+    DEFAULT_CAPTION_LANGUAGE,
+    HYBRID_ENABLED,
+    HYBRID_MAX_POOR_FRACTION,
+    QUALITY_WINDOW_SECONDS,
+)
+from src.metrics import Counter
+from src.model_scheduler import get_model_scheduler
+from src.scratch import download_path, scratch_path
+from src.segmentation import merge_short_captions, segment_cached_captions, segment_words, splice_captions
+from src.stages import in_ingestion, run_stage
+from src.subtitles import parse_subtitle_file, timestamp_to_seconds
+from src.timing import span, timed
+from src.whisper_infer import transcribe_ranges, transcribe_with_budget
+from src.ytdlp import run_ytdlp
+
+logger = logging.getLogger(__name__)
+
+CACHE_REQUESTS = Counter(
+    "shadowing_cache_requests_total", "Caption requests served from the cache (hit) or not (miss), by method",
+    ("method", "result"))
+QUALITY_OUTCOMES = Counter(
+    "shadowing_caption_quality_outcomes_total",
+    "Smart extractions by what the caption quality assessment led to",
+    ("outcome",))
+
+
+def counts_cache_result(func):
+    """Decorator recording the cache hit or miss of a request handler's result."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        result = await func(*args, **kwargs)
+        if isinstance(result, dict) and "error" not in result and "cached" in result:
+            CACHE_REQUESTS.inc(method=result.get("method", "unknown"),
+                               result="hit" if result["cached"] else "miss")
+        return result
+    return wrapper
+
+
+def caption_languages(language: str) -> list:
+    """The requested language followed by the other configured CAPTION_LANGUAGES."""
+    return list(dict.fromkeys([language] + CAPTION_LANGUAGES))
+
+
+def fetch_caption_tracks(url: str, cache_key: str, languages: list):
+    """Downloads the subtitle tracks of all `languages` in one yt-dlp run.
+
+    Manual subtitles are preferred over auto-generated ones. Known failures
+    are answered from the negative cache, and new ones are recorded there;
+    missing captions are recorded for the first (requested) language only.
+
+    Returns:
+        tuple: (tracks, error). tracks map every requested language to its
+            parsed captions, an empty list when the video has none in it.
+    """
+    language = languages[0]
+    for reason, reason_language in (("unavailable", None), ("no_captions", language)):
+        negative = get_negative_result(cache_key, reason, reason_language)
+        if negative:
+            logger.info("Skipping caption extraction for %s (%s cached)", url, reason)
+            return None, negative["error"]
+
+    # First, try to get available captions
+    with span("list_subs"):
+        result = run_ytdlp("list_subs", ["--list-subs", url])
+
+    logger.debug("yt-dlp --list-subs finished", extra={
+        "url": url, "returncode": result.returncode, "stdout": result.stdout, "stderr": result.stderr})
 
-    # Add the last segment if it's long enough
-    final_duration = current_segment["end"] - current_segment["start"]
-    if final_duration >= 0.5:
-        merged.append(current_segment)
+    if result.returncode != 0:
+        logger.warning("Failed to get caption list for %s: %s", url, result.stderr.strip()[-500:])
+        save_negative_result(cache_key, "unavailable", "Failed to get caption list")
+        return None, "Failed to get caption list"
+
+    # Check if there are any captions available
+    if "No subtitles found" in result.stdout:
+        save_negative_result(cache_key, "no_captions", "No captions available for this video",
+                             language=language)
+        return None, "No captions available for this video"
+
+    # Download all requested tracks, named {prefix}.{language}.vtt so
+    # concurrent extractions never pick up each other's files; the scratch
+    # space removes them when done
+    with scratch_path() as prefix_path:
+        with span("caption_download"):
+            caption_result = run_ytdlp("subtitles", [
+                "--write-subs",
+                "--write-auto-subs",
+                "--sub-lang", ",".join(languages),
+                "--sub-format", "vtt",
+                "--skip-download",
+                "--output", f"{prefix_path}.%(ext)s",
+                url
+            ])
+
+        logger.debug("yt-dlp subtitle download finished", extra={
+            "url": url, "returncode": caption_result.returncode,
+            "stdout": caption_result.stdout, "stderr": caption_result.stderr})
+
+        caption_dir, prefix = os.path.split(prefix_path)
+        caption_files = sorted(f for f in os.listdir(caption_dir)
+                               if f.startswith(prefix + ".") and f.endswith(".vtt"))
+        logger.debug("Found caption files %s", caption_files)
+
+        tracks = {language: [] for language in languages}
+        for caption_file in caption_files:
+            track_language = caption_file[len(prefix) + 1:-len(".vtt")]
+            tracks[track_language] = parse_vtt_to_captions(os.path.join(caption_dir, caption_file))
+
+    if caption_result.returncode != 0 and not caption_files:
+        return None, f"Failed to download captions: {caption_result.stderr}"
+
+    if not caption_files:
+        save_negative_result(cache_key, "no_captions", "No caption files found after download attempt",
+                             language=language)
+        return None, "No caption files found after download attempt"
+
+    return tracks, None
+
+
+def get_caption_tracks(url: str, cache_key: str, language: str):
+    """Subtitle tracks of a video that include `language`.
+
+    They come from the video's cache entry when it already holds the language,
+    or knows the video has none in it; otherwise the language and the other
+    CAPTION_LANGUAGES are fetched and added to the cached tracks.
+
+    Returns:
+        tuple: (tracks, error, cached)
+    """
+    cached_tracks = {}
+    if is_cached(cache_key):
+        cached_tracks = load_from_cache(cache_key).get("tracks") or {}
+        if language in cached_tracks:
+            logger.debug("Using cached %s captions for %s", language, url, extra={"sample": "cache_hit"})
+            return cached_tracks, None, True
 
-    return merged
+    tracks, error = fetch_caption_tracks(url, cache_key, caption_languages(language))
+    if error:
+        return None, error, False
+    return {**cached_tracks, **tracks}, None, False
 
 
-def extract_youtube_captions(url: str):
+def extract_youtube_captions(url: str, language: str = DEFAULT_CAPTION_LANGUAGE):
     """Extracts captions from YouTube video without downloading the video."""
     try:
-        print(f"Attempting to extract captions from: {url}")
+        logger.debug("Extracting %s captions from %s", language, url)
 
         # Check cache first
         cache_key = get_cache_key(url=url)
         if is_cached(cache_key):
-            print(f"Using cached captions for URL: {url}")
             cached_data = load_from_cache(cache_key)
-            return cached_data["captions"], None
-
-        # First, try to get available captions
-        result = subprocess.run([
-            "yt-dlp",
-            "--list-subs",
-            url
-        ], capture_output=True, text=True)
-
-        print(f"List subs stdout: {result.stdout}")
-        print(f"List subs stderr: {result.stderr}")
-        print(f"List subs return code: {result.returncode}")
-
-        if result.returncode != 0:
-            return None, "Failed to get caption list"
-
-        # Check if there are any captions available
-        if "No subtitles found" in result.stdout:
-            return None, "No captions available for this video"
-
-        # Try to download the best available captions (prefer manual over auto-generated)
-        caption_result = subprocess.run([
-            "yt-dlp",
-            "--write-subs",
-            "--write-auto-subs",
-            "--sub-lang", "en",  # Prefer English
-            "--sub-format", "vtt",
-            "--skip-download",
-            "--output", os.path.join(TS_DIR, "%(id)s.%(ext)s"),
-            url
-        ], capture_output=True, text=True)
-
-        print(f"Download captions stdout: {caption_result.stdout}")
-        print(f"Download captions stderr: {caption_result.stderr}")
-        print(f"Download captions return code: {caption_result.returncode}")
-
-        if caption_result.returncode != 0:
-            return None, f"Failed to download captions: {caption_result.stderr}"
-
-        # Find the downloaded caption file
-        caption_files = [f for f in os.listdir(TS_DIR) if f.endswith('.vtt')]
-        print(f"Found caption files: {caption_files}")
-
-        if not caption_files:
-            return None, "No caption files found after download attempt"
-
-        # Use the most recent caption file
-        caption_file = os.path.join(TS_DIR, caption_files[-1])
-        print(f"Using caption file: {caption_file}")
-
-        # Parse VTT file and convert to our format
-        captions = parse_vtt_to_captions(caption_file)
-        print(f"Parsed {len(captions)} captions")
+            if serves_language(cached_data, language):
+                logger.debug("Using cached captions for %s", url, extra={"sample": "cache_hit"})
+                return cached_data["captions"], None
+
+        tracks, error, cached = get_caption_tracks(url, cache_key, language)
+        if error:
+            return None, error
+
+        captions = tracks[language]
+        if not captions:
+            return None, f"No {language} captions available for this video"
+        logger.debug("Parsed %d captions", len(captions))
 
         # Merge short captions into longer segments
         merged_captions = merge_short_captions(captions, min_duration=2.5)
-        print(f"Merged into {len(merged_captions)} segments")
+        logger.debug("Merged into %d segments", len(merged_captions))
+
+        # Another language's track of a cached video: served as is, since
+        # rewriting the entry would invalidate its ETags, stored responses
+        # and indexes on every language switch
+        if cached:
+            return merged_captions, None
 
-        # Cache the captions
+        # Cache the captions along with every downloaded track
         metadata = {
             "url": url,
             "method": "youtube_captions",
+            "language": language,
             "original_segments": len(captions),
             "merged_segments": len(merged_captions)
         }
-        save_to_cache(cache_key, merged_captions, metadata)
-
-        # Clean up the caption file
-        os.remove(caption_file)
+        save_to_cache(cache_key, merged_captions, metadata, tracks=tracks)
 
         return merged_captions, None
 
+    except JobCancelled:
+        raise
     except Exception as e:
-        print(f"Exception in extract_youtube_captions: {e}")
+        logger.exception("Caption extraction failed for %s", url)
         return None, f"Error extracting captions: {str(e)}"
 
 
+@timed("parse_captions")
 def parse_vtt_to_captions(vtt_file_path: str):
     """Parses VTT file and converts to our caption format"""
-    captions = []
-
-    try:
-        print(f"Parsing VTT file: {vtt_file_path}")
-
-        with open(vtt_file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        print(f"VTT file content length: {len(content)}")
-        print(f"First 500 chars of VTT: {content[:500]}")
-
-        # Split into caption blocks
-        blocks = content.strip().split('\n\n')
-        print(f"Found {len(blocks)} blocks in VTT file")
-
-        for i, block in enumerate(blocks):
-            lines = block.strip().split('\n')
-            print(f"Block {i}: {len(lines)} lines")
-
-            if len(lines) >= 2:
-                # Skip the "WEBVTT" header and metadata
-                if lines[0].startswith('WEBVTT') or lines[0].startswith('Kind:') or lines[0].startswith('Language:'):
-                    print(f"Block {i}: Skipping header/metadata")
-                    continue
-
-                # Look for timestamp line (should be the first line that contains -->)
-                timestamp_line = None
-                text_lines = []
-
-                for line in lines:
-                    if '-->' in line and timestamp_line is None:
-                        timestamp_line = line
-                    elif timestamp_line is not None:
-                        text_lines.append(line)
-
-                if timestamp_line:
-                    print(f"Block {i}: Timestamp line: {timestamp_line}")
-
-                    # Extract just the timestamp part (before any additional attributes)
-                    timestamp_part = timestamp_line.split(' ')[0] + ' --> ' + timestamp_line.split(' ')[2]
-                    time_match = re.match(r'(\d{2}:\d{2}:\d{2}\.\d{3}) --> (\d{2}:\d{2}:\d{2}\.\d{3})', timestamp_part)
-
-                    if time_match:
-                        start_time = time_match.group(1)
-                        end_time = time_match.group(2)
-
-                        # Convert timestamp to seconds
-                        start_seconds = timestamp_to_seconds(start_time)
-                        end_seconds = timestamp_to_seconds(end_time)
-
-                        # Clean up the text by removing styling tags and inline timestamps
-                        text = ' '.join(text_lines).strip()
-
-                        # Remove styling tags like <c>, </c>, <00:00:02.280>, etc.
-                        text = re.sub(r'<[^>]*>', '', text)
-
-                        # Clean up extra whitespace
-                        text = re.sub(r'\s+', ' ', text).strip()
-
-                        print(f"Block {i}: Start={start_seconds}, End={end_seconds}, Text='{text[:50]}...'")
-
-                        if text and len(text) > 1:  # Only add if there's actual text (more than 1 char)
-                            captions.append({
-                                "start": round(start_seconds, 2),
-                                "end": round(end_seconds, 2),
-                                "text": text
-                            })
-                            print(f"Block {i}: Added caption")
-                        else:
-                            print(f"Block {i}: No meaningful text, skipping")
-                    else:
-                        print(f"Block {i}: No timestamp match in '{timestamp_part}'")
-                else:
-                    print(f"Block {i}: No timestamp line found")
-            else:
-                print(f"Block {i}: Not enough lines ({len(lines)})")
-
-    except Exception as e:
-        print(f"Error parsing VTT file: {e}")
-
-    print(f"Final caption count: {len(captions)}")
-    return captions
+    return parse_subtitle_file(vtt_file_path)
 
 
-def timestamp_to_seconds(timestamp: str) -> float:
-    """Convert VTT timestamp (HH:MM:SS.mmm) to seconds"""
-    parts = timestamp.split(':')
-    hours = int(parts[0])
-    minutes = int(parts[1])
-    seconds = float(parts[2])
+@timed("duration_check")
+def check_video_for_whisper(url: str, cache_key: str):
+    """Checks that a video can be downloaded for Whisper, consulting and
+    updating the negative cache. Returns an error dict, or None if it can."""
+    for reason in ("unavailable", "too_long"):
+        negative = get_negative_result(cache_key, reason)
+        if negative:
+            logger.info("Skipping Whisper for %s (%s cached)", url, reason)
+            return {"error": negative["error"], "detail": negative["detail"], "cached": True}
 
-    return hours * 3600 + minutes * 60 + seconds
-
-
-async def fallback_to_whisper(url: str):
-    """Fallback function to use Whisper transcription"""
-    print(f"Falling back to Whisper for: {url}")
-
-    # Check cache first
-    cache_key = get_cache_key(url=url)
-    if is_cached(cache_key):
-        print(f"Using cached Whisper captions for URL: {url}")
-        cached_data = load_from_cache(cache_key)
-        return {
-            "captions": cached_data["captions"],
-            "method": "whisper_transcription",
-            "cached": True,
-            "metadata": cached_data.get("metadata", {})
-        }
-
-    # First, get video info to check duration
-    info_result = subprocess.run([
-        "yt-dlp",
-        "--get-duration",
-        url
-    ], capture_output=True, text=True)
+    # Get video info to check duration
+    info_result = run_ytdlp("duration", ["--get-duration", url])
 
     if info_result.returncode == 0:
         duration_str = info_result.stdout.strip()
@@ -292,49 +255,83 @@ async def fallback_to_whisper(url: str):
             else:
                 duration_minutes = float(parts[0]) / 60  # seconds to minutes
 
-            print(f"Video duration: {duration_minutes:.1f} minutes")
+            logger.debug("Video duration: %.1f minutes", duration_minutes)
 
             # Limit to 30 minutes for processing
             if duration_minutes > 30:
-                return {
+                error = {
                     "error": "Video too long (max 30 minutes allowed)",
                     "detail": f"Video is {duration_minutes:.1f} minutes long"
                 }
+                save_negative_result(cache_key, "too_long", error["error"], error["detail"])
+                return error
         except:
-            print("Could not parse video duration, proceeding anyway")
+            logger.warning("Could not parse video duration %r, proceeding anyway", duration_str)
 
-    video_id = str(uuid.uuid4())
-    file_path = os.path.join(TS_DIR, f"{video_id}.mp4")
+    return None
 
-    # Download audio-only to save bandwidth and storage
-    result = subprocess.run([
-        "yt-dlp",
+
+@timed("audio_download")
+def download_audio(url: str, file_path: str, cache_key: str = None):
+    """Downloads audio-only to save bandwidth and storage. Returns an error dict on failure."""
+    result = run_ytdlp("audio", [
         "-f", "bestaudio[ext=m4a]/bestaudio",  # Audio only
         "-o", file_path,
         url
-    ], capture_output=True)
+    ], text=False)
 
     if result.returncode != 0:
-        return {
+        error = {
             "error": "Failed to download video",
             "detail": result.stderr.decode(),
         }
+        if cache_key:
+            save_negative_result(cache_key, "unavailable", error["error"], error["detail"])
+        return error
+    return None
+
 
-    captions = transcribe_with_whisper(file_path)
+def whisper_admission():
+    """Slot for new Whisper work by the current client. Ingestion items wait
+    for one; API requests are rejected with AdmissionRejected when full."""
+    return get_admission_controller().admit(wait=in_ingestion())
+
+
+async def transcribe_url_with_whisper(url: str, cache_key: str, min_duration: float = None):
+    """Downloads a video's audio and transcribes it with Whisper, caching the result.
+
+    With `min_duration`, the returned captions are re-segmented from the word
+    timings like cache hits of smart extraction; the cache keeps Whisper's.
+    """
+    async with whisper_admission():
+        # Check cached failures and the video duration before downloading
+        duration_error = await run_stage("network", check_video_for_whisper, url, cache_key)
+        if duration_error:
+            return duration_error
+
+        # The downloaded file is removed when the block exits
+        with download_path() as file_path:
+            video_id = os.path.splitext(os.path.basename(file_path))[0]
+            download_error = await run_stage("network", download_audio, url, file_path, cache_key)
+            if download_error:
+                return download_error
+
+            # Run in a worker thread so concurrent requests can share Whisper batches
+            captions, words, backend = await run_stage(
+                "whisper", transcribe_with_budget, file_path, cache_key=cache_key)
 
     # Cache the captions
     metadata = {
         "url": url,
         "method": "whisper_transcription",
-        "video_id": video_id
+        "video_id": video_id,
+        "whisper_backend": backend.name,
+        "whisper_model": backend.model_name
     }
-    save_to_cache(cache_key, captions, metadata)
-
-    # Clean up the downloaded video file
-    if os.path.exists(file_path):
-        os.remove(file_path)
-        print(f"Cleaned up downloaded file: {file_path}")
+    save_to_cache(cache_key, captions, metadata, words=words)
 
+    if min_duration is not None and words:
+        captions = segment_words(words, min_duration=min_duration)
     return {
         "captions": captions,
         "method": "whisper_transcription",
@@ -343,162 +340,297 @@ async def fallback_to_whisper(url: str):
     }
 
 
-# Main API functions
-async def upload_video(file: UploadFile):
-    """Handle video upload and transcription"""
-    file_ext = os.path.splitext(file.filename)[1]
-    file_id = str(uuid.uuid4())
-    file_path = os.path.join(TS_DIR, f"{file_id}{file_ext}")
+async def fallback_to_whisper(url: str, min_duration: float = None):
+    """Fallback function to use Whisper transcription
+
+    Args:
+        url (str): The video URL.
+        min_duration (float): When given, captions are re-segmented from the
+            stored word timings with this minimum duration, as smart
+            extraction does for its cache hits.
+    """
+    logger.info("Falling back to Whisper for %s", url)
+
+    # Check cache first; an entry holding the YouTube captions we are
+    # replacing does not count
+    cache_key = get_cache_key(url=url)
+    if is_cached(cache_key):
+        cached_data = load_from_cache(cache_key)
+        if cached_data.get("metadata", {}).get("method") == "whisper_transcription":
+            logger.debug("Using cached Whisper captions for %s", url, extra={"sample": "cache_hit"})
+            captions = cached_data["captions"]
+            words = cached_data.get("words")
+            if min_duration is not None and words:
+                captions = segment_words(words, min_duration=min_duration)
+            return {
+                "captions": captions,
+                "method": "whisper_transcription",
+                "cached": True,
+                "metadata": cached_data.get("metadata", {})
+            }
+
+    return await transcribe_url_with_whisper(url, cache_key, min_duration)
+
+
+async def hybrid_transcribe(url: str,
+                            captions: list,
+                            poor_ranges: list,
+                            min_duration: float,
+                            quality_assessment: dict,
+                            language: str = DEFAULT_CAPTION_LANGUAGE):
+    """Re-transcribes only the poor-quality ranges of a video's YouTube captions
+    with Whisper and splices the results in."""
+    cache_key = get_cache_key(url=url)
+
+    async with whisper_admission():
+        # Check cached failures and the video duration before downloading
+        duration_error = await run_stage("network", check_video_for_whisper, url, cache_key)
+        if duration_error:
+            return duration_error
+
+        with download_path() as file_path:
+            download_error = await run_stage("network", download_audio, url, file_path, cache_key)
+            if download_error:
+                return download_error
+
+            whisper_captions, _words, backend = await run_stage(
+                "whisper", transcribe_ranges, file_path, poor_ranges, cache_key=cache_key)
+
+    spliced_captions = splice_captions(captions, poor_ranges, whisper_captions)
+    merged_captions = merge_short_captions(spliced_captions, min_duration=min_duration)
+
+    # Cache the spliced captions (before merging), like YouTube captions
+    metadata = {
+        "url": url,
+        "method": "hybrid",
+        "language": language,
+        "original_segments": len(spliced_captions),
+        "merged_segments": len(merged_captions),
+        "min_duration_used": min_duration,
+        "quality_assessment": quality_assessment,
+        "whisper_ranges": [[start, end] for start, end in poor_ranges],
+        "whisper_backend": backend.name,
+        "whisper_model": backend.model_name
+    }
+    save_to_cache(cache_key, spliced_captions, metadata)
+
+    return {
+        "captions": merged_captions,
+        "method": "hybrid",
+        "cached": False,
+        "quality_assessment": quality_assessment,
+        "metadata": metadata
+    }
 
-    with open(file_path, "wb") as f:
-        shutil.copyfileobj(file.file, f)
 
+# Main API functions
+async def transcribe_media_file(file_path: str,
+                                filename: str = None,
+                                file_hash: str = None,
+                                min_duration: float = 2.5):
+    """Transcribe a local media file, using the cache keyed by its content hash.
+
+    The file is left in place; callers own its cleanup.
+    """
     # Generate file hash for caching
-    file_hash = get_file_hash(file_path)
+    file_hash = file_hash or get_file_hash(file_path)
     cache_key = get_cache_key(file_hash=file_hash)
 
     # Check if captions are already cached
     if is_cached(cache_key):
-        print(f"Using cached captions for file hash: {file_hash}")
+        logger.debug("Using cached captions for file hash %s", file_hash, extra={"sample": "cache_hit"})
         cached_data = load_from_cache(cache_key)
-
-        # Clean up the uploaded file
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
+        metadata = cached_data.get("metadata", {})
+        captions = cached_data["captions"]
+        # Uploaded subtitles are cached before merging, like YouTube captions
+        if metadata.get("method") == "uploaded_subtitles":
+            captions = merge_short_captions(captions, min_duration=min_duration)
         return {
-            "captions": cached_data["captions"],
+            "captions": captions,
             "cached": True,
-            "metadata": cached_data.get("metadata", {})
+            "cache_key": cache_key,
+            "metadata": metadata
         }
 
     # Generate captions and cache them
-    print(f"Generating captions for file hash: {file_hash}")
-    captions = transcribe_with_whisper(file_path)
+    logger.info("Generating captions for file hash %s", file_hash)
+    async with whisper_admission():
+        # Run in a worker thread so concurrent requests can share Whisper batches
+        captions, words, backend = await run_stage(
+            "whisper", transcribe_with_budget, file_path, cache_key=cache_key)
 
     # Save to cache with metadata
     metadata = {
-        "filename": file.filename,
+        "filename": filename or os.path.basename(file_path),
         "file_size": os.path.getsize(file_path),
-        "method": "whisper_transcription"
+        "method": "whisper_transcription",
+        "whisper_backend": backend.name,
+        "whisper_model": backend.model_name
     }
-    save_to_cache(cache_key, captions, metadata)
-
-    # Clean up the uploaded file
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    save_to_cache(cache_key, captions, metadata, words=words)
 
     return {
         "captions": captions,
         "cached": False,
+        "cache_key": cache_key,
         "metadata": metadata
     }
 
 
-async def transcribe_youtube(url: str):
-    """Handle YouTube video transcription"""
-    # Check cache first
-    cache_key = get_cache_key(url=url)
-    if is_cached(cache_key):
-        print(f"Using cached captions for URL: {url}")
-        cached_data = load_from_cache(cache_key)
-        return {
-            "captions": cached_data["captions"],
-            "method": cached_data.get("metadata", {}).get("method", "unknown"),
-            "cached": True,
-            "metadata": cached_data.get("metadata", {})
-        }
-
-    # First, try to extract captions without downloading the video
-    captions, error = extract_youtube_captions(url)
-
-    if captions:
-        return {"captions": captions, "method": "youtube_captions", "cached": False}
+@counts_cache_result
+async def upload_video(file: UploadFile, subtitles: UploadFile = None, min_duration: float = 2.5):
+    """Handle video upload and transcription.
 
-    # If no captions available, fall back to downloading and transcribing
-    print(f"Falling back to video download: {error}")
+    With a VTT or SRT subtitle file alongside the media, its captions are used
+    unless their quality is poor, in which case the media is transcribed.
+    """
+    file_ext = os.path.splitext(file.filename)[1]
 
-    # Check video duration first
-    info_result = subprocess.run([
-        "yt-dlp",
-        "--get-duration",
-        url
-    ], capture_output=True, text=True)
+    # The uploaded file is removed when the block exits
+    with scratch_path(file_ext, reserve_bytes=file.size or 0) as file_path:
+        with open(file_path, "wb") as f:
+            shutil.copyfileobj(file.file, f)
 
-    if info_result.returncode == 0:
-        duration_str = info_result.stdout.strip()
-        try:
-            parts = duration_str.split(':')
-            if len(parts) == 3:
-                hours, minutes, seconds = map(int, parts)
-                duration_minutes = hours * 60 + minutes + seconds / 60
-            elif len(parts) == 2:
-                minutes, seconds = map(int, parts)
-                duration_minutes = minutes + seconds / 60
-            else:
-                duration_minutes = float(parts[0]) / 60
+        if subtitles is not None:
+            return await use_uploaded_subtitles(file_path, file.filename, subtitles, min_duration)
+        return await transcribe_media_file(file_path, file.filename, min_duration=min_duration)
 
-            print(f"Video duration: {duration_minutes:.1f} minutes")
 
-            if duration_minutes > 30:
-                return {
-                    "error": "Video too long (max 30 minutes allowed)",
-                    "detail": f"Video is {duration_minutes:.1f} minutes long"
-                }
-        except:
-            print("Could not parse video duration, proceeding anyway")
+async def use_uploaded_subtitles(file_path: str,
+                                 filename: str,
+                                 subtitles: UploadFile,
+                                 min_duration: float = 2.5):
+    """Caches the captions of an uploaded subtitle file for a media file,
+    falling back to Whisper when they are poor."""
+    file_hash = get_file_hash(file_path)
+    cache_key = get_cache_key(file_hash=file_hash)
+    if is_cached(cache_key):
+        return await transcribe_media_file(file_path, filename, file_hash, min_duration)
 
-    video_id = str(uuid.uuid4())
-    file_path = os.path.join(TS_DIR, f"{video_id}.mp4")
+    subtitle_ext = os.path.splitext(subtitles.filename or "")[1].lower()
+    if subtitle_ext not in (".vtt", ".srt"):
+        return {"error": "Subtitle file must be .vtt or .srt"}
 
-    # Download audio-only to save bandwidth and storage
-    result = subprocess.run([
-        "yt-dlp",
-        "-f", "bestaudio[ext=m4a]/bestaudio",  # Audio only
-        "-o", file_path,
-        url
-    ], capture_output=True)
+    with scratch_path(subtitle_ext, reserve_bytes=subtitles.size or 0) as subtitle_path:
+        with open(subtitle_path, "wb") as f:
+            shutil.copyfileobj(subtitles.file, f)
+        captions = parse_subtitle_file(subtitle_path)
 
-    if result.returncode != 0:
-        return {
-            "error": "Failed to download video",
-            "detail": result.stderr.decode(),
-        }
+    quality_assessment = assess_caption_quality(captions)
+    if quality_assessment["recommend_whisper"]:
+        logger.info("Uploaded subtitles for %s are unusable, transcribing with Whisper", filename)
+        result = await transcribe_media_file(file_path, filename, file_hash)
+        result["quality_assessment"] = quality_assessment
+        return result
 
-    captions = transcribe_with_whisper(file_path)
+    merged_captions = merge_short_captions(captions, min_duration=min_duration)
 
-    # Cache the captions
+    # Cache the original captions (before merging), like YouTube captions
     metadata = {
-        "url": url,
-        "method": "whisper_transcription",
-        "video_id": video_id
+        "filename": filename,
+        "subtitle_filename": subtitles.filename,
+        "file_size": os.path.getsize(file_path),
+        "method": "uploaded_subtitles",
+        "original_segments": len(captions),
+        "merged_segments": len(merged_captions),
+        "min_duration_used": min_duration,
+        "quality_assessment": quality_assessment
     }
     save_to_cache(cache_key, captions, metadata)
 
-    # Clean up the downloaded video file
-    if os.path.exists(file_path):
-        os.remove(file_path)
-        print(f"Cleaned up downloaded file: {file_path}")
-
     return {
-        "captions": captions,
-        "method": "whisper_transcription",
+        "captions": merged_captions,
+        "method": "uploaded_subtitles",
         "cached": False,
+        "quality_assessment": quality_assessment,
         "metadata": metadata
     }
 
 
-async def extract_youtube_captions_only(url: str):
+def open_cached_captions(url: str, language: str = DEFAULT_CAPTION_LANGUAGE, youtube_only: bool = False):
+    """Opens the entry of a cache hit whose captions are served as stored.
+
+    This covers the hits of transcribe_youtube and, with youtube_only,
+    extract_youtube_captions_only: neither re-merges the cached captions, so
+    their bytes can be sent without decoding the entry.
+
+    Returns:
+        CaptionsView: The open entry (the caller closes it), or None when
+            the request is not such a hit and goes through the handler.
+    """
+    view = open_captions_view(get_cache_key(url=url))
+    if view is None:
+        return None
+    method = view.metadata.get("method", "unknown")
+    if (youtube_only and method != "youtube_captions") or not serves_language({"metadata": view.metadata}, language):
+        view.close()
+        return None
+
+    logger.debug("Using cached captions for %s", url, extra={"sample": "cache_hit"})
+    CACHE_REQUESTS.inc(method=method, result="hit")
+    return view
+
+
+def serves_from_cache(url: str, language: str = DEFAULT_CAPTION_LANGUAGE, youtube_only: bool = False) -> bool:
+    """Whether a caption request for `url` is answered from its cache entry.
+
+    Mirrors the cache checks of the caption handlers (youtube_only for
+    extract_youtube_captions_only), so GET routes can serve hits without
+    starting a download or transcription on a miss.
+    """
+    cache_key = get_cache_key(url=url)
+    view = open_captions_view(cache_key)
+    if view is not None:
+        metadata = view.metadata
+        view.close()
+    elif is_cached(cache_key):
+        metadata = load_from_cache(cache_key).get("metadata") or {}
+    else:
+        return False
+    if youtube_only and metadata.get("method") != "youtube_captions":
+        return False
+    return serves_language({"metadata": metadata}, language)
+
+
+@counts_cache_result
+async def transcribe_youtube(url: str, language: str = DEFAULT_CAPTION_LANGUAGE):
+    """Handle YouTube video transcription"""
+    # Check cache first
+    cache_key = get_cache_key(url=url)
+    cached_data = load_from_cache(cache_key) if is_cached(cache_key) else None
+    if cached_data and serves_language(cached_data, language):
+        logger.debug("Using cached captions for %s", url, extra={"sample": "cache_hit"})
+        return {
+            "captions": cached_data["captions"],
+            "method": cached_data.get("metadata", {}).get("method", "unknown"),
+            "cached": True,
+            "metadata": cached_data.get("metadata", {})
+        }
+
+    # First, try to extract captions without downloading the video
+    captions, error = await run_stage("network", extract_youtube_captions, url, language)
+
+    if captions:
+        return {"captions": captions, "method": "youtube_captions", "cached": False}
+
+    # If no captions available, fall back to downloading and transcribing
+    logger.info("Falling back to video download for %s: %s", url, error)
+
+    return await transcribe_url_with_whisper(url, cache_key)
+
+
+@counts_cache_result
+async def extract_youtube_captions_only(url: str, language: str = DEFAULT_CAPTION_LANGUAGE):
     """Extracts only YouTube captions without fallback to video download."""
     # Check cache first
     cache_key = get_cache_key(url=url)
     if is_cached(cache_key):
-        print(f"Using cached captions for URL: {url}")
+        logger.debug("Using cached captions for %s", url, extra={"sample": "cache_hit"})
         cached_data = load_from_cache(cache_key)
         metadata = cached_data.get("metadata", {})
 
-        # Only return if cached data is from YouTube captions
-        if metadata.get("method") == "youtube_captions":
+        # Only return if cached data is from YouTube captions in this language
+        if metadata.get("method") == "youtube_captions" and serves_language(cached_data, language):
             return {
                 "captions": cached_data["captions"],
                 "method": "youtube_captions",
@@ -506,7 +638,7 @@ async def extract_youtube_captions_only(url: str):
                 "metadata": metadata
             }
 
-    captions, error = extract_youtube_captions(url)
+    captions, error = await run_stage("network", extract_youtube_captions, url, language)
 
     if error:
         return {"error": error}
@@ -518,154 +650,156 @@ async def extract_youtube_captions_only(url: str):
     }
 
 
-async def extract_youtube_captions_with_duration(url: str, min_duration: float = 2.5):
+@counts_cache_result
+async def extract_youtube_captions_with_duration(url: str,
+                                                 min_duration: float = 2.5,
+                                                 language: str = DEFAULT_CAPTION_LANGUAGE):
     """Extracts YouTube captions with custom minimum duration for merging."""
     try:
-        print(f"Attempting to extract captions from: {url} with min_duration: {min_duration}")
+        logger.debug("Extracting %s captions from %s with min_duration %s", language, url, min_duration)
 
         # Check cache first
         cache_key = get_cache_key(url=url)
         if is_cached(cache_key):
-            print(f"Using cached captions for URL: {url}")
             cached_data = load_from_cache(cache_key)
-            cached_captions = cached_data["captions"]
+            if serves_language(cached_data, language):
+                logger.debug("Using cached captions for %s", url, extra={"sample": "cache_hit"})
+                cached_captions = cached_data["captions"]
 
-            # Re-merge with the requested min_duration
-            merged_captions = merge_short_captions(cached_captions, min_duration=min_duration)
+                # Re-merge with the requested min_duration
+                merged_captions = merge_short_captions(cached_captions, min_duration=min_duration)
 
-            return {
-                "captions": merged_captions,
-                "method": "youtube_captions",
-                "cached": True,
-                "metadata": cached_data.get("metadata", {})
-            }
+                return {
+                    "captions": merged_captions,
+                    "method": "youtube_captions",
+                    "cached": True,
+                    "metadata": cached_data.get("metadata", {})
+                }
+
+        tracks, error, cached = await run_stage("network", get_caption_tracks, url, cache_key, language)
+        if error:
+            return {"error": error}
 
-        # First, try to get available captions
-        result = subprocess.run([
-            "yt-dlp",
-            "--list-subs",
-            url
-        ], capture_output=True, text=True)
-
-        if result.returncode != 0:
-            return {"error": "Failed to get caption list"}
-
-        # Check if there are any captions available
-        if "No subtitles found" in result.stdout:
-            return {"error": "No captions available for this video"}
-
-        # Try to download the best available captions
-        caption_result = subprocess.run([
-            "yt-dlp",
-            "--write-subs",
-            "--write-auto-subs",
-            "--sub-lang", "en",
-            "--sub-format", "vtt",
-            "--skip-download",
-            "--output", os.path.join(TS_DIR, "%(id)s.%(ext)s"),
-            url
-        ], capture_output=True, text=True)
-
-        if caption_result.returncode != 0:
-            return {"error": f"Failed to download captions: {caption_result.stderr}"}
-
-        # Find the downloaded caption file
-        caption_files = [f for f in os.listdir(TS_DIR) if f.endswith('.vtt')]
-        if not caption_files:
-            return {"error": "No caption files found after download attempt"}
-
-        # Use the most recent caption file
-        caption_file = os.path.join(TS_DIR, caption_files[-1])
-
-        # Parse VTT file and convert to our format
-        captions = parse_vtt_to_captions(caption_file)
-        print(f"Parsed {len(captions)} captions")
+        captions = tracks[language]
+        if not captions:
+            return {"error": f"No {language} captions available for this video", "cached": cached}
+        logger.debug("Parsed %d captions", len(captions))
 
         # Merge short captions into longer segments with custom duration
         merged_captions = merge_short_captions(captions, min_duration=min_duration)
-        print(f"Merged into {len(merged_captions)} segments with min_duration={min_duration}")
+        logger.debug("Merged into %d segments with min_duration %s", len(merged_captions), min_duration)
 
         # Cache the original captions (before merging) so we can re-merge with different durations
         metadata = {
             "url": url,
             "method": "youtube_captions",
+            "language": language,
             "original_segments": len(captions),
             "merged_segments": len(merged_captions),
             "min_duration_used": min_duration
         }
-        save_to_cache(cache_key, captions, metadata)  # Cache original captions, not merged ones
-
-        # Clean up the caption file
-        os.remove(caption_file)
+        # Another language's track of a cached video is served without
+        # rewriting the entry (see extract_youtube_captions)
+        if not cached:
+            save_to_cache(cache_key, captions, metadata, tracks=tracks)  # Cache original captions, not merged ones
 
         return {
             "captions": merged_captions,
             "method": "youtube_captions",
-            "cached": False,
+            "cached": cached,
             "metadata": metadata
         }
 
+    except JobCancelled:
+        raise
     except Exception as e:
         return {"error": f"Error extracting captions: {str(e)}"}
 
 
-async def smart_extract_captions(url: str, min_duration: float = 2.5):
+@counts_cache_result
+async def smart_extract_captions(url: str,
+                                 min_duration: float = 2.5,
+                                 language: str = DEFAULT_CAPTION_LANGUAGE):
     """Smart extraction: tries YouTube captions first, falls back to Whisper if quality is poor."""
     try:
-        print(f"Smart extraction for: {url} with min_duration: {min_duration}")
+        logger.debug("Smart extraction for %s with min_duration %s, language %s", url, min_duration, language)
 
         # Check cache first
         cache_key = get_cache_key(url=url)
-        if is_cached(cache_key):
-            print(f"Using cached captions for URL: {url}")
-            cached_data = load_from_cache(cache_key)
-            cached_captions = cached_data["captions"]
+        cached_data = load_from_cache(cache_key) if is_cached(cache_key) else None
+        if cached_data and serves_language(cached_data, language):
+            logger.debug("Using cached captions for %s", url, extra={"sample": "cache_hit"})
             metadata = cached_data.get("metadata", {})
 
-            # If cached captions are from YouTube, re-merge with requested duration
-            if metadata.get("method") == "youtube_captions":
-                merged_captions = merge_short_captions(cached_captions, min_duration=min_duration)
+            # Captions from YouTube (or spliced with Whisper) are re-merged
+            # with the requested duration, Whisper ones re-segmented from the
+            # stored word timings when available
+            merged_captions = segment_cached_captions(cached_data, min_duration)
+            if metadata.get("method") in ("youtube_captions", "hybrid"):
                 quality_assessment = assess_caption_quality(merged_captions)
 
                 return {
                     "captions": merged_captions,
-                    "method": "youtube_captions",
+                    "method": metadata["method"],
                     "cached": True,
                     "quality_assessment": quality_assessment,
                     "metadata": metadata
                 }
             else:
-                # Cached captions are from Whisper, return as-is
                 return {
-                    "captions": cached_captions,
+                    "captions": merged_captions,
                     "method": "whisper_transcription",
                     "cached": True,
                     "metadata": metadata
                 }
 
+        # Videos known to have no captions (or to be unavailable) skip the
+        # caption lookup; fallback_to_whisper fails fast on unavailable ones
+        if (get_negative_result(cache_key, "no_captions", language)
+                or get_negative_result(cache_key, "unavailable")):
+            logger.info("Skipping YouTube captions for %s (cached failure)", url)
+            return await fallback_to_whisper(url, min_duration)
+
         # First, try to get YouTube captions
-        captions, error = extract_youtube_captions(url)
+        captions, error = await run_stage("network", extract_youtube_captions, url, language)
 
         if error:
-            print(f"YouTube caption extraction failed: {error}")
+            logger.info("YouTube caption extraction failed for %s: %s", url, error)
             # Fall back to Whisper
-            return await fallback_to_whisper(url)
+            return await fallback_to_whisper(url, min_duration)
 
         # Assess the quality of YouTube captions
         quality_assessment = assess_caption_quality(captions)
-        print(f"Quality assessment: {quality_assessment}")
+        logger.debug("Quality assessment for %s", url, extra={"quality_assessment": quality_assessment})
 
         if quality_assessment["recommend_whisper"]:
-            print("YouTube captions quality is poor, falling back to Whisper")
-            return await fallback_to_whisper(url)
+            # Re-transcribe only the poor stretches when they are a minority
+            if HYBRID_ENABLED:
+                window_assessments = assess_caption_windows(
+                    captions, window_seconds=QUALITY_WINDOW_SECONDS)
+                poor_ranges = poor_quality_ranges(window_assessments)
+                poor_seconds = sum(end - start for start, end in poor_ranges)
+                total_seconds = captions[-1]["end"] - captions[0]["start"]
+                if poor_ranges and poor_seconds <= total_seconds * HYBRID_MAX_POOR_FRACTION:
+                    logger.info("Re-transcribing %d poor ranges (%.0fs of %.0fs) of %s with Whisper",
+                                len(poor_ranges), poor_seconds, total_seconds, url)
+                    QUALITY_OUTCOMES.inc(outcome="hybrid")
+                    return await hybrid_transcribe(
+                        url, captions, poor_ranges, min_duration, quality_assessment, language)
+
+            logger.info("YouTube captions of %s are poor, falling back to Whisper", url)
+            QUALITY_OUTCOMES.inc(outcome="whisper")
+            return await fallback_to_whisper(url, min_duration)
 
         # YouTube captions are good enough, merge them
+        QUALITY_OUTCOMES.inc(outcome="youtube_captions")
         merged_captions = merge_short_captions(captions, min_duration=min_duration)
 
         # Cache the original captions (before merging)
         metadata = {
             "url": url,
             "method": "youtube_captions",
+            "language": language,
             "original_segments": len(captions),
             "merged_segments": len(merged_captions),
             "min_duration_used": min_duration,
@@ -681,9 +815,83 @@ async def smart_extract_captions(url: str, min_duration: float = 2.5):
             "metadata": metadata
         }
 
-    except Exception as e:
-        print(f"Error in smart extraction: {e}")
-        return await fallback_to_whisper(url)
+    except (AdmissionRejected, JobCancelled):
+        raise
+    except Exception:
+        logger.exception("Smart extraction failed for %s", url)
+        return await fallback_to_whisper(url, min_duration)
+
+
+async def upgrade_cached_transcriptions(limit: int = 1):
+    """Re-transcribes URL entries made with a smaller model while Whisper is idle.
+
+    The latency-budget scheduler may pick a smaller model under load and
+    records it as "whisper_model" in the entry metadata. This pass redoes up
+    to `limit` of those entries with the largest configured model, stopping
+    as soon as other transcriptions are in flight. Each upgrade takes an
+    admission slot and scratch space like any other Whisper job.
+    """
+    scheduler = get_model_scheduler()
+    best_model = scheduler.models[-1]
+    upgraded = []
+
+    for cache_key, cached_data in iter_cache_entries():
+        if len(upgraded) >= limit:
+            break
+        if scheduler.queue_depth() > 0:
+            logger.info("Whisper is busy, postponing upgrade pass")
+            break
+
+        metadata = cached_data.get("metadata") or {}
+        url = metadata.get("url")
+        if metadata.get("method") != "whisper_transcription" or not url:
+            continue
+        if not scheduler.can_upgrade(metadata.get("whisper_model")):
+            continue
+
+        try:
+            async with whisper_admission():
+                with download_path() as file_path:
+                    if await run_stage("network", download_audio, url, file_path):
+                        logger.warning("Could not download %s for upgrade", url)
+                        continue
+                    captions, words, backend = await run_stage(
+                        "whisper", transcribe_with_budget, file_path,
+                        model_name=best_model, cache_key=cache_key)
+        except AdmissionRejected as e:
+            logger.warning("Postponing upgrade pass: %s", e)
+            break
+
+        logger.info("Upgraded %s from %s to %s", cache_key, metadata.get("whisper_model"), best_model)
+        metadata = dict(
+            metadata,
+            whisper_backend=backend.name,
+            whisper_model=backend.model_name,
+            upgraded_from=metadata.get("whisper_model"),
+        )
+        save_to_cache(cache_key, captions, metadata, words=words)
+        upgraded.append(cache_key)
+
+    return {"upgraded": upgraded, "model": best_model}
+
+
+# Batch ingestion functions
+async def start_ingest(urls: list = None,
+                       playlist_url: str = None,
+                       min_duration: float = 2.5,
+                       language: str = DEFAULT_CAPTION_LANGUAGE):
+    """Start pre-warming the cache for a list of URLs and/or a playlist"""
+    from src.ingest import start_job
+    return start_job(urls, playlist_url, min_duration, language)
+
+
+async def get_ingest_job(job_id: str):
+    """Get the per-item progress of a batch ingestion job"""
+    from src.ingest import get_job
+    job = get_job(job_id)
+    if job is None:
+        return {"error": "Ingest job not found"}
+    return job.to_dict()
 
 
 # Cache management functions
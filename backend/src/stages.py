@@ -0,0 +1,74 @@
+import asyncio
+import contextvars
+
+# Limits and progress record of the ingestion item the current task works on;
+# None for ordinary API requests, which run their stages unthrottled
+_current_item = contextvars.ContextVar("current_item", default=None)
+
+
+class StageLimits:
+    """Separate concurrency limits for network fetches (yt-dlp) and Whisper."""
+
+    def __init__(self, network: int, whisper: int):
+        self._semaphores = {
+            "network": asyncio.Semaphore(max(1, network)),
+            "whisper": asyncio.Semaphore(max(1, whisper)),
+        }
+
+    def semaphore(self, stage: str) -> asyncio.Semaphore:
+        return self._semaphores[stage]
+
+
+async def _to_thread(func, *args, **kwargs):
+    """asyncio.to_thread() that, when cancelled, returns only once the thread has.
+
+    A thread cannot be interrupted; it stops at its next check_cancelled().
+    Until then it still uses the admission slot and stage limit its caller
+    holds, so those are released only after it exits.
+    """
+    future = asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        while not future.done():
+            try:
+                await asyncio.wait({future})
+            except asyncio.CancelledError:
+                pass
+        future.exception()  # retrieved, e.g. JobCancelled, so it is not logged as unhandled
+        raise
+
+
+def set_current_item(limits: StageLimits, item: dict):
+    """Makes run_stage() calls in the current task honour `limits` and report
+    the stage they are in through item["stage"]."""
+    _current_item.set((limits, item))
+
+
+async def run_stage(stage: str, func, *args, **kwargs):
+    """Runs a blocking pipeline step in a worker thread.
+
+    Args:
+        stage (str): "network" for yt-dlp calls, "whisper" for transcription.
+        func: The blocking function to call with *args and **kwargs.
+
+    Returns:
+        Whatever func returns.
+    """
+    current = _current_item.get()
+    if current is None:
+        return await _to_thread(func, *args, **kwargs)
+
+    limits, item = current
+    item["stage"] = f"waiting_{stage}"
+    async with limits.semaphore(stage):
+        item["stage"] = stage
+        try:
+            return await _to_thread(func, *args, **kwargs)
+        finally:
+            item["stage"] = None
+
+
+def in_ingestion() -> bool:
+    """Whether the current task processes an ingestion item."""
+    return _current_item.get() is not None
@@ -0,0 +1,88 @@
+import logging
+import re
+
+# "00:01:02.500", "01:02.500" (VTT without hours) or "00:01:02,500" (SRT)
+TIMESTAMP = r"(?:\d+:)?\d{1,2}:\d{2}[.,]\d{1,3}"
+CUE_TIMING = re.compile(rf"^\s*({TIMESTAMP})\s*-->\s*({TIMESTAMP})")
+TAG = re.compile(r"<[^>]*>")
+WHITESPACE = re.compile(r"\s+")
+
+logger = logging.getLogger(__name__)
+
+
+def timestamp_to_seconds(timestamp: str) -> float:
+    """Convert a VTT (HH:MM:SS.mmm or MM:SS.mmm) or SRT (HH:MM:SS,mmm) timestamp to seconds"""
+    parts = timestamp.strip().replace(",", ".").split(":")
+    seconds = float(parts[-1])
+    minutes = int(parts[-2]) if len(parts) > 1 else 0
+    hours = int(parts[-3]) if len(parts) > 2 else 0
+
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def _make_caption(start: str, end: str, text_lines: list):
+    # Remove styling tags like <c>, </c>, <00:00:02.280>, <i> and extra whitespace
+    text = WHITESPACE.sub(" ", TAG.sub("", " ".join(text_lines))).strip()
+    if len(text) <= 1:  # Only keep cues with actual text (more than 1 char)
+        return None
+    return {
+        "start": round(timestamp_to_seconds(start), 2),
+        "end": round(timestamp_to_seconds(end), 2),
+        "text": text,
+    }
+
+
+def iter_subtitle_captions(lines):
+    """Yields captions from the lines of a VTT or SRT file, one cue at a time.
+
+    A cue starts at its timing line ("start --> end", with optional VTT cue
+    settings after it) and runs to the next blank line. Headers, cue
+    identifiers, SRT sequence numbers and NOTE/STYLE blocks have no timing
+    line and are skipped, so the whole file is never held in memory.
+
+    Args:
+        lines: Any iterable of text lines, e.g. an open file.
+
+    Yields:
+        dict: Captions with "start" and "end" in seconds and cleaned "text".
+    """
+    timing = None
+    text_lines = []
+
+    for line in lines:
+        line = line.strip()
+        if timing is None:
+            match = CUE_TIMING.match(line)
+            if match:
+                timing = match.groups()
+                text_lines = []
+        elif line:
+            text_lines.append(line)
+        else:
+            caption = _make_caption(*timing, text_lines)
+            if caption:
+                yield caption
+            timing = None
+
+    if timing is not None:
+        caption = _make_caption(*timing, text_lines)
+        if caption:
+            yield caption
+
+
+def parse_subtitle_file(file_path: str) -> list:
+    """Parses a VTT or SRT file into our caption format.
+
+    Returns the captions parsed before any read error, like the original VTT parser.
+    """
+    captions = []
+    try:
+        # utf-8-sig drops the byte order mark many SRT editors write
+        with open(file_path, "r", encoding="utf-8-sig", errors="replace") as f:
+            for caption in iter_subtitle_captions(f):
+                captions.append(caption)
+    except Exception as e:
+        logger.warning("Error parsing subtitle file %s: %s", file_path, e)
+
+    logger.debug("Parsed %d captions from %s", len(captions), file_path)
+    return captions
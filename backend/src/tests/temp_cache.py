@@ -0,0 +1,45 @@
+"""Points the cache at a temporary directory for the duration of a test."""
+
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from src.cache import setup_cache_directory
+from src.search import SearchIndex
+
+# Directories of src.cache, relative to CACHE_DIR
+_CACHE_DIRS = {
+    "CHUNK_CACHE_DIR": "chunks",
+    "NEGATIVE_CACHE_DIR": "negative",
+    "RESPONSE_CACHE_DIR": "responses",
+    "CAPTION_INDEX_DIR": "index",
+    "CLIP_CACHE_DIR": "clips",
+    "PEAKS_CACHE_DIR": "peaks",
+}
+
+
+def use_temporary_cache(test_case) -> SearchIndex:
+    """Redirects cache entries, their side files and the search index of a test.
+
+    Everything is removed when the test ends.
+
+    Returns:
+        SearchIndex: The test's search index, which cache writes update.
+    """
+    directory = tempfile.mkdtemp()
+    test_case.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+
+    search_index = SearchIndex(os.path.join(directory, "search.sqlite3"))
+    test_case.addCleanup(search_index.close)
+
+    patchers = [patch("src.cache.CACHE_DIR", directory),
+                patch("src.cache.get_search_index", return_value=search_index)]
+    patchers += [patch(f"src.cache.{name}", os.path.join(directory, subdirectory))
+                 for name, subdirectory in _CACHE_DIRS.items()]
+    for patcher in patchers:
+        patcher.start()
+        test_case.addCleanup(patcher.stop)
+
+    setup_cache_directory()
+    return search_index
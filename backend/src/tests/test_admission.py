@@ -0,0 +1,128 @@
+import asyncio
+import unittest
+
+from src.admission import AdmissionController, AdmissionRejected
+
+
+class TestAdmissionController(unittest.TestCase):
+    def test_per_client_limit_gives_429(self):
+        async def run_test():
+            controller = AdmissionController(max_active=4, max_queued=4, max_per_client=1)
+            async with controller.admit("alice"):
+                async with controller.admit("bob"):
+                    pass
+                with self.assertRaises(AdmissionRejected) as rejected:
+                    async with controller.admit("alice"):
+                        pass
+            return rejected.exception
+
+        rejected = asyncio.run(run_test())
+        self.assertEqual(rejected.status_code, 429)
+        self.assertGreaterEqual(rejected.retry_after, 1)
+
+    def test_full_queue_gives_503(self):
+        async def run_test():
+            controller = AdmissionController(max_active=1, max_queued=1, max_per_client=5)
+            release = asyncio.Event()
+
+            async def job(client):
+                async with controller.admit(client):
+                    await release.wait()
+
+            tasks = [asyncio.create_task(job("a")), asyncio.create_task(job("b"))]
+            await asyncio.sleep(0)
+            self.assertEqual((controller.active, controller.queued()), (1, 1))
+
+            with self.assertRaises(AdmissionRejected) as rejected:
+                async with controller.admit("c"):
+                    pass
+
+            release.set()
+            await asyncio.gather(*tasks)
+            self.assertEqual((controller.active, controller.queued()), (0, 0))
+            return rejected.exception
+
+        self.assertEqual(asyncio.run(run_test()).status_code, 503)
+
+    def test_waiting_clients_take_turns(self):
+        async def run_test():
+            controller = AdmissionController(max_active=1, max_queued=10, max_per_client=10)
+            order = []
+
+            async def job(client):
+                async with controller.admit(client):
+                    order.append(client)
+                    await asyncio.sleep(0)
+
+            # The first job holds the slot while the rest queue up
+            tasks = [asyncio.create_task(job(c)) for c in ["a", "a", "a", "a", "b", "c"]]
+            await asyncio.gather(*tasks)
+            return order
+
+        self.assertEqual(asyncio.run(run_test()), ["a", "a", "b", "c", "a", "a"])
+
+    def test_waiting_callers_skip_limits(self):
+        async def run_test():
+            controller = AdmissionController(max_active=1, max_queued=0, max_per_client=1)
+            done = []
+
+            async def job():
+                async with controller.admit("ingest", wait=True):
+                    await asyncio.sleep(0)
+                    done.append(True)
+
+            await asyncio.gather(job(), job(), job())
+            return len(done)
+
+        self.assertEqual(asyncio.run(run_test()), 3)
+
+    def test_ingestion_backlog_does_not_fill_the_queue(self):
+        async def run_test():
+            controller = AdmissionController(max_active=2, max_queued=4, max_per_client=2)
+            release = asyncio.Event()
+
+            async def job(client, wait):
+                async with controller.admit(client, wait=wait):
+                    await release.wait()
+
+            # A 20-URL ingest job of the same client as the learner
+            tasks = [asyncio.create_task(job("learner", True)) for _ in range(20)]
+            await asyncio.sleep(0)
+            self.assertEqual((controller.active, controller.queued()), (2, 18))
+            self.assertEqual(controller.queued(background=False), 0)
+
+            tasks.append(asyncio.create_task(job("learner", False)))
+            await asyncio.sleep(0)
+            self.assertEqual(controller.queued(background=False), 1)
+
+            release.set()
+            await asyncio.gather(*tasks)
+            return controller.active, controller.queued()
+
+        self.assertEqual(asyncio.run(run_test()), (0, 0))
+
+    def test_cancelled_waiter_leaves_queue(self):
+        async def run_test():
+            controller = AdmissionController(max_active=1, max_queued=5, max_per_client=5)
+            release = asyncio.Event()
+
+            async def job(client):
+                async with controller.admit(client):
+                    await release.wait()
+
+            holder = asyncio.create_task(job("a"))
+            waiter = asyncio.create_task(job("b"))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            self.assertEqual(controller.queued(), 0)
+
+            release.set()
+            await holder
+            return controller.active
+
+        self.assertEqual(asyncio.run(run_test()), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,7 +4,10 @@ from src.assess_quality import (
     count_short_segments,
     count_no_punctuation,
     count_unique_texts,
-    assess_caption_quality
+    assess_caption_quality,
+    assess_caption_windows,
+    poor_quality_ranges,
+    scan_captions,
 )
 
 
@@ -376,5 +379,85 @@ class TestAssessCaptionQuality(unittest.TestCase):
         self.assertGreaterEqual(result["quality_score"], 0)
 
 
+def good_captions(start, count=10):
+    return [
+        {"text": f"This is good sentence number {start + i}.", "start": start + i * 3.0,
+         "end": start + i * 3.0 + 2.5}
+        for i in range(count)
+    ]
+
+
+def poor_captions(start, count=10):
+    return [
+        {"text": "uh yeah so", "start": start + i * 0.5, "end": start + i * 0.5 + 0.4}
+        for i in range(count)
+    ]
+
+
+class TestAssessCaptionWindows(unittest.TestCase):
+    """Test cases for assess_caption_windows and poor_quality_ranges"""
+
+    def test_windows_are_assessed_separately(self):
+        captions = good_captions(0) + poor_captions(60) + good_captions(120)
+        windows = assess_caption_windows(captions, window_seconds=60)
+
+        self.assertEqual(len(windows), 3)
+        self.assertEqual([w["recommend_whisper"] for w in windows], [False, True, False])
+        self.assertEqual(windows[1]["start"], 60)
+        self.assertEqual(windows[1]["end"], 64.9)
+        self.assertEqual(windows[1]["segment_count"], 10)
+
+    def test_empty_windows_are_skipped(self):
+        captions = good_captions(0, count=2) + good_captions(300, count=2)
+        windows = assess_caption_windows(captions, window_seconds=60)
+        self.assertEqual(len(windows), 2)
+
+    def test_empty_captions(self):
+        self.assertEqual(assess_caption_windows([]), [])
+
+    def test_poor_ranges_merge_adjacent_windows(self):
+        captions = good_captions(0) + poor_captions(60) + poor_captions(120) + good_captions(180)
+        ranges = poor_quality_ranges(assess_caption_windows(captions, window_seconds=60))
+        self.assertEqual(ranges, [(60, 124.9)])
+
+    def test_poor_ranges_keep_separate_stretches(self):
+        captions = poor_captions(0) + good_captions(60) + poor_captions(120)
+        ranges = poor_quality_ranges(assess_caption_windows(captions, window_seconds=60))
+        self.assertEqual(ranges, [(0, 4.9), (120, 124.9)])
+
+    def test_no_poor_ranges(self):
+        captions = good_captions(0) + good_captions(60)
+        self.assertEqual(poor_quality_ranges(assess_caption_windows(captions)), [])
+
+
+class TestScanCaptions(unittest.TestCase):
+    """Test that the single-pass scan matches the individual counters"""
+
+    def test_matches_individual_counters(self):
+        captions = [
+            {"text": "Hello world this is a test", "start": 0, "end": 0.5},
+            {"text": "  hello world this is a test and more  ", "start": 0.5, "end": 2},
+            {"text": "No punctuation here", "start": 2, "end": 2.9},
+            {"text": "Question?", "start": 3, "end": 5},
+            {"text": "   ", "start": 5, "end": 6},
+            {"text": "Short", "start": 6, "end": 8},
+            {"text": "QUESTION?", "start": 8, "end": 8.2},
+        ]
+        self.assertEqual(scan_captions(captions), {
+            "overlapping_count": count_overlapping_text(captions),
+            "short_segments": count_short_segments(captions),
+            "no_punctuation_count": count_no_punctuation(captions),
+            "unique_texts": count_unique_texts(captions),
+        })
+
+    def test_empty_captions(self):
+        self.assertEqual(scan_captions([]), {
+            "overlapping_count": 0,
+            "short_segments": 0,
+            "no_punctuation_count": 0,
+            "unique_texts": 0,
+        })
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,95 @@
+import threading
+import unittest
+
+import numpy as np
+
+from src.batching import BatchScheduler, get_scheduler
+
+
+class RecordingBackend:
+    """Fake backend that records the size of every batch it runs."""
+
+    def __init__(self):
+        self.batch_sizes = []
+        self.release = threading.Event()
+
+    def transcribe_batch(self, audios):
+        self.release.wait(timeout=5)
+        self.batch_sizes.append(len(audios))
+        return [[{"start": 0.0, "end": len(a) / 16000, "text": str(len(a))}]
+                for a in audios]
+
+
+class ShortBackend:
+    """Fake backend that drops the last window of every batch."""
+
+    def transcribe_batch(self, audios):
+        return [[] for _ in audios[1:]]
+
+
+class FailingBackend:
+    def transcribe_batch(self, audios):
+        raise RuntimeError("model exploded")
+
+
+class TestBatchScheduler(unittest.TestCase):
+    def test_results_are_routed_to_each_request(self):
+        backend = RecordingBackend()
+        backend.release.set()
+        scheduler = BatchScheduler(backend, max_batch_size=8, max_wait_ms=50)
+
+        futures = [scheduler.submit(np.zeros(n * 16000, dtype=np.float32))
+                   for n in (1, 2, 3)]
+        texts = [f.result(timeout=5)[0]["text"] for f in futures]
+
+        self.assertEqual(texts, ["16000", "32000", "48000"])
+
+    def test_concurrent_windows_share_a_batch(self):
+        backend = RecordingBackend()
+        scheduler = BatchScheduler(backend, max_batch_size=4, max_wait_ms=200)
+
+        # The first batch blocks in the backend while more windows queue up
+        futures = [scheduler.submit(np.zeros(16000, dtype=np.float32)) for _ in range(5)]
+        backend.release.set()
+        for future in futures:
+            future.result(timeout=5)
+
+        self.assertEqual(sum(backend.batch_sizes), 5)
+        self.assertLessEqual(max(backend.batch_sizes), 4)
+        self.assertLess(len(backend.batch_sizes), 5)
+
+    def test_cancelled_windows_are_skipped(self):
+        backend = RecordingBackend()
+        scheduler = BatchScheduler(backend, max_batch_size=1, max_wait_ms=10)
+
+        # The first window blocks in the backend while the second is cancelled
+        first = scheduler.submit(np.zeros(16000, dtype=np.float32))
+        second = scheduler.submit(np.zeros(16000, dtype=np.float32))
+        self.assertTrue(second.cancel())
+        backend.release.set()
+        first.result(timeout=5)
+        scheduler.submit(np.zeros(16000, dtype=np.float32)).result(timeout=5)
+
+        self.assertEqual(backend.batch_sizes, [1, 1])
+
+    def test_backend_errors_propagate_to_callers(self):
+        scheduler = BatchScheduler(FailingBackend(), max_wait_ms=10)
+        future = scheduler.submit(np.zeros(16000, dtype=np.float32))
+        with self.assertRaises(RuntimeError):
+            future.result(timeout=5)
+
+    def test_missing_results_fail_every_window(self):
+        scheduler = BatchScheduler(ShortBackend(), max_batch_size=2, max_wait_ms=200)
+        futures = [scheduler.submit(np.zeros(16000, dtype=np.float32)) for _ in range(2)]
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=5)
+
+    def test_get_scheduler_is_shared_per_backend(self):
+        backend = RecordingBackend()
+        self.assertIs(get_scheduler(backend), get_scheduler(backend))
+        self.assertIsNot(get_scheduler(backend), get_scheduler(RecordingBackend()))
+
+
+if __name__ == "__main__":
+    unittest.main()
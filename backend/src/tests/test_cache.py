@@ -9,6 +9,9 @@ import json
 import os
 import unittest
 
+import numpy as np
+
+import src.cache
 from src.cache import (
     get_cache_key,
     get_cache_path,
@@ -19,10 +22,22 @@ from src.cache import (
     get_cache_info,
     clear_cache,
     delete_cache_entry,
+    get_chunk_key,
+    save_chunk_to_cache,
+    load_chunk_from_cache,
+    save_negative_result,
+    get_negative_result,
+    get_entry_etag,
+    get_caption_index_path,
+    open_captions_view,
+    sync_search_index,
+    serves_language,
 )
+from src.tests.temp_cache import use_temporary_cache
 
 class TestCacheFunctions(unittest.TestCase):
     def setUp(self):
+        self.search_index = use_temporary_cache(self)
         self.test_url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
         self.test_file_hash = "abc123def456"
         self.test_captions = [
@@ -39,11 +54,6 @@ class TestCacheFunctions(unittest.TestCase):
         self.cache_path = get_cache_path(self.url_cache_key)
 
     def tearDown(self):
-        # Clean up any cache files created
-        for key in [self.url_cache_key, self.file_cache_key]:
-            path = get_cache_path(key)
-            if os.path.exists(path):
-                os.remove(path)
         # Clean up test file if present
         if os.path.exists("test_file.txt"):
             os.remove("test_file.txt")
@@ -69,6 +79,38 @@ class TestCacheFunctions(unittest.TestCase):
         save_to_cache(self.url_cache_key, self.test_captions, self.test_metadata)
         self.assertTrue(is_cached(self.url_cache_key))
 
+    def test_entry_etag(self):
+        self.assertIsNone(get_entry_etag(self.url_cache_key, "smart", 2.5))
+
+        save_to_cache(self.url_cache_key, self.test_captions, self.test_metadata)
+        etag = get_entry_etag(self.url_cache_key, "smart", 2.5)
+        self.assertRegex(etag, r'^"[0-9a-f]{32}"$')
+        self.assertEqual(get_entry_etag(self.url_cache_key, "smart", 2.5), etag)
+        self.assertNotEqual(get_entry_etag(self.url_cache_key, "smart", 3.0), etag)
+
+        # Rewriting the entry changes its representations
+        save_to_cache(self.url_cache_key, self.test_captions + self.test_captions, self.test_metadata)
+        self.assertNotEqual(get_entry_etag(self.url_cache_key, "smart", 2.5), etag)
+
+    def test_captions_view_reads_stored_bytes(self):
+        self.assertIsNone(open_captions_view(self.url_cache_key))
+
+        save_to_cache(self.url_cache_key, self.test_captions, self.test_metadata)
+        view = open_captions_view(self.url_cache_key)
+        try:
+            self.assertEqual(view.metadata, self.test_metadata)
+            captions = b"".join(view.iter_captions(chunk_size=7))
+        finally:
+            view.close()
+        self.assertEqual(json.loads(captions), self.test_captions)
+        self.assertEqual(len(captions), view.captions_length)
+        self.assertNotIn("layout", load_from_cache(self.url_cache_key))
+
+    def test_captions_view_skips_unindexed_entries(self):
+        with open(get_cache_path(self.url_cache_key), "w") as f:
+            json.dump({"captions": self.test_captions, "metadata": self.test_metadata}, f)
+        self.assertIsNone(open_captions_view(self.url_cache_key))
+
     def test_save_and_load_from_cache(self):
         save_to_cache(self.url_cache_key, self.test_captions, self.test_metadata)
         loaded = load_from_cache(self.url_cache_key)
@@ -76,6 +118,39 @@ class TestCacheFunctions(unittest.TestCase):
         self.assertEqual(loaded["metadata"], self.test_metadata)
         self.assertIn("cached_at", loaded)
 
+    def test_save_and_load_words(self):
+        words = {"start": [0, 500], "end": [400, 1000], "text": [" Hello", " world"]}
+        save_to_cache(self.url_cache_key, self.test_captions, self.test_metadata, words=words)
+        loaded = load_from_cache(self.url_cache_key)
+        self.assertEqual(loaded["words"], words)
+
+    def test_save_without_words(self):
+        save_to_cache(self.url_cache_key, self.test_captions, self.test_metadata)
+        self.assertNotIn("words", load_from_cache(self.url_cache_key))
+
+    def test_tracks_survive_resaving_captions(self):
+        tracks = {"en": self.test_captions, "ko": []}
+        save_to_cache(self.url_cache_key, self.test_captions, self.test_metadata, tracks=tracks)
+        save_to_cache(self.url_cache_key, self.test_captions[:1], self.test_metadata)
+
+        loaded = load_from_cache(self.url_cache_key)
+        self.assertEqual(loaded["captions"], self.test_captions[:1])
+        self.assertEqual(loaded["tracks"], tracks)
+
+    def test_sync_drops_side_data_of_removed_entries(self):
+        save_to_cache(self.url_cache_key, self.test_captions, self.test_metadata)
+        save_to_cache(self.file_cache_key, self.test_captions, self.test_metadata)
+        cached_at = load_from_cache(self.url_cache_key)["cached_at"]
+        self.assertTrue(os.path.exists(get_caption_index_path(self.url_cache_key, cached_at)))
+
+        # Removed without delete_cache_entry
+        os.remove(get_cache_path(self.url_cache_key))
+        result = sync_search_index()
+
+        self.assertEqual((result["removed"], result["pruned_indexes"]), (1, 1))
+        self.assertFalse(os.path.exists(os.path.dirname(get_caption_index_path(self.url_cache_key, cached_at))))
+        self.assertEqual(self.search_index.indexed_keys(), {self.file_cache_key})
+
     def test_get_file_hash(self):
         # Create a test file
         test_content = "This is a test file for hash generation"
@@ -88,9 +163,72 @@ class TestCacheFunctions(unittest.TestCase):
         self.assertEqual(len(hash1), 64)
         int(hash1, 16)  # Should not raise
 
+    def test_serves_language(self):
+        self.assertTrue(serves_language({"metadata": {"method": "youtube_captions"}}, "en"))
+        self.assertFalse(serves_language({"metadata": {"method": "youtube_captions"}}, "ko"))
+        self.assertTrue(serves_language({"metadata": {"method": "whisper_transcription"}}, "ko"))
+
+
+class TestChunkCacheFunctions(unittest.TestCase):
+    def setUp(self):
+        use_temporary_cache(self)
+        self.samples = np.linspace(-1, 1, 16000, dtype=np.float32)
+        self.segments = [{"start": 0.0, "end": 1.0, "text": "Hello"}]
+        self.chunk_key = get_chunk_key(self.samples, "openai-whisper:base")
+
+    def test_chunk_key_depends_on_samples_and_model(self):
+        self.assertEqual(self.chunk_key, get_chunk_key(self.samples.copy(), "openai-whisper:base"))
+        self.assertNotEqual(self.chunk_key, get_chunk_key(self.samples, "openai-whisper:small"))
+        self.assertNotEqual(self.chunk_key, get_chunk_key(self.samples[1:], "openai-whisper:base"))
+
+    def test_save_and_load_chunk(self):
+        save_chunk_to_cache(self.chunk_key, self.segments)
+        self.assertEqual(load_chunk_from_cache(self.chunk_key), self.segments)
+
+    def test_load_chunk_miss(self):
+        self.assertIsNone(load_chunk_from_cache(self.chunk_key))
+
+
+class TestNegativeCacheFunctions(unittest.TestCase):
+    def setUp(self):
+        use_temporary_cache(self)
+        self.cache_key = get_cache_key(url="https://www.youtube.com/watch?v=negative")
+
+    def test_save_and_get_negative_result(self):
+        save_negative_result(self.cache_key, "no_captions", "No captions available for this video")
+        record = get_negative_result(self.cache_key, "no_captions")
+        self.assertEqual(record["error"], "No captions available for this video")
+        self.assertIsNone(record["detail"])
+
+    def test_reasons_are_independent(self):
+        save_negative_result(self.cache_key, "too_long", "Video too long", "Video is 45.0 minutes long")
+        self.assertIsNone(get_negative_result(self.cache_key, "no_captions"))
+        save_negative_result(self.cache_key, "no_captions", "No captions")
+        self.assertEqual(get_negative_result(self.cache_key, "too_long")["detail"],
+                         "Video is 45.0 minutes long")
+
+    def test_languages_are_independent(self):
+        save_negative_result(self.cache_key, "no_captions", "No captions", language="ko")
+        self.assertIsNotNone(get_negative_result(self.cache_key, "no_captions", "ko"))
+        self.assertIsNone(get_negative_result(self.cache_key, "no_captions", "en"))
+        self.assertIsNone(get_negative_result(self.cache_key, "no_captions"))
+
+    def test_expired_result_is_ignored(self):
+        save_negative_result(self.cache_key, "unavailable", "Failed", ttl=-1)
+        self.assertIsNone(get_negative_result(self.cache_key, "unavailable"))
+
+    def test_missing_result(self):
+        self.assertIsNone(get_negative_result(self.cache_key, "no_captions"))
+
+    def test_delete_cache_entry_clears_negative_results(self):
+        save_negative_result(self.cache_key, "no_captions", "No captions")
+        asyncio.run(delete_cache_entry(self.cache_key))
+        self.assertIsNone(get_negative_result(self.cache_key, "no_captions"))
+
 
 class TestAsyncCacheFunctions(unittest.TestCase):
     def setUp(self):
+        use_temporary_cache(self)
         self.test_url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
         self.test_captions = [
             {"start": 0.0, "end": 2.0, "text": "Hello world"},
@@ -103,12 +241,6 @@ class TestAsyncCacheFunctions(unittest.TestCase):
         }
         self.url_cache_key = get_cache_key(url=self.test_url)
 
-    def tearDown(self):
-        # Clean up any cache files created
-        path = get_cache_path(self.url_cache_key)
-        if os.path.exists(path):
-            os.remove(path)
-
     def test_get_cache_info_empty(self):
         """Test get_cache_info when cache is empty"""
         async def run_test():
@@ -183,6 +315,21 @@ class TestAsyncCacheFunctions(unittest.TestCase):
         
         asyncio.run(run_test())
 
+    def test_clips_are_removed_with_their_entry(self):
+        """Test that deleting or clearing the cache removes sentence clips"""
+        clip_dir = src.cache.CLIP_CACHE_DIR
+        os.makedirs(clip_dir)
+        other_key = get_cache_key(url="https://www.youtube.com/watch?v=other")
+        for name in (f"{self.url_cache_key}_0_2000.m4a", f"{other_key}_0_2000.m4a"):
+            open(os.path.join(clip_dir, name), "wb").close()
+        save_to_cache(self.url_cache_key, self.test_captions, self.test_metadata)
+
+        asyncio.run(delete_cache_entry(self.url_cache_key))
+        self.assertEqual(os.listdir(clip_dir), [f"{other_key}_0_2000.m4a"])
+
+        asyncio.run(clear_cache())
+        self.assertFalse(os.path.exists(clip_dir))
+
     def test_delete_cache_entry_not_found(self):
         """Test delete_cache_entry when entry doesn't exist"""
         async def run_test():
@@ -0,0 +1,122 @@
+import asyncio
+import contextvars
+import sys
+import threading
+import time
+import unittest
+
+from src.cancellation import (
+    CancelToken,
+    JobCancelled,
+    check_cancelled,
+    report_progress,
+    run_subprocess,
+    run_until_disconnected,
+    set_current_token,
+    uninterruptible,
+)
+
+
+def in_context(token, func, *args):
+    """Runs func with `token` as the current request's cancel token."""
+    context = contextvars.copy_context()
+    context.run(set_current_token, token)
+    return context.run(func, *args)
+
+
+class TestCancelToken(unittest.TestCase):
+    def test_cancel_sets_flag(self):
+        token = CancelToken(finish_fraction=0.8)
+        self.assertTrue(token.cancel())
+        self.assertTrue(token.cancelled)
+        with self.assertRaises(JobCancelled):
+            in_context(token, check_cancelled)
+
+    def test_nearly_complete_job_is_not_cancelled(self):
+        token = CancelToken(finish_fraction=0.8)
+        in_context(token, report_progress, 0.9)
+        self.assertFalse(token.cancel())
+        self.assertFalse(token.cancelled)
+
+    def test_uninterruptible_step_is_not_cancelled(self):
+        token = CancelToken()
+
+        def step():
+            with uninterruptible():
+                return token.cancel()
+
+        self.assertFalse(in_context(token, step))
+        self.assertTrue(token.cancel())
+        with self.assertRaises(JobCancelled):
+            in_context(token, step)
+
+    def test_no_token_never_cancels(self):
+        check_cancelled()
+        report_progress(0.5)
+
+
+class TestRunSubprocess(unittest.TestCase):
+    def test_plain_run_without_token(self):
+        result = run_subprocess([sys.executable, "-c", "print('hi')"], capture_output=True, text=True)
+        self.assertEqual((result.returncode, result.stdout), (0, "hi\n"))
+
+    def test_output_with_token(self):
+        result = in_context(CancelToken(), run_subprocess,
+                            [sys.executable, "-c", "print('hi')"], True, True)
+        self.assertEqual((result.returncode, result.stdout), (0, "hi\n"))
+
+    def test_cancelled_process_is_killed(self):
+        token = CancelToken()
+        threading.Timer(0.2, token.cancel).start()
+
+        started = time.monotonic()
+        with self.assertRaises(JobCancelled):
+            in_context(token, run_subprocess,
+                       [sys.executable, "-c", "import time; time.sleep(10)"], True)
+        self.assertLess(time.monotonic() - started, 5)
+
+
+class TestRunUntilDisconnected(unittest.TestCase):
+    def run_job(self, work, disconnect_after):
+        started = time.monotonic()
+
+        async def is_disconnected():
+            return time.monotonic() - started > disconnect_after
+
+        async def handler():
+            return await asyncio.to_thread(work)
+
+        return asyncio.run(run_until_disconnected(handler(), is_disconnected))
+
+    def test_result_is_returned(self):
+        self.assertEqual(self.run_job(lambda: "done", disconnect_after=60), "done")
+
+    def test_disconnect_cancels_work(self):
+        stopped = threading.Event()
+
+        def work():
+            while True:
+                try:
+                    check_cancelled()
+                except JobCancelled:
+                    stopped.set()
+                    raise
+                time.sleep(0.01)
+
+        result = self.run_job(work, disconnect_after=0.1)
+
+        self.assertIn("error", result)
+        self.assertTrue(stopped.wait(timeout=5))
+
+    def test_nearly_complete_work_finishes(self):
+        def work():
+            report_progress(0.95)
+            time.sleep(1.5)
+            check_cancelled()
+            return "cached"
+
+        self.assertEqual(self.run_job(work, disconnect_after=0.1), "cached")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import json
+import os
+import unittest
+
+import numpy as np
+
+from src.cache import (
+    get_cache_key,
+    get_cache_path,
+    get_caption_index_path,
+    open_captions_view,
+    save_to_cache,
+)
+from src.caption_window import get_caption_window, window_bounds
+from src.segmentation import merge_short_captions, pack_words, segment_words
+from src.tests.temp_cache import use_temporary_cache
+
+URL = "https://www.youtube.com/watch?v=window-test"
+
+
+class TestWindowBounds(unittest.TestCase):
+    def setUp(self):
+        self.starts = np.array([0.0, 2.0, 4.0, 6.0, 8.0])
+        self.ends = np.array([2.0, 4.0, 5.0, 8.0, 10.0])
+
+    def test_time_range(self):
+        self.assertEqual(window_bounds(self.starts, self.ends, 2.0, end=6.0), (1, 3))
+        self.assertEqual(window_bounds(self.starts, self.ends, 20.0, end=30.0), (5, 5))
+
+    def test_caption_showing_at_start_is_included(self):
+        self.assertEqual(window_bounds(self.starts, self.ends, 3.0, end=4.5), (1, 3))
+        # 5.5 falls in the gap between the third and fourth captions
+        self.assertEqual(window_bounds(self.starts, self.ends, 5.5, count=2), (3, 5))
+
+    def test_count_stops_at_the_last_caption(self):
+        self.assertEqual(window_bounds(self.starts, self.ends, 7.0, count=10), (3, 5))
+
+
+class TestGetCaptionWindow(unittest.TestCase):
+    def setUp(self):
+        use_temporary_cache(self)
+        self.cache_key = get_cache_key(url=URL)
+        self.captions = [{"start": float(i), "end": i + 1.0, "text": f"Zeile {i} – ü"} for i in range(100)]
+        self.metadata = {"method": "youtube_captions", "language": "en"}
+
+    def test_window_is_read_from_the_index(self):
+        save_to_cache(self.cache_key, self.captions, self.metadata)
+
+        window = json.loads(get_caption_window(URL, 10.5, end=13.0))
+        self.assertEqual(window["captions"], self.captions[10:13])
+        self.assertEqual(window["first"], 10)
+        self.assertEqual(window["total"], 100)
+        self.assertEqual(window["next_start"], 13.0)
+
+        last = json.loads(get_caption_window(URL, 98.0, count=5))
+        self.assertEqual(last["captions"], self.captions[98:])
+        self.assertIsNone(last["next_start"])
+
+    def test_rewriting_the_entry_replaces_its_index(self):
+        save_to_cache(self.cache_key, self.captions, self.metadata)
+        view = open_captions_view(self.cache_key)
+        view.close()
+
+        save_to_cache(self.cache_key, self.captions[:10], self.metadata)
+        self.assertFalse(os.path.exists(get_caption_index_path(self.cache_key, view.cached_at)))
+        self.assertEqual(json.loads(get_caption_window(URL, 0.0, count=50))["total"], 10)
+
+    def test_unindexed_entry_is_windowed_in_memory(self):
+        with open(get_cache_path(self.cache_key), "w") as f:
+            json.dump({"captions": self.captions[::-1], "metadata": self.metadata}, f)
+
+        window = json.loads(get_caption_window(URL, 10.0, count=3))
+        self.assertEqual(window["captions"], self.captions[10:13])
+        self.assertEqual(window["first"], 10)
+
+    def test_min_duration_windows_the_merged_captions(self):
+        save_to_cache(self.cache_key, self.captions, self.metadata)
+        merged = merge_short_captions(self.captions, min_duration=2.5)
+
+        window = json.loads(get_caption_window(URL, 0.0, count=3, min_duration=2.5))
+        self.assertEqual(window["captions"], merged[:3])
+        self.assertEqual(window["total"], len(merged))
+        self.assertEqual(window["next_start"], merged[3]["start"])
+
+    def test_min_duration_resegments_whisper_words(self):
+        words = pack_words([{"start": i / 2, "end": i / 2 + 0.4, "word": f" w{i}."} for i in range(40)])
+        save_to_cache(self.cache_key, self.captions[:20], {"method": "whisper_transcription"}, words=words)
+        segments = segment_words(words, min_duration=4.0)
+
+        window = json.loads(get_caption_window(URL, 0.0, count=100, min_duration=4.0))
+        self.assertEqual(window["captions"], segments)
+
+    def test_missing_captions_are_an_error(self):
+        self.assertIn("error", get_caption_window(URL, 0.0, count=3))
+
+        save_to_cache(self.cache_key, self.captions, self.metadata)
+        self.assertIn("error", get_caption_window(URL, 0.0, count=3, language="ko"))
+
+
+if __name__ == "__main__":
+    unittest.main()
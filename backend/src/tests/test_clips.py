@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.clips import ClipCache
+
+URL = "https://www.youtube.com/watch?v=clip-test"
+
+
+def fake_tools(clip_bytes=1000, ffmpeg_returncode=0):
+    def run(args, **kwargs):
+        if args[0] == "yt-dlp":
+            return MagicMock(returncode=0, stdout="https://media.example/audio\n", stderr="")
+        if ffmpeg_returncode == 0:
+            with open(args[-1], "wb") as f:
+                f.write(b"\0" * clip_bytes)
+        return MagicMock(returncode=ffmpeg_returncode, stdout="", stderr="Server returned 403")
+    return run
+
+
+@patch('src.cancellation.subprocess.run')
+class TestClipCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.clips = ClipCache(self.directory.name, max_bytes=2500)
+        patcher = patch('src.clips.is_cached', return_value=True)
+        self.is_cached = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def tools_called(self, mock_run):
+        return [call.args[0][0] for call in mock_run.call_args_list]
+
+    def test_clip_is_cut_once(self, mock_run):
+        mock_run.side_effect = fake_tools()
+
+        path = self.clips.get_clip(URL, 1.5, 4.25)
+        self.assertEqual(self.clips.get_clip(URL, 1.5, 4.25), path)
+        self.assertTrue(path.endswith("_1500_4250.m4a"))
+        self.assertEqual(os.path.getsize(path), 1000)
+
+        self.assertEqual(self.tools_called(mock_run), ["yt-dlp", "ffmpeg"])
+        ffmpeg_args = mock_run.call_args_list[1].args[0]
+        self.assertEqual(ffmpeg_args[ffmpeg_args.index("-ss") + 1], "1.500")
+        self.assertEqual(ffmpeg_args[ffmpeg_args.index("-t") + 1], "2.750")
+
+    def test_stream_url_is_reused_across_clips(self, mock_run):
+        mock_run.side_effect = fake_tools()
+
+        self.clips.get_clip(URL, 0.0, 2.0)
+        self.clips.get_clip(URL, 2.0, 4.0)
+        self.assertEqual(self.tools_called(mock_run), ["yt-dlp", "ffmpeg", "ffmpeg"])
+
+    def test_least_recently_served_clip_is_evicted(self, mock_run):
+        mock_run.side_effect = fake_tools()
+
+        first = self.clips.get_clip(URL, 0.0, 2.0)
+        second = self.clips.get_clip(URL, 2.0, 4.0)
+        os.utime(first, (0, 0))
+        os.utime(second, (1, 1))
+        self.clips.get_clip(URL, 0.0, 2.0)  # served again, now the most recent
+
+        third = self.clips.get_clip(URL, 4.0, 6.0)
+        self.assertTrue(os.path.exists(first))
+        self.assertFalse(os.path.exists(second))
+        self.assertTrue(os.path.exists(third))
+        self.assertLessEqual(self.clips.usage(), 2500)
+
+    def test_failed_cut_leaves_no_clip(self, mock_run):
+        mock_run.side_effect = fake_tools(ffmpeg_returncode=1)
+
+        result = self.clips.get_clip(URL, 0.0, 2.0)
+        self.assertEqual(result["error"], "Failed to cut audio clip")
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+        # The stream URL may have expired, so it is fetched again
+        self.clips.get_clip(URL, 0.0, 2.0)
+        self.assertEqual(self.tools_called(mock_run).count("yt-dlp"), 2)
+
+    def test_uncached_video_is_rejected(self, mock_run):
+        self.is_cached.return_value = False
+
+        self.assertIn("error", self.clips.get_clip(URL, 0.0, 2.0))
+        mock_run.assert_not_called()
+
+    def test_stream_urls_are_bounded(self, mock_run):
+        mock_run.side_effect = fake_tools()
+
+        with patch('src.clips.STREAM_URL_MAX_ENTRIES', 2):
+            for i in range(3):
+                self.clips.stream_url(f"{URL}{i}")
+        self.assertEqual(list(self.clips._stream_urls), [f"{URL}1", f"{URL}2"])
+
+        with patch('src.clips.time.monotonic', return_value=10.0 ** 9):
+            self.clips.stream_url(URL)
+        self.assertEqual(list(self.clips._stream_urls), [URL])
+
+    def test_invalid_ranges_are_rejected(self, mock_run):
+        self.assertIn("error", self.clips.get_clip(URL, 4.0, 2.0))
+        self.assertIn("error", self.clips.get_clip(URL, 0.0, 600.0))
+        mock_run.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+import os
+import unittest
+from unittest.mock import AsyncMock
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from src.cache import (
+    get_cache_key,
+    get_response_path,
+    open_captions_view,
+    prune_response_variants,
+    save_to_cache,
+)
+from src.http_cache import (
+    coded_etag,
+    conditional_captions,
+    etag_matches,
+    passthrough_response,
+    variant_min_duration,
+)
+from src.tests.temp_cache import use_temporary_cache
+
+URL = "https://www.youtube.com/watch?v=etag-test"
+
+
+class TestEtagMatches(unittest.TestCase):
+    def test_matches_any_listed_tag(self):
+        self.assertTrue(etag_matches('"a", "b"', '"b"'))
+        self.assertTrue(etag_matches('W/"b"', '"b"'))
+        self.assertTrue(etag_matches("*", '"b"'))
+        self.assertFalse(etag_matches('"a"', '"b"'))
+        self.assertFalse(etag_matches(None, '"b"'))
+
+    def test_each_coding_has_its_own_etag(self):
+        self.assertEqual(coded_etag('"abc"'), '"abc"')
+        self.assertEqual(coded_etag('"abc"', "gzip"), '"abc-gz"')
+        self.assertEqual(coded_etag('"abc"', "br"), '"abc-br"')
+        self.assertIsNone(coded_etag(None, "gzip"))
+
+
+class TestVariantMinDuration(unittest.TestCase):
+    def test_rounded_and_clamped(self):
+        self.assertEqual(variant_min_duration(2.5), 2.5)
+        self.assertEqual(variant_min_duration(2.5000001), 2.5)
+        self.assertEqual(variant_min_duration(2.46), 2.5)
+        self.assertEqual(variant_min_duration(-1), 0.0)
+        self.assertEqual(variant_min_duration(1e9), 30.0)
+
+
+class TestConditionalCaptions(unittest.TestCase):
+    def setUp(self):
+        use_temporary_cache(self)
+        self.produce = AsyncMock(return_value={"captions": [], "method": "youtube_captions", "cached": True})
+        self.hit = True
+        app = FastAPI()
+
+        @app.get("/captions")
+        async def captions(request: Request, min_duration: float = 2.5):
+            return await conditional_captions(request, URL, ("captions", min_duration), self.produce,
+                                              lambda: self.hit)
+
+        self.client = TestClient(app)
+
+    def test_miss_starts_no_work(self):
+        response = self.client.get("/captions")
+        self.assertEqual(response.status_code, 404)
+        self.assertIn("error", response.json())
+
+        # An entry the request is not answered from is a miss too
+        save_to_cache(get_cache_key(url=URL), [], {"method": "youtube_captions"})
+        self.hit = False
+        self.assertEqual(self.client.get("/captions").status_code, 404)
+        self.produce.assert_not_awaited()
+
+    def test_hit_is_revalidated_with_304(self):
+        save_to_cache(get_cache_key(url=URL), [], {"method": "youtube_captions"})
+
+        first = self.client.get("/captions")
+        etag = first.headers["etag"]
+        self.assertEqual(first.headers["cache-control"], "no-cache")
+
+        second = self.client.get("/captions", headers={"If-None-Match": etag})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(self.produce.await_count, 1)
+
+        # Other merge parameters are another representation
+        third = self.client.get("/captions?min_duration=4", headers={"If-None-Match": etag})
+        self.assertEqual(third.status_code, 200)
+        self.assertNotEqual(third.headers["etag"], etag)
+
+    def test_later_hits_send_the_stored_body(self):
+        save_to_cache(get_cache_key(url=URL), [], {"method": "youtube_captions"})
+        self.produce.return_value = {
+            "captions": [{"start": 0.0, "end": 2.0, "text": "Hello " * 300}],
+            "method": "youtube_captions",
+            "cached": True,
+        }
+
+        first = self.client.get("/captions")
+        second = self.client.get("/captions")
+        plain = self.client.get("/captions", headers={"Accept-Encoding": "identity"})
+
+        self.assertEqual(self.produce.await_count, 1)
+        self.assertEqual(second.headers["content-encoding"], "gzip")
+        self.assertEqual(second.headers["etag"], first.headers["etag"])
+        self.assertTrue(second.headers["etag"].endswith('-gz"'))
+        self.assertEqual(second.json(), self.produce.return_value)
+        self.assertNotIn("content-encoding", plain.headers)
+        self.assertEqual(plain.json(), first.json())
+        self.assertNotEqual(plain.headers["etag"], second.headers["etag"])
+
+        # The gzip ETag revalidates an identity request too
+        revalidated = self.client.get("/captions", headers={
+            "Accept-Encoding": "identity", "If-None-Match": second.headers["etag"]})
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.headers["etag"], plain.headers["etag"])
+
+    def test_oldest_representations_are_pruned(self):
+        cache_key = get_cache_key(url=URL)
+        save_to_cache(cache_key, [], {"method": "youtube_captions"})
+        etags = []
+        for i in range(4):
+            response = self.client.get(f"/captions?min_duration={i}",
+                                       headers={"Accept-Encoding": "identity"})
+            etags.append(response.headers["etag"])
+            path = get_response_path(cache_key, etags[-1])
+            os.utime(path, (i, i))
+
+        prune_response_variants(cache_key, keep=2)
+        stored = [os.path.exists(get_response_path(cache_key, etag)) for etag in etags]
+        self.assertEqual(stored, [False, False, True, True])
+
+    def test_rewritten_entry_drops_stored_bodies(self):
+        cache_key = get_cache_key(url=URL)
+        save_to_cache(cache_key, [], {"method": "youtube_captions"})
+        self.client.get("/captions")
+
+        save_to_cache(cache_key, [{"start": 0.0, "end": 1.0, "text": "New"}], {"method": "youtube_captions"})
+        self.client.get("/captions")
+        self.assertEqual(self.produce.await_count, 2)
+
+
+class TestPassthroughResponse(unittest.TestCase):
+    def setUp(self):
+        use_temporary_cache(self)
+        self.metadata = {"method": "youtube_captions", "language": "en"}
+        self.captions = [{"start": 0.0, "end": 2.0, "text": "Grüße " * 300}]
+        save_to_cache(get_cache_key(url=URL), self.captions, self.metadata)
+        app = FastAPI()
+
+        @app.get("/captions")
+        async def captions(request: Request):
+            return passthrough_response(request, open_captions_view(get_cache_key(url=URL)))
+
+        self.client = TestClient(app)
+
+    def test_body_is_the_cache_hit_result(self):
+        expected = {"captions": self.captions, "method": "youtube_captions", "cached": True,
+                    "metadata": self.metadata}
+
+        plain = self.client.get("/captions", headers={"Accept-Encoding": "identity"})
+        self.assertEqual(plain.json(), expected)
+        self.assertEqual(int(plain.headers["content-length"]), len(plain.content))
+        self.assertNotIn("content-encoding", plain.headers)
+
+        compressed = self.client.get("/captions", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(compressed.headers["content-encoding"], "gzip")
+        self.assertEqual(compressed.json(), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.ingest import IngestJob, expand_playlist, get_job, start_job
+import src.timing as timing
+from src.stages import StageLimits, run_stage, set_current_item
+from src.timing import span
+
+
+class ConcurrencyProbe:
+    """Blocking stage function that records how many calls overlap."""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, *args):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.02)
+        with self._lock:
+            self.active -= 1
+
+
+class TestRunStage(unittest.TestCase):
+    def test_runs_unthrottled_outside_ingestion(self):
+        self.assertEqual(asyncio.run(run_stage("network", lambda x: x * 2, 21)), 42)
+
+    def test_cancelled_stage_waits_for_its_thread(self):
+        finished = threading.Event()
+
+        def blocking():
+            time.sleep(0.2)
+            finished.set()
+
+        async def run_test():
+            task = asyncio.create_task(run_stage("whisper", blocking))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            return finished.is_set()
+
+        self.assertTrue(asyncio.run(run_test()))
+
+    def test_limits_each_stage_separately(self):
+        network, whisper = ConcurrencyProbe(), ConcurrencyProbe()
+
+        async def item_task(limits, item):
+            set_current_item(limits, item)
+            await run_stage("network", network)
+            await run_stage("whisper", whisper)
+
+        async def run_test():
+            limits = StageLimits(network=3, whisper=1)
+            await asyncio.gather(*(item_task(limits, {}) for _ in range(6)))
+
+        asyncio.run(run_test())
+        self.assertEqual(network.peak, 3)
+        self.assertEqual(whisper.peak, 1)
+
+
+class TestIngestJob(unittest.TestCase):
+    def run_job(self, job, smart_extract):
+        with patch('src.server.smart_extract_captions', side_effect=smart_extract):
+            asyncio.run(job.run())
+        return job.to_dict()
+
+    def test_items_report_their_outcome(self):
+        async def smart_extract(url, min_duration, language):
+            if url.endswith("bad"):
+                return {"error": "No captions available for this video"}
+            return {"captions": [{"start": 0, "end": 1, "text": "Hi"}],
+                    "method": "youtube_captions", "cached": url.endswith("cached")}
+
+        job = IngestJob(["https://youtu.be/good", "https://youtu.be/bad", "https://youtu.be/cached"])
+        progress = self.run_job(job, smart_extract)
+
+        self.assertEqual(progress["status"], "finished")
+        self.assertEqual(progress["counts"], {"done": 1, "failed": 1, "cached": 1})
+        good, bad, cached = progress["items"]
+        self.assertEqual(good["method"], "youtube_captions")
+        self.assertEqual(good["segments"], 1)
+        self.assertEqual(bad["error"], "No captions available for this video")
+        self.assertTrue(cached["cached"])
+
+    def test_whisper_limit_applies_across_items(self):
+        probe = ConcurrencyProbe()
+
+        async def smart_extract(url, min_duration, language):
+            await run_stage("whisper", probe)
+            return {"captions": [], "method": "whisper_transcription", "cached": False}
+
+        job = IngestJob([f"https://youtu.be/{i}" for i in range(5)], network=4, whisper=2)
+        progress = self.run_job(job, smart_extract)
+
+        self.assertEqual(progress["counts"], {"done": 5})
+        self.assertEqual(probe.peak, 2)
+
+    @patch('src.cancellation.subprocess.run')
+    def test_playlist_is_expanded(self, mock_run):
+        mock_run.return_value = MagicMock(
+            returncode=0, stdout="https://youtu.be/a\nhttps://youtu.be/b\n", stderr="")
+
+        async def smart_extract(url, min_duration, language):
+            return {"captions": [], "method": "youtube_captions", "cached": False}
+
+        job = IngestJob([], playlist_url="https://youtube.com/playlist?list=x")
+        progress = self.run_job(job, smart_extract)
+
+        self.assertEqual([item["url"] for item in progress["items"]],
+                         ["https://youtu.be/a", "https://youtu.be/b"])
+
+    @patch('src.cancellation.subprocess.run')
+    def test_playlist_failure_fails_job(self, mock_run):
+        mock_run.return_value = MagicMock(returncode=1, stdout="", stderr="ERROR: not found")
+
+        job = IngestJob([], playlist_url="https://youtube.com/playlist?list=x")
+        progress = self.run_job(job, None)
+
+        self.assertEqual(progress["status"], "failed")
+        self.assertIn("not found", progress["error"])
+
+
+class TestStartJob(unittest.TestCase):
+    def test_requires_urls_or_playlist(self):
+        async def run_test():
+            return start_job([], None)
+
+        self.assertIn("error", asyncio.run(run_test()))
+
+    def test_job_is_not_timed_into_the_starting_request(self):
+        request_spans = []
+
+        async def smart_extract(url, min_duration, language):
+            with span("list_subs"):
+                pass
+            return {"captions": [], "method": "youtube_captions", "cached": True}
+
+        async def run_test():
+            timing._current_spans.set(request_spans)
+            with patch('src.server.smart_extract_captions', side_effect=smart_extract):
+                progress = start_job(["https://youtu.be/a"])
+                await get_job(progress["job_id"]).task
+
+        asyncio.run(run_test())
+        self.assertEqual(request_spans, [])
+
+    def test_job_is_registered(self):
+        async def run_test():
+            with patch('src.ingest.IngestJob.run', new_callable=AsyncMock):
+                progress = start_job(["https://youtu.be/a", "https://youtu.be/a"])
+            return progress
+
+        progress = asyncio.run(run_test())
+        self.assertEqual(progress["total"], 1)
+        self.assertIsNotNone(get_job(progress["job_id"]))
+
+    @patch('src.cancellation.subprocess.run')
+    def test_expand_playlist_skips_blank_lines(self, mock_run):
+        mock_run.return_value = MagicMock(returncode=0, stdout="a\n\nb\n", stderr="")
+        self.assertEqual(expand_playlist("playlist"), ["a", "b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
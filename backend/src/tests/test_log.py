@@ -0,0 +1,81 @@
+import io
+import json
+import logging
+import sys
+import unittest
+from unittest.mock import patch
+
+from src.log import JsonFormatter, SamplingFilter, setup_logging, shutdown_logging
+
+
+def make_record(message="Parsed %d captions", args=(3,), **extra):
+    record = logging.LogRecord("src.server", logging.INFO, __file__, 1, message, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class TestJsonFormatter(unittest.TestCase):
+    def test_extra_fields_become_keys(self):
+        line = JsonFormatter().format(make_record(url="https://youtu.be/x", stages={"list_subs": 812.4}))
+        entry = json.loads(line)
+
+        self.assertEqual(entry["message"], "Parsed 3 captions")
+        self.assertEqual(entry["level"], "INFO")
+        self.assertEqual(entry["logger"], "src.server")
+        self.assertEqual(entry["url"], "https://youtu.be/x")
+        self.assertEqual(entry["stages"], {"list_subs": 812.4})
+        self.assertNotIn("args", entry)
+
+    def test_exception_is_included(self):
+        try:
+            raise ValueError("bad caption")
+        except ValueError:
+            record = logging.LogRecord("src.server", logging.ERROR, __file__, 1, "failed", (),
+                                       sys.exc_info())
+        entry = json.loads(JsonFormatter().format(record))
+        self.assertIn("ValueError: bad caption", entry["exception"])
+
+
+class TestSetupLogging(unittest.TestCase):
+    def setUp(self):
+        root = logging.getLogger()
+        self.addCleanup(setattr, root, "handlers", list(root.handlers))
+        self.addCleanup(root.setLevel, root.level)
+
+    def test_exception_survives_the_queue(self):
+        stdout = io.StringIO()
+        with patch("sys.stdout", stdout):
+            setup_logging(level="INFO", fmt="json")
+        try:
+            raise ValueError("bad caption")
+        except ValueError:
+            logging.getLogger("src.server").exception("Failed for %s", "https://youtu.be/x")
+        shutdown_logging()
+
+        entry = json.loads(stdout.getvalue().splitlines()[-1])
+        self.assertEqual(entry["message"], "Failed for https://youtu.be/x")
+        self.assertIn("ValueError: bad caption", entry["exception"])
+
+
+class TestSamplingFilter(unittest.TestCase):
+    def test_keeps_one_in_every_per_key(self):
+        sampling = SamplingFilter(every=10)
+        kept = [sampling.filter(make_record(sample="cache_hit")) for _ in range(25)]
+        other = [sampling.filter(make_record(sample="chunk")) for _ in range(5)]
+
+        self.assertEqual(kept.count(True), 3)
+        self.assertTrue(kept[0])
+        self.assertEqual(other.count(True), 1)
+
+    def test_unsampled_records_always_pass(self):
+        sampling = SamplingFilter(every=10)
+        self.assertTrue(all(sampling.filter(make_record()) for _ in range(5)))
+
+    def test_kept_record_says_how_many_it_stands_for(self):
+        record = make_record(sample="cache_hit")
+        SamplingFilter(every=10).filter(record)
+        self.assertEqual(record.sampled, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
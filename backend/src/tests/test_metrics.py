@@ -0,0 +1,69 @@
+import subprocess
+import unittest
+from unittest.mock import patch
+
+from src.metrics import Counter, Gauge, Histogram, render
+from src.ytdlp import YTDLP_CALLS, YTDLP_SECONDS, run_ytdlp
+
+
+class TestMetrics(unittest.TestCase):
+    def test_counter_renders_labelled_samples(self):
+        counter = Counter("requests_total", "Requests", ("method", "result"), register=False)
+        counter.inc(method="whisper", result="hit")
+        counter.inc(2, method="whisper", result="hit")
+        counter.inc(method='say "hi"', result="miss")
+
+        self.assertEqual(render([counter]), (
+            "# HELP requests_total Requests\n"
+            "# TYPE requests_total counter\n"
+            'requests_total{method="whisper",result="hit"} 3\n'
+            'requests_total{method="say \\"hi\\"",result="miss"} 1\n'))
+
+    def test_counter_rejects_wrong_labels(self):
+        counter = Counter("requests_total", "Requests", ("method",), register=False)
+        with self.assertRaises(ValueError):
+            counter.inc(result="hit")
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("latency_seconds", "Latency", buckets=(1, 5), register=False)
+        for value in (0.5, 1.0, 3.0, 10.0):
+            histogram.observe(value)
+
+        lines = render([histogram]).splitlines()[2:]
+        self.assertEqual(lines, [
+            'latency_seconds_bucket{le="1.0"} 2',
+            'latency_seconds_bucket{le="5.0"} 3',
+            'latency_seconds_bucket{le="+Inf"} 4',
+            "latency_seconds_sum 14.5",
+            "latency_seconds_count 4",
+        ])
+
+    def test_gauge_reads_value_at_collection(self):
+        depth = [3]
+        gauge = Gauge("queue_depth", "Queue depth", lambda: depth[0], register=False)
+        depth[0] = 5
+        self.assertIn("queue_depth 5\n", render([gauge]))
+
+    def test_failing_gauge_does_not_break_render(self):
+        gauge = Gauge("broken", "Broken", lambda: 1 / 0, register=False)
+        counter = Counter("ok_total", "Ok", register=False)
+        counter.inc()
+        self.assertIn("ok_total 1", render([gauge, counter]))
+
+
+class TestRunYtdlp(unittest.TestCase):
+    @patch('src.cancellation.subprocess.run')
+    def test_records_calls_and_latency(self, mock_run):
+        mock_run.return_value = subprocess.CompletedProcess([], 1, "", "not found")
+        failed = YTDLP_CALLS.value(operation="test", status="error")
+
+        result = run_ytdlp("test", ["--list-subs", "url"])
+
+        self.assertEqual(mock_run.call_args[0][0], ["yt-dlp", "--list-subs", "url"])
+        self.assertEqual(result.returncode, 1)
+        self.assertEqual(YTDLP_CALLS.value(operation="test", status="error"), failed + 1)
+        self.assertIn('shadowing_ytdlp_duration_seconds_count{operation="test"}', render([YTDLP_SECONDS]))
+
+
+if __name__ == "__main__":
+    unittest.main()
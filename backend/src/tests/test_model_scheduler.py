@@ -0,0 +1,61 @@
+import unittest
+
+from src.model_scheduler import ModelScheduler
+
+
+class TestModelScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = ModelScheduler(
+            models=["tiny", "base", "small"],
+            target_seconds=60,
+            initial_throughput={"tiny": 30.0, "base": 10.0, "small": 2.0},
+        )
+
+    def test_idle_picks_largest_model_within_budget(self):
+        self.assertEqual(self.scheduler.choose_model(100), "small")  # 50 s
+        self.assertEqual(self.scheduler.choose_model(300), "base")  # 30 s
+        self.assertEqual(self.scheduler.choose_model(1200), "tiny")  # 40 s
+
+    def test_nothing_fits_falls_back_to_smallest(self):
+        self.assertEqual(self.scheduler.choose_model(3600), "tiny")
+
+    def test_custom_target(self):
+        self.assertEqual(self.scheduler.choose_model(300, target_seconds=200), "small")
+
+    def test_backlog_pushes_towards_smaller_models(self):
+        with self.scheduler.track("base", 400):  # 40 s of backlog
+            self.assertEqual(self.scheduler.queue_depth(), 1)
+            self.assertEqual(self.scheduler.choose_model(100), "base")
+        self.assertEqual(self.scheduler.queue_depth(), 0)
+        self.assertEqual(self.scheduler.choose_model(100), "small")
+
+    def test_record_updates_throughput(self):
+        self.scheduler.record("base", media_seconds=200, wall_seconds=10)  # 20x measured
+        self.assertAlmostEqual(self.scheduler.throughput("base"), 13.0)
+
+    def test_record_ignores_empty_jobs(self):
+        self.scheduler.record("base", media_seconds=0, wall_seconds=1)
+        self.assertEqual(self.scheduler.throughput("base"), 10.0)
+
+    def test_failed_job_leaves_backlog(self):
+        with self.assertRaises(RuntimeError):
+            with self.scheduler.track("small", 100):
+                raise RuntimeError("boom")
+        self.assertEqual(self.scheduler.queue_depth(), 0)
+        self.assertEqual(self.scheduler.estimate_seconds("tiny", 0), 0)
+        self.assertEqual(self.scheduler.throughput("small"), 2.0)
+
+    def test_unknown_model_can_be_tracked(self):
+        with self.scheduler.track("medium", 10):
+            pass
+        self.assertGreater(self.scheduler.throughput("medium"), 0)
+
+    def test_can_upgrade(self):
+        self.assertTrue(self.scheduler.can_upgrade("tiny"))
+        self.assertTrue(self.scheduler.can_upgrade("base"))
+        self.assertFalse(self.scheduler.can_upgrade("small"))
+        self.assertFalse(self.scheduler.can_upgrade(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from src.cache import get_cache_key, get_peaks_path
+from src.peaks import compute_peaks, get_peaks_window, save_peaks
+from src.tests.temp_cache import use_temporary_cache
+
+URL = "https://www.youtube.com/watch?v=peaks-test"
+
+
+class TestComputePeaks(unittest.TestCase):
+    def test_min_and_max_per_bin(self):
+        audio = np.array([0.0, 0.5, -0.5, 1.0, -1.0, 0.25, 0.1], dtype=np.float32)
+        peaks = compute_peaks(audio, sample_rate=6, per_second=2)
+
+        self.assertEqual(peaks.dtype, np.int8)
+        # Bins of three samples, plus the partial last one
+        np.testing.assert_array_equal(peaks, [[-64, 64], [-127, 127], [13, 13]])
+
+    def test_rates_must_divide_the_sample_rate(self):
+        with self.assertRaises(ValueError):
+            compute_peaks(np.zeros(16000, dtype=np.float32), 16000, per_second=60)
+
+    def test_an_hour_fits_in_bins(self):
+        audio = np.zeros(16000 * 3600, dtype=np.float32)
+        self.assertEqual(compute_peaks(audio, 16000, per_second=50).shape, (180000, 2))
+
+
+class TestPeaksWindow(unittest.TestCase):
+    def setUp(self):
+        use_temporary_cache(self)
+
+    def test_window_of_stored_peaks(self):
+        # 10 s of a rising ramp at the default 50 peaks per second
+        audio = np.linspace(0, 1, 16000 * 10, dtype=np.float32)
+        save_peaks(get_cache_key(url=URL), audio, 16000)
+
+        window = get_peaks_window(URL, 2.0, 3.0)
+        self.assertEqual(window["peaks_per_second"], 50)
+        self.assertEqual(window["start"], 2.0)
+        self.assertEqual(window["duration"], 10.0)
+        self.assertEqual(len(window["min"]), 50)
+        self.assertTrue(all(low <= high for low, high in zip(window["min"], window["max"])))
+        self.assertEqual(len(get_peaks_window(URL, 9.5)["max"]), 25)
+        self.assertEqual(get_peaks_window(URL, 20.0, 30.0)["max"], [])
+
+    def test_upload_peaks_are_found_by_cache_key(self):
+        file_key = get_cache_key(file_hash="ab" * 32)
+        save_peaks(file_key, np.zeros(16000 * 4, dtype=np.float32), 16000)
+
+        window = get_peaks_window(cache_key=file_key, start=1.0, end=2.0)
+        self.assertEqual(window["duration"], 4.0)
+        self.assertEqual(len(window["min"]), 50)
+
+    def test_peaks_keep_the_rate_they_were_stored_with(self):
+        with patch("src.peaks.PEAKS_PER_SECOND", 100):
+            save_peaks(get_cache_key(url=URL), np.zeros(16000 * 4, dtype=np.float32), 16000)
+
+        window = get_peaks_window(URL, 1.0, 2.0)
+        self.assertEqual(window["peaks_per_second"], 100)
+        self.assertEqual(window["start"], 1.0)
+        self.assertEqual(window["duration"], 4.0)
+        self.assertEqual(len(window["min"]), 100)
+
+    def test_missing_peaks_are_none(self):
+        self.assertIsNone(get_peaks_window(URL))
+
+    def test_peaks_without_a_rate_are_none(self):
+        path = get_peaks_path(get_cache_key(url=URL))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.save(path, compute_peaks(np.zeros(16000, dtype=np.float32), 16000))
+        self.assertIsNone(get_peaks_window(URL))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import gzip
+import json
+import unittest
+
+import numpy as np
+
+from src.responses import choose_encoding, dumps, json_response
+
+
+class TestResponses(unittest.TestCase):
+    def test_dumps_is_compact_utf8_and_handles_numpy(self):
+        body = dumps({"text": "안녕", "score": np.float64(0.5), "count": np.int64(3), "ok": np.bool_(True)})
+        self.assertEqual(json.loads(body), {"text": "안녕", "score": 0.5, "count": 3, "ok": True})
+        self.assertIn("안녕".encode("utf-8"), body)
+        self.assertNotIn(b": ", body)
+
+    def test_choose_encoding_honours_quality_values(self):
+        self.assertEqual(choose_encoding("gzip, deflate"), "gzip")
+        self.assertIsNone(choose_encoding("gzip;q=0, deflate"))
+        self.assertEqual(choose_encoding("*"), "gzip")
+        self.assertIsNone(choose_encoding(None))
+
+    def test_only_large_bodies_are_compressed(self):
+        small = json_response({"captions": []}, "gzip")
+        self.assertNotIn("content-encoding", small.headers)
+
+        captions = [{"start": i, "end": i + 1, "text": "Practice sentence."} for i in range(200)]
+        large = json_response({"captions": captions}, "gzip")
+        self.assertEqual(large.headers["content-encoding"], "gzip")
+        self.assertEqual(large.headers["vary"], "Accept-Encoding")
+        self.assertEqual(json.loads(gzip.decompress(large.body))["captions"], captions)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from src.admission import AdmissionRejected
+from src.scratch import SCRATCH_PREFIX, ScratchSpace
+
+
+class TestScratchSpace(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.scratch = ScratchSpace(self.directory, quota_bytes=100, orphan_seconds=60)
+
+    def write(self, name, size=10, age=0):
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        if age:
+            past = time.time() - age
+            os.utime(path, (past, past))
+        return path
+
+    def test_files_and_siblings_are_removed_on_exit(self):
+        with self.scratch.scratch_path() as prefix:
+            for suffix in [".en.vtt", ".mp4.part"]:
+                with open(prefix + suffix, "w") as f:
+                    f.write("data")
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_files_are_removed_when_the_block_fails(self):
+        with self.assertRaises(RuntimeError):
+            with self.scratch.scratch_path(".mp4") as path:
+                open(path, "w").close()
+                raise RuntimeError("boom")
+        self.assertFalse(os.path.exists(path))
+
+    def test_quota_counts_usage_and_reservations(self):
+        self.write("existing.mp4", size=40)
+        with self.scratch.scratch_path(".mp4", reserve_bytes=50):
+            with self.assertRaises(AdmissionRejected) as rejected:
+                with self.scratch.scratch_path(".mp4", reserve_bytes=20):
+                    pass
+            self.assertEqual(rejected.exception.status_code, 503)
+
+        # The reservation is released with its file
+        with self.scratch.scratch_path(".mp4", reserve_bytes=20):
+            pass
+
+    def test_sweep_removes_only_old_unowned_files(self):
+        orphan = self.write(SCRATCH_PREFIX + "orphan.mp4", age=120)
+        recent = self.write(SCRATCH_PREFIX + "recent.mp4")
+        sample = self.write("sample.mp4", age=120)
+        with self.scratch.scratch_path(".mp4") as live:
+            self.write(os.path.basename(live), age=120)
+            result = self.scratch.sweep_orphans()
+            self.assertTrue(os.path.exists(live))
+
+        self.assertEqual(result["removed"], [SCRATCH_PREFIX + "orphan.mp4"])
+        self.assertEqual(result["freed_bytes"], 10)
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(recent))
+        self.assertTrue(os.path.exists(sample))
+
+
+if __name__ == "__main__":
+    unittest.main()
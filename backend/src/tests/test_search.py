@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+
+from src.search import SearchIndex, phrase_query
+
+
+def captions(*texts):
+    return [{"start": i * 2.0, "end": i * 2.0 + 2.0, "text": text} for i, text in enumerate(texts)]
+
+
+class TestPhraseQuery(unittest.TestCase):
+    def test_quotes_and_operators_are_literal(self):
+        self.assertEqual(phrase_query('say  "hi" OR bye'), '"say ""hi"" OR bye"')
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.index = SearchIndex(os.path.join(self.directory.name, "search.sqlite3"))
+        self.index.update("a", captions("How are you today?", "I am fine, thank you."),
+                          {"url": "https://youtu.be/a", "language": "en"}, "1")
+        self.index.update("b", captions("Are you fine?", "Café au lait, thank you"),
+                          {"filename": "lesson.mp4"}, "1")
+
+    def tearDown(self):
+        self.index.close()
+        self.directory.cleanup()
+
+    def texts(self, query, **kwargs):
+        return sorted(result["text"] for result in self.index.search(query, **kwargs)["results"])
+
+    def test_phrase_matches_across_videos(self):
+        result = self.index.search("thank you")
+        self.assertEqual(len(result["results"]), 2)
+        self.assertIsNone(result["next_offset"])
+
+        hit = next(r for r in result["results"] if r["cache_key"] == "a")
+        self.assertEqual(hit["url"], "https://youtu.be/a")
+        self.assertEqual((hit["start"], hit["end"]), (2.0, 4.0))
+
+        self.assertEqual(self.texts("fine you"), [])
+        self.assertEqual(self.texts("cafe"), ["Café au lait, thank you"])
+
+    def test_pages(self):
+        first = self.index.search("you", limit=3)
+        self.assertEqual(len(first["results"]), 3)
+        self.assertEqual(first["next_offset"], 3)
+
+        rest = self.index.search("you", offset=3, limit=3)
+        self.assertEqual(len(rest["results"]), 1)
+        self.assertIsNone(rest["next_offset"])
+
+    def test_update_replaces_and_delete_drops(self):
+        self.index.update("a", captions("Good morning"), {}, "2")
+        self.assertEqual(self.texts("thank you"), ["Café au lait, thank you"])
+        self.assertEqual(self.texts("morning"), ["Good morning"])
+
+        self.index.delete("b")
+        self.assertEqual(self.texts("thank you"), [])
+
+    def test_sync_adds_missing_and_drops_removed_entries(self):
+        entries = {"a": {"captions": captions("Hello")}, "c": {"captions": captions("Hello again")}}
+
+        self.assertEqual(self.index.sync(entries, entries.__getitem__), {"added": 1, "removed": 1})
+        self.assertEqual(self.index.indexed_keys(), {"a", "c"})
+        self.assertEqual(self.texts("hello"), ["Hello again"])
+
+    def test_empty_query_is_an_error(self):
+        self.assertIn("error", self.index.search("  "))
+
+
+if __name__ == "__main__":
+    unittest.main()
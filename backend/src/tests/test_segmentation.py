@@ -0,0 +1,117 @@
+import unittest
+
+from src.segmentation import (
+    iter_words,
+    merge_short_captions,
+    pack_words,
+    segment_words,
+    splice_captions,
+)
+
+
+def make_words(*items):
+    """Builds packed words from (start_s, end_s, text) tuples."""
+    return pack_words([{"start": s, "end": e, "word": w} for s, e, w in items])
+
+
+class TestPackWords(unittest.TestCase):
+    def test_pack_words_in_milliseconds(self):
+        words = make_words((0.0, 0.4449, " Hello"), (0.52, 1.0, " world."))
+        self.assertEqual(words, {
+            "start": [0, 520],
+            "end": [445, 1000],
+            "text": [" Hello", " world."],
+        })
+
+    def test_iter_words(self):
+        words = make_words((0.0, 0.5, " Hi"))
+        self.assertEqual(list(iter_words(words)), [(0, 500, " Hi")])
+
+    def test_iter_words_empty(self):
+        self.assertEqual(list(iter_words(None)), [])
+        self.assertEqual(list(iter_words(pack_words([]))), [])
+
+
+class TestSegmentWords(unittest.TestCase):
+    def setUp(self):
+        self.words = make_words(
+            (0.0, 0.4, " Hello"),
+            (0.5, 1.0, " there."),
+            (1.1, 1.6, " How"),
+            (1.7, 2.0, " are"),
+            (2.1, 3.0, " you?"),
+            (3.1, 3.5, " I'm"),
+            (3.6, 4.2, " fine."),
+        )
+
+    def test_sentence_boundaries_with_min_duration(self):
+        captions = segment_words(self.words, min_duration=2.5)
+        self.assertEqual(captions, [
+            {"start": 0.0, "end": 3.0, "text": "Hello there. How are you?"},
+            {"start": 3.1, "end": 4.2, "text": "I'm fine."},
+        ])
+
+    def test_short_min_duration_splits_every_sentence(self):
+        captions = segment_words(self.words, min_duration=0.5)
+        self.assertEqual([c["text"] for c in captions],
+                         ["Hello there.", "How are you?", "I'm fine."])
+
+    def test_max_duration(self):
+        captions = segment_words(self.words, min_duration=10.0, max_duration=2.0)
+        for caption in captions:
+            self.assertLessEqual(caption["end"] - caption["start"], 2.0)
+
+    def test_long_pause_ends_caption(self):
+        words = make_words((0.0, 0.5, " Wait"), (3.0, 3.5, " what"))
+        captions = segment_words(words, min_duration=10.0)
+        self.assertEqual([c["text"] for c in captions], ["Wait", "what"])
+
+    def test_max_chars(self):
+        captions = segment_words(self.words, min_duration=10.0, max_chars=15)
+        for caption in captions:
+            self.assertLessEqual(len(caption["text"]), 15)
+
+    def test_empty(self):
+        self.assertEqual(segment_words(pack_words([])), [])
+
+
+class TestSpliceCaptions(unittest.TestCase):
+    def test_replaces_captions_inside_ranges(self):
+        captions = [
+            {"start": 0.0, "end": 2.0, "text": "keep one"},
+            {"start": 2.0, "end": 4.0, "text": "bad"},
+            {"start": 4.0, "end": 6.0, "text": "bad too"},
+            {"start": 6.0, "end": 8.0, "text": "keep two"},
+        ]
+        replacements = [{"start": 2.1, "end": 5.9, "text": "whisper"}]
+
+        spliced = splice_captions(captions, [(2.0, 6.0)], replacements)
+
+        self.assertEqual([c["text"] for c in spliced], ["keep one", "whisper", "keep two"])
+
+    def test_no_ranges(self):
+        captions = [{"start": 0.0, "end": 2.0, "text": "keep"}]
+        self.assertEqual(splice_captions(captions, [], []), captions)
+
+
+class TestMergeShortCaptions(unittest.TestCase):
+    def test_merges_in_exact_milliseconds(self):
+        # 4.02 - 1.52 is just below 2.5 in floating point
+        captions = [
+            {"start": 1.52, "end": 4.02, "text": "Exactly min duration"},
+            {"start": 4.02, "end": 5.0, "text": "next"},
+        ]
+        merged = merge_short_captions(captions, min_duration=2.5)
+        self.assertEqual(merged[0]["text"], "Exactly min duration")
+
+    def test_drops_tiny_isolated_segments(self):
+        captions = [
+            {"start": 0.0, "end": 0.3, "text": "Um"},
+            {"start": 5.0, "end": 8.0, "text": "Real sentence."},
+        ]
+        merged = merge_short_captions(captions)
+        self.assertEqual(merged, [{"start": 5.0, "end": 8.0, "text": "Real sentence."}])
+
+
+if __name__ == "__main__":
+    unittest.main()
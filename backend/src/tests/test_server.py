@@ -4,15 +4,34 @@ Test script to verify the server module works correctly with the new architectur
 """
 
 import asyncio
+import io
+import os
+import tempfile
 import unittest
 from unittest.mock import AsyncMock, patch, MagicMock
 
+from src.admission import AdmissionController, AdmissionRejected
+from src.cache import get_cache_key, save_to_cache
+from src.model_scheduler import ModelScheduler
+from src.segmentation import pack_words
+from src.tests.temp_cache import use_temporary_cache
 from src.server import (
+    CACHE_REQUESTS,
+    QUALITY_OUTCOMES,
+    extract_youtube_captions,
+    fallback_to_whisper,
+    fetch_caption_tracks,
     get_cache_info,
     clear_cache,
     delete_cache_entry,
     merge_short_captions,
+    open_cached_captions,
+    serves_from_cache,
+    smart_extract_captions,
     timestamp_to_seconds,
+    transcribe_media_file,
+    upgrade_cached_transcriptions,
+    use_uploaded_subtitles,
 )
 
 
@@ -121,6 +140,420 @@ class TestServerUtilityFunctions(unittest.TestCase):
         self.assertEqual(timestamp_to_seconds("23:59:59.999"), 86399.999)
 
 
+class TestUpgradeCachedTranscriptions(unittest.TestCase):
+    """Test the idle-time model upgrade pass"""
+
+    def setUp(self):
+        self.entries = [
+            ("tiny_key", {"captions": [], "metadata": {
+                "url": "https://youtu.be/a", "method": "whisper_transcription", "whisper_model": "tiny"}}),
+            ("youtube_key", {"captions": [], "metadata": {
+                "url": "https://youtu.be/b", "method": "youtube_captions"}}),
+            ("upload_key", {"captions": [], "metadata": {
+                "filename": "clip.mp4", "method": "whisper_transcription", "whisper_model": "tiny"}}),
+            ("base_key", {"captions": [], "metadata": {
+                "url": "https://youtu.be/c", "method": "whisper_transcription", "whisper_model": "base"}}),
+        ]
+        self.backend = MagicMock(model_name="base")
+        self.backend.name = "openai-whisper"
+
+    def run_pass(self, scheduler, limit=5):
+        with patch('src.server.iter_cache_entries', return_value=iter(self.entries)), \
+                patch('src.server.get_model_scheduler', return_value=scheduler), \
+                patch('src.server.download_audio', return_value=None), \
+                patch('src.server.transcribe_with_budget',
+                      return_value=([{"start": 0, "end": 1, "text": "hi"}], {}, self.backend)) as mock_transcribe, \
+                patch('src.server.save_to_cache') as mock_save:
+            result = asyncio.run(upgrade_cached_transcriptions(limit))
+        return result, mock_transcribe, mock_save
+
+    def test_upgrades_only_smaller_url_transcriptions(self):
+        result, mock_transcribe, mock_save = self.run_pass(ModelScheduler(models=["tiny", "base"]))
+
+        self.assertEqual(result["upgraded"], ["tiny_key"])
+        self.assertEqual(mock_transcribe.call_args.kwargs["model_name"], "base")
+        metadata = mock_save.call_args.args[2]
+        self.assertEqual(metadata["whisper_model"], "base")
+        self.assertEqual(metadata["upgraded_from"], "tiny")
+
+    def test_skips_while_whisper_is_busy(self):
+        scheduler = ModelScheduler(models=["tiny", "base"])
+        with scheduler.track("base", 60):
+            result, mock_transcribe, _ = self.run_pass(scheduler)
+
+        self.assertEqual(result["upgraded"], [])
+        mock_transcribe.assert_not_called()
+
+    def test_upgrade_takes_an_admission_slot(self):
+        controller = AdmissionController(max_active=1, max_queued=0, max_per_client=1)
+        active = []
+
+        def transcribe(*args, **kwargs):
+            active.append(controller.active)
+            return [], {}, self.backend
+
+        with patch('src.server.get_admission_controller', return_value=controller), \
+                patch('src.server.iter_cache_entries', return_value=iter(self.entries)), \
+                patch('src.server.get_model_scheduler', return_value=ModelScheduler(models=["tiny", "base"])), \
+                patch('src.server.download_audio', return_value=None), \
+                patch('src.server.transcribe_with_budget', side_effect=transcribe), \
+                patch('src.server.save_to_cache'):
+            result = asyncio.run(upgrade_cached_transcriptions(5))
+
+        self.assertEqual(result["upgraded"], ["tiny_key"])
+        self.assertEqual(active, [1])
+        self.assertEqual(controller.active, 0)
+
+
+class TestSmartExtractHybrid(unittest.TestCase):
+    """Test that poor stretches of YouTube captions are re-transcribed in isolation"""
+
+    def setUp(self):
+        good = [
+            {"start": i * 3.0, "end": i * 3.0 + 2.5, "text": f"Good sentence number {i}."}
+            for i in range(60)
+        ]
+        poor = [
+            {"start": 180 + i * 0.5, "end": 180 + i * 0.5 + 0.4, "text": "uh yeah so"}
+            for i in range(60)
+        ]
+        # Many overlapping segments make the whole video score poorly
+        poor += [
+            {"start": 215 + i, "end": 215.5 + i, "text": "repeated caption text" + " more" * i}
+            for i in range(5)
+        ]
+        self.captions = good + poor + [
+            {"start": 240 + i * 3.0, "end": 240 + i * 3.0 + 2.5, "text": f"Good again {i}."}
+            for i in range(60)
+        ]
+        self.backend = MagicMock(model_name="base")
+        self.backend.name = "openai-whisper"
+
+    def run_extract(self, poor_fraction=0.5, whisper_error=None):
+        whisper_captions = [{"start": 181.0, "end": 185.0, "text": "Clean whisper sentence."}]
+        with patch('src.server.is_cached', return_value=False), \
+                patch('src.server.extract_youtube_captions', return_value=(self.captions, None)), \
+                patch('src.server.HYBRID_MAX_POOR_FRACTION', poor_fraction), \
+                patch('src.server.check_video_for_whisper', return_value=whisper_error), \
+                patch('src.server.download_audio', return_value=None) as mock_download, \
+                patch('src.server.transcribe_ranges',
+                      return_value=(whisper_captions, {}, self.backend)) as mock_ranges, \
+                patch('src.server.fallback_to_whisper', new_callable=AsyncMock) as mock_fallback, \
+                patch('src.server.save_to_cache') as mock_save:
+            mock_fallback.return_value = {"method": "whisper_transcription"}
+            result = asyncio.run(smart_extract_captions("https://youtu.be/x", 2.5))
+            self.download_calls = mock_download.call_count
+        return result, mock_ranges, mock_fallback, mock_save
+
+    def test_only_poor_range_goes_to_whisper(self):
+        result, mock_ranges, mock_fallback, mock_save = self.run_extract()
+
+        mock_fallback.assert_not_called()
+        self.assertEqual(result["method"], "hybrid")
+        self.assertEqual(mock_ranges.call_args.args[1], [(180, 219.5)])
+        texts = [c["text"] for c in mock_save.call_args.args[1]]
+        self.assertIn("Clean whisper sentence.", texts)
+        self.assertNotIn("uh yeah so", texts)
+        self.assertIn("Good sentence number 0.", texts)
+
+    def test_too_long_video_is_not_downloaded(self):
+        error = {"error": "Video too long (max 30 minutes allowed)", "detail": "Video is 45.0 minutes long"}
+        result, mock_ranges, _, mock_save = self.run_extract(whisper_error=error)
+
+        self.assertEqual(result, error)
+        self.assertEqual(self.download_calls, 0)
+        mock_ranges.assert_not_called()
+        mock_save.assert_not_called()
+
+    def test_mostly_poor_video_falls_back_entirely(self):
+        result, mock_ranges, mock_fallback, _ = self.run_extract(poor_fraction=0.05)
+
+        mock_ranges.assert_not_called()
+        mock_fallback.assert_called_once()
+        self.assertEqual(result["method"], "whisper_transcription")
+
+    def test_outcome_and_cache_miss_are_counted(self):
+        hybrid = QUALITY_OUTCOMES.value(outcome="hybrid")
+        misses = CACHE_REQUESTS.value(method="hybrid", result="miss")
+
+        self.run_extract()
+
+        self.assertEqual(QUALITY_OUTCOMES.value(outcome="hybrid"), hybrid + 1)
+        self.assertEqual(CACHE_REQUESTS.value(method="hybrid", result="miss"), misses + 1)
+
+
+class TestSmartExtractWhisper(unittest.TestCase):
+    """Test that Whisper captions are segmented alike on a miss and on a hit"""
+
+    def setUp(self):
+        self.words = pack_words([
+            {"start": i * 0.5, "end": i * 0.5 + 0.4, "word": f" word{i}" + ("." if i % 3 == 2 else "")}
+            for i in range(30)
+        ])
+        # Whisper's own segments, which a hit re-segments from the words
+        self.whisper_captions = [{"start": 0.0, "end": 15.0, "text": "one long segment"}]
+        self.backend = MagicMock(model_name="base")
+        self.backend.name = "openai-whisper"
+
+    def test_miss_and_hit_are_segmented_alike(self):
+        saved = {}
+
+        def save(cache_key, captions, metadata, words=None):
+            saved.update(captions=captions, metadata=metadata, words=words)
+
+        with patch('src.server.is_cached', return_value=False), \
+                patch('src.server.get_negative_result', return_value=None), \
+                patch('src.server.extract_youtube_captions', return_value=(None, "No captions")), \
+                patch('src.server.check_video_for_whisper', return_value=None), \
+                patch('src.server.download_audio', return_value=None), \
+                patch('src.server.transcribe_with_budget',
+                      return_value=(self.whisper_captions, self.words, self.backend)), \
+                patch('src.server.save_to_cache', side_effect=save):
+            miss = asyncio.run(smart_extract_captions("https://youtu.be/x", 3.0))
+
+        with patch('src.server.is_cached', return_value=True), \
+                patch('src.server.load_from_cache', return_value=saved):
+            hit = asyncio.run(smart_extract_captions("https://youtu.be/x", 3.0))
+
+        self.assertFalse(miss["cached"])
+        self.assertTrue(hit["cached"])
+        self.assertEqual(saved["captions"], self.whisper_captions)
+        self.assertGreater(len(miss["captions"]), 1)
+        self.assertEqual(miss["captions"], hit["captions"])
+
+
+class TestTranscribeMediaFile(unittest.TestCase):
+    """Test transcription of local files, shared by /transcribe and prewarm.py"""
+
+    def setUp(self):
+        handle, self.file_path = tempfile.mkstemp(suffix=".mp4")
+        os.write(handle, b"media")
+        os.close(handle)
+        self.addCleanup(os.remove, self.file_path)
+
+    @patch('src.server.is_cached', return_value=False)
+    @patch('src.server.save_to_cache')
+    def test_new_file_is_transcribed_and_cached(self, mock_save, _):
+        backend = MagicMock(model_name="tiny")
+        backend.name = "fake"
+        captions = [{"start": 0.0, "end": 1.0, "text": "Hi"}]
+        with patch('src.server.transcribe_with_budget', return_value=(captions, None, backend)):
+            result = asyncio.run(transcribe_media_file(self.file_path, "lesson.mp4"))
+
+        self.assertFalse(result["cached"])
+        self.assertEqual(result["metadata"]["filename"], "lesson.mp4")
+        self.assertEqual(result["metadata"]["file_size"], 5)
+        mock_save.assert_called_once()
+        # The caller owns the file
+        self.assertTrue(os.path.exists(self.file_path))
+
+    @patch('src.server.is_cached', return_value=False)
+    @patch('src.server.transcribe_with_budget')
+    def test_rejected_when_whisper_is_full(self, mock_transcribe, _):
+        controller = AdmissionController(max_active=1, max_queued=0)
+        controller.active = 1
+        with patch('src.server.get_admission_controller', return_value=controller):
+            with self.assertRaises(AdmissionRejected):
+                asyncio.run(transcribe_media_file(self.file_path))
+
+        mock_transcribe.assert_not_called()
+
+    @patch('src.server.is_cached', return_value=True)
+    @patch('src.server.load_from_cache', return_value={"captions": [], "metadata": {"method": "whisper_transcription"}})
+    @patch('src.server.transcribe_with_budget')
+    def test_cached_file_is_not_transcribed(self, mock_transcribe, *_):
+        result = asyncio.run(transcribe_media_file(self.file_path))
+
+        self.assertTrue(result["cached"])
+        mock_transcribe.assert_not_called()
+
+
+class TestUploadedSubtitles(unittest.TestCase):
+    """Test media uploads that come with a VTT or SRT file"""
+
+    GOOD_SRT = (b"1\n00:00:00,000 --> 00:00:03,000\nHello there, everyone.\n\n"
+                b"2\n00:00:03,000 --> 00:00:06,000\nToday we practise shadowing.\n")
+
+    def setUp(self):
+        handle, self.file_path = tempfile.mkstemp(suffix=".mp4")
+        os.write(handle, b"media")
+        os.close(handle)
+        self.addCleanup(os.remove, self.file_path)
+
+    def upload(self, content, filename="lesson.srt"):
+        subtitles = MagicMock(filename=filename, file=io.BytesIO(content), size=len(content))
+        return asyncio.run(use_uploaded_subtitles(self.file_path, "lesson.mp4", subtitles))
+
+    @patch('src.server.is_cached', return_value=False)
+    @patch('src.server.save_to_cache')
+    @patch('src.server.transcribe_with_budget')
+    def test_good_subtitles_skip_whisper(self, mock_transcribe, mock_save, _):
+        result = self.upload(self.GOOD_SRT)
+
+        self.assertEqual(result["method"], "uploaded_subtitles")
+        self.assertEqual(result["captions"][0]["text"], "Hello there, everyone.")
+        self.assertEqual(mock_save.call_args.args[2]["method"], "uploaded_subtitles")
+        mock_transcribe.assert_not_called()
+
+    @patch('src.server.is_cached', return_value=False)
+    @patch('src.server.transcribe_media_file', new_callable=AsyncMock)
+    def test_poor_subtitles_fall_back_to_whisper(self, mock_transcribe, _):
+        mock_transcribe.return_value = {"captions": [], "cached": False, "metadata": {}}
+
+        result = self.upload(b"WEBVTT\n\nnot a cue\n", filename="lesson.vtt")
+
+        mock_transcribe.assert_called_once()
+        self.assertTrue(result["quality_assessment"]["recommend_whisper"])
+
+    @patch('src.server.is_cached', return_value=False)
+    def test_other_formats_are_rejected(self, _):
+        self.assertIn("error", self.upload(b"", filename="lesson.txt"))
+
+
+class TestCaptionTracks(unittest.TestCase):
+    """Test multi-language caption extraction and per-language serving"""
+
+    VTT = "WEBVTT\n\n00:00:00.000 --> 00:00:03.000\nHello there.\n"
+
+    def fake_yt_dlp(self, languages_found):
+        def run(args, **kwargs):
+            if "--list-subs" in args:
+                return MagicMock(returncode=0, stdout="Available subtitles", stderr="")
+            template = args[args.index("--output") + 1]
+            for language in languages_found:
+                with open(template.replace("%(ext)s", f"{language}.vtt"), "w") as f:
+                    f.write(self.VTT)
+            return MagicMock(returncode=0, stdout="", stderr="")
+        return run
+
+    @patch('src.server.get_negative_result', return_value=None)
+    @patch('src.cancellation.subprocess.run')
+    def test_all_languages_in_one_download(self, mock_run, _):
+        mock_run.side_effect = self.fake_yt_dlp(["en", "ko"])
+
+        tracks, error = fetch_caption_tracks("https://youtu.be/x", "key", ["en", "ko", "ja"])
+
+        self.assertIsNone(error)
+        self.assertEqual(tracks["ko"], [{"start": 0.0, "end": 3.0, "text": "Hello there."}])
+        self.assertEqual(tracks["ja"], [])
+        download_args = mock_run.call_args_list[1].args[0]
+        self.assertEqual(download_args[download_args.index("--sub-lang") + 1], "en,ko,ja")
+
+    @patch('src.server.is_cached', return_value=True)
+    @patch('src.server.save_to_cache')
+    @patch('src.cancellation.subprocess.run')
+    def test_other_language_is_served_from_tracks(self, mock_run, mock_save, _):
+        captions = [{"start": 0.0, "end": 3.0, "text": "안녕하세요."}]
+        cached_data = {
+            "captions": [{"start": 0.0, "end": 3.0, "text": "Hello."}],
+            "metadata": {"method": "youtube_captions", "language": "en"},
+            "tracks": {"en": [], "ko": captions},
+        }
+        with patch('src.server.load_from_cache', return_value=cached_data):
+            result, error = extract_youtube_captions("https://youtu.be/x", "ko")
+
+        self.assertIsNone(error)
+        self.assertEqual(result, captions)
+        mock_run.assert_not_called()
+        mock_save.assert_not_called()
+
+    @patch('src.server.is_cached', return_value=True)
+    @patch('src.cancellation.subprocess.run')
+    def test_known_missing_language_needs_no_download(self, mock_run, _):
+        cached_data = {"captions": [], "metadata": {"method": "youtube_captions"}, "tracks": {"ko": []}}
+        with patch('src.server.load_from_cache', return_value=cached_data):
+            result, error = extract_youtube_captions("https://youtu.be/x", "ko")
+
+        self.assertIsNone(result)
+        self.assertIn("ko", error)
+        mock_run.assert_not_called()
+
+
+class TestOpenCachedCaptions(unittest.TestCase):
+    """Test which cache hits are served from the stored captions bytes"""
+
+    URL = "https://youtu.be/passthrough"
+
+    def setUp(self):
+        use_temporary_cache(self)
+        self.cache_key = get_cache_key(url=self.URL)
+
+    def test_hit_in_language_is_opened(self):
+        save_to_cache(self.cache_key, [], {"method": "youtube_captions", "language": "en"})
+        hits = CACHE_REQUESTS.value(method="youtube_captions", result="hit")
+
+        view = open_cached_captions(self.URL, "en", youtube_only=True)
+        view.close()
+        self.assertIsNone(open_cached_captions(self.URL, "ko"))
+        self.assertEqual(CACHE_REQUESTS.value(method="youtube_captions", result="hit"), hits + 1)
+
+    def test_whisper_entry_is_not_served_as_youtube_captions(self):
+        save_to_cache(self.cache_key, [], {"method": "whisper_transcription"})
+        self.assertIsNone(open_cached_captions(self.URL, "en", youtube_only=True))
+        view = open_cached_captions(self.URL, "ko")
+        view.close()
+        self.assertEqual(view.metadata["method"], "whisper_transcription")
+
+    def test_serves_from_cache(self):
+        self.assertFalse(serves_from_cache(self.URL))
+        save_to_cache(self.cache_key, [], {"method": "whisper_transcription"})
+        self.assertTrue(serves_from_cache(self.URL, "ko"))
+        self.assertFalse(serves_from_cache(self.URL, "en", youtube_only=True))
+
+
+class TestNegativeCaching(unittest.TestCase):
+    """Test that known failures skip the yt-dlp round trips"""
+
+    @patch('src.server.is_cached', return_value=False)
+    @patch('src.cancellation.subprocess.run')
+    def test_cached_no_captions_skips_yt_dlp(self, mock_run, _):
+        with patch('src.server.get_negative_result',
+                   side_effect=lambda key, reason, language=None: {"error": "No captions available for this video"}
+                   if reason == "no_captions" else None):
+            captions, error = extract_youtube_captions("https://youtu.be/x")
+
+        self.assertIsNone(captions)
+        self.assertEqual(error, "No captions available for this video")
+        mock_run.assert_not_called()
+
+    @patch('src.server.is_cached', return_value=False)
+    @patch('src.server.get_negative_result', return_value=None)
+    @patch('src.server.save_negative_result')
+    @patch('src.cancellation.subprocess.run')
+    def test_no_subtitles_is_recorded(self, mock_run, mock_save, *_):
+        mock_run.return_value = MagicMock(returncode=0, stdout="No subtitles found", stderr="")
+
+        captions, error = extract_youtube_captions("https://youtu.be/x")
+
+        self.assertIsNone(captions)
+        self.assertEqual(mock_save.call_args.args[1], "no_captions")
+
+    @patch('src.server.is_cached', return_value=False)
+    @patch('src.cancellation.subprocess.run')
+    def test_cached_too_long_skips_download(self, mock_run, _):
+        with patch('src.server.get_negative_result',
+                   side_effect=lambda key, reason: {"error": "Video too long (max 30 minutes allowed)",
+                                                    "detail": "Video is 45.0 minutes long"}
+                   if reason == "too_long" else None):
+            result = asyncio.run(fallback_to_whisper("https://youtu.be/x"))
+
+        self.assertEqual(result["error"], "Video too long (max 30 minutes allowed)")
+        self.assertTrue(result["cached"])
+        mock_run.assert_not_called()
+
+    @patch('src.server.is_cached', return_value=False)
+    @patch('src.server.get_negative_result', return_value=None)
+    @patch('src.server.save_negative_result')
+    @patch('src.cancellation.subprocess.run')
+    def test_too_long_is_recorded(self, mock_run, mock_save, *_):
+        mock_run.return_value = MagicMock(returncode=0, stdout="45:00\n", stderr="")
+
+        result = asyncio.run(fallback_to_whisper("https://youtu.be/x"))
+
+        self.assertIn("too long", result["error"])
+        self.assertEqual(mock_save.call_args.args[1], "too_long")
+
+
 class TestServerIntegration(unittest.TestCase):
     """Test server integration with cache module"""
 
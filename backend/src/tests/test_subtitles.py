@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+
+from src.subtitles import iter_subtitle_captions, parse_subtitle_file, timestamp_to_seconds
+
+VTT = """WEBVTT
+Kind: captions
+Language: en
+
+NOTE generated by hand
+
+intro
+00:00:01.000 --> 00:00:03.500 align:start position:0%
+<c>Hello</c> <00:00:02.280>there,
+everyone.
+
+00:00:03.500 --> 00:00:04.000
+a
+
+00:01:05.250 --> 00:01:08.000
+Let's begin.
+"""
+
+SRT = """1
+00:00:01,000 --> 00:00:03,500
+<i>Hello there,</i>
+everyone.
+
+2
+01:02:03,040 --> 01:02:05,000
+Goodbye."""
+
+
+class TestTimestampToSeconds(unittest.TestCase):
+    def test_vtt_and_srt_formats(self):
+        self.assertEqual(timestamp_to_seconds("01:30:45.500"), 5445.5)
+        self.assertEqual(timestamp_to_seconds("01:30:45,500"), 5445.5)
+
+    def test_vtt_without_hours(self):
+        self.assertEqual(timestamp_to_seconds("02:03.250"), 123.25)
+
+
+class TestIterSubtitleCaptions(unittest.TestCase):
+    def test_vtt(self):
+        captions = list(iter_subtitle_captions(VTT.splitlines()))
+        self.assertEqual(captions, [
+            {"start": 1.0, "end": 3.5, "text": "Hello there, everyone."},
+            {"start": 65.25, "end": 68.0, "text": "Let's begin."},
+        ])
+
+    def test_srt_without_trailing_blank_line(self):
+        captions = list(iter_subtitle_captions(SRT.splitlines()))
+        self.assertEqual(captions, [
+            {"start": 1.0, "end": 3.5, "text": "Hello there, everyone."},
+            {"start": 3723.04, "end": 3725.0, "text": "Goodbye."},
+        ])
+
+    def test_consumes_lines_lazily(self):
+        lines = iter(VTT.splitlines())
+        captions = iter_subtitle_captions(lines)
+        next(captions)
+        # Only the first cue and the line ending it have been read
+        self.assertEqual(next(lines), "00:00:03.500 --> 00:00:04.000")
+
+
+class TestParseSubtitleFile(unittest.TestCase):
+    def test_srt_file_with_byte_order_mark(self):
+        handle, path = tempfile.mkstemp(suffix=".srt")
+        with os.fdopen(handle, "w", encoding="utf-8") as f:
+            f.write("\ufeff" + SRT)
+        self.addCleanup(os.remove, path)
+
+        captions = parse_subtitle_file(path)
+
+        self.assertEqual(len(captions), 2)
+        self.assertEqual(captions[0]["start"], 1.0)
+
+    def test_missing_file_gives_no_captions(self):
+        self.assertEqual(parse_subtitle_file("/nonexistent/file.vtt"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import asyncio
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.timing import ServerTimingMiddleware, server_timing_header, span, summarize, timed
+
+
+@timed("parse_captions")
+def parse():
+    return []
+
+
+def make_client(enabled=True):
+    app = FastAPI()
+    app.add_middleware(ServerTimingMiddleware, enabled=enabled)
+
+    @app.get("/work")
+    async def work():
+        with span("cache_read"):
+            pass
+        # Worker threads record into the same request
+        await asyncio.to_thread(parse)
+        await asyncio.to_thread(parse)
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+class TestServerTiming(unittest.TestCase):
+    def test_header_lists_stages_and_total(self):
+        response = make_client().get("/work")
+        header = response.headers["server-timing"]
+
+        names = [entry.split(";")[0] for entry in header.split(", ")]
+        self.assertEqual(names, ["cache_read", "parse_captions", "total"])
+        self.assertIn('desc="2 calls"', header)
+
+    def test_disabled_adds_no_header(self):
+        response = make_client(enabled=False).get("/work")
+        self.assertNotIn("server-timing", response.headers)
+
+    def test_span_outside_request_is_a_no_op(self):
+        self.assertEqual(parse(), [])
+
+    def test_summary_sums_repeated_stages(self):
+        stages = summarize([("whisper", 0.5), ("cache_read", 0.001), ("whisper", 0.25)])
+        self.assertEqual(stages["whisper"], {"ms": 750.0, "count": 2})
+        self.assertEqual(
+            server_timing_header(stages, 800),
+            'whisper;dur=750.0;desc="2 calls", cache_read;dur=1.0, total;dur=800.0')
+
+
+if __name__ == "__main__":
+    unittest.main()
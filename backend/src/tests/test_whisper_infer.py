@@ -0,0 +1,407 @@
+import contextvars
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+import src.whisper_infer as whisper_infer
+from src.cancellation import CancelToken, JobCancelled, set_current_token
+from src.whisper_infer import (
+    CHUNK_SEARCH_SECONDS,
+    SAMPLE_RATE,
+    TranscriptionBackend,
+    format_captions,
+    get_backend,
+    split_audio_windows,
+    split_timestamped_tokens,
+    transcribe_audio,
+    transcribe_ranges,
+    transcribe_whole,
+    transcribe_windows,
+    transcribe_with_whisper,
+    transcribe_with_word_timings,
+)
+
+
+class FakeBackend(TranscriptionBackend):
+    name = "fake"
+    batches_windows = True
+
+    def transcribe(self, audio):
+        return [
+            {"start": 0.0, "end": 1.23456, "text": " Hello world. ", "words": [
+                {"start": 0.0, "end": 0.5, "word": " Hello"},
+                {"start": 0.6, "end": 1.23456, "word": " world."},
+            ]},
+            {"start": 1.23456, "end": 3.5, "text": "How are you?", "words": [
+                {"start": 1.3, "end": 3.5, "word": " How are you?"},
+            ]},
+        ]
+
+
+class IncrementalBackend(FakeBackend):
+    """Backend decoding one segment per second of audio as they are consumed."""
+
+    def __init__(self, model_name, on_segment=None):
+        super().__init__(model_name)
+        self.decoded = 0
+        self.on_segment = on_segment or (lambda: None)
+
+    def iter_segments(self, audio):
+        for second in range(len(audio) // SAMPLE_RATE):
+            self.decoded += 1
+            self.on_segment()
+            yield {"start": float(second), "end": second + 1.0, "text": "Hi", "words": []}
+
+
+class TestTranscribeWhole(unittest.TestCase):
+    def setUp(self):
+        self.token = CancelToken()
+        self.context = contextvars.copy_context()
+        self.context.run(set_current_token, self.token)
+
+    def test_progress_is_reported_per_segment(self):
+        progress = []
+        backend = IncrementalBackend("tiny", on_segment=lambda: progress.append(self.token.progress))
+
+        segments = self.context.run(transcribe_whole, np.zeros(4 * SAMPLE_RATE, dtype=np.float32), backend)
+
+        self.assertEqual(len(segments), 4)
+        self.assertEqual(progress, [0.0, 0.25, 0.5, 0.75])
+        self.assertEqual(self.token.progress, 1.0)
+
+    def test_cancel_stops_between_segments(self):
+        def cancel_at_second():
+            if backend.decoded == 2:
+                self.token.cancel()
+
+        backend = IncrementalBackend("tiny", on_segment=cancel_at_second)
+        with self.assertRaises(JobCancelled):
+            self.context.run(transcribe_whole, np.zeros(10 * SAMPLE_RATE, dtype=np.float32), backend)
+        self.assertEqual(backend.decoded, 2)
+
+    def test_monolithic_backend_finishes_instead(self):
+        token = self.token
+
+        class CancelledDuringTranscribe(FakeBackend):
+            def transcribe(self, audio):
+                self.refused = not token.cancel()
+                return super().transcribe(audio)
+
+        backend = CancelledDuringTranscribe("tiny")
+        segments = self.context.run(transcribe_whole, np.zeros(4 * SAMPLE_RATE, dtype=np.float32), backend)
+        self.assertTrue(backend.refused)
+        self.assertEqual(len(segments), 2)
+
+
+class TestGetBackend(unittest.TestCase):
+    def setUp(self):
+        whisper_infer._loaded_backends.clear()
+
+    def tearDown(self):
+        whisper_infer._loaded_backends.clear()
+
+    def test_unknown_backend_raises(self):
+        with self.assertRaises(ValueError):
+            get_backend("no-such-backend")
+
+    def test_backend_is_loaded_once(self):
+        with patch.dict(whisper_infer.BACKENDS, {"fake": FakeBackend}):
+            first = get_backend("fake", "tiny")
+            second = get_backend("fake", "tiny")
+        self.assertIs(first, second)
+        self.assertEqual(first.model_name, "tiny")
+
+    def test_backends_are_keyed_by_model(self):
+        with patch.dict(whisper_infer.BACKENDS, {"fake": FakeBackend}):
+            tiny = get_backend("fake", "tiny")
+            base = get_backend("fake", "base")
+        self.assertIsNot(tiny, base)
+
+
+class TestTranscribeWithWhisper(unittest.TestCase):
+    def test_format_captions(self):
+        captions = format_captions(FakeBackend("tiny").transcribe("clip.mp4"))
+        self.assertEqual(captions, [
+            {"start": 0.0, "end": 1.23, "text": "Hello world."},
+            {"start": 1.23, "end": 3.5, "text": "How are you?"},
+        ])
+
+    @patch("src.whisper_infer.CHUNK_CACHE_ENABLED", False)
+    @patch("src.whisper_infer.WHISPER_BATCHING", False)
+    def test_transcribe_uses_given_backend(self):
+        captions = transcribe_with_whisper("clip.mp4", backend=FakeBackend("tiny"))
+        self.assertEqual(len(captions), 2)
+        for caption in captions:
+            self.assertEqual(set(caption), {"start", "end", "text"})
+
+    @patch("src.whisper_infer.CHUNK_CACHE_ENABLED", False)
+    @patch("src.whisper_infer.WHISPER_BATCHING", False)
+    def test_word_timings_in_milliseconds(self):
+        captions, words = transcribe_with_word_timings("clip.mp4", backend=FakeBackend("tiny"))
+        self.assertEqual(len(captions), 2)
+        self.assertEqual(words, {
+            "start": [0, 600, 1300],
+            "end": [500, 1235, 3500],
+            "text": [" Hello", " world.", " How are you?"],
+        })
+
+    @patch("src.whisper_infer.CHUNK_CACHE_ENABLED", False)
+    @patch("src.whisper_infer.load_audio")
+    def test_window_word_timings_are_offset(self, mock_load_audio):
+        audio = np.ones(70 * SAMPLE_RATE, dtype=np.float32)
+        mock_load_audio.return_value = audio
+        second_window = split_audio_windows(audio, search_seconds=CHUNK_SEARCH_SECONDS)[1][0]
+
+        _captions, words = transcribe_with_word_timings("clip.mp4", backend=FakeBackend("tiny"))
+
+        self.assertEqual(words["start"][3], round(second_window / SAMPLE_RATE * 1000))
+
+    @patch("src.whisper_infer.CHUNK_CACHE_ENABLED", False)
+    @patch("src.whisper_infer.load_audio")
+    def test_short_clip_is_transcribed_in_windows(self, mock_load_audio):
+        audio = np.ones(70 * SAMPLE_RATE, dtype=np.float32)
+        mock_load_audio.return_value = audio
+        windows = split_audio_windows(audio, search_seconds=CHUNK_SEARCH_SECONDS)
+
+        captions = transcribe_with_whisper("clip.mp4", backend=FakeBackend("tiny"))
+
+        # Two captions per window, each offset by its window's start time
+        self.assertEqual(len(captions), 2 * len(windows))
+        for i, (start, _end) in enumerate(windows):
+            self.assertEqual(captions[2 * i]["start"], round(start / SAMPLE_RATE, 2))
+
+    @patch("src.whisper_infer.load_audio")
+    def test_backend_without_batching_transcribes_whole_clips(self, mock_load_audio):
+        mock_load_audio.return_value = np.ones(70 * SAMPLE_RATE, dtype=np.float32)
+        backend = CountingBackend("tiny")
+        backend.batches_windows = False
+
+        captions = transcribe_with_whisper("clip.mp4", backend=backend)
+
+        self.assertEqual(backend.windows, 1)
+        self.assertEqual(len(captions), 2)
+
+
+class TestTranscribeRanges(unittest.TestCase):
+    @patch("src.whisper_infer.CHUNK_CACHE_ENABLED", False)
+    @patch("src.whisper_infer.WHISPER_BATCHING", False)
+    @patch("src.whisper_infer.load_audio")
+    def test_only_ranges_are_transcribed(self, mock_load_audio):
+        mock_load_audio.return_value = np.zeros(600 * SAMPLE_RATE, dtype=np.float32)
+        backend = CountingBackend("tiny")
+
+        with patch("src.whisper_infer.get_backend", return_value=backend):
+            captions, words, used = transcribe_ranges("clip.mp4", [(60, 70), (300, 320)])
+
+        self.assertIs(used, backend)
+        self.assertEqual(backend.windows, 2)
+        self.assertEqual([c["start"] for c in captions], [60.0, 61.23, 300.0, 301.23])
+        self.assertEqual(words["start"][3], 300000)
+
+    @patch("src.whisper_infer.CHUNK_CACHE_ENABLED", False)
+    @patch("src.whisper_infer.WHISPER_BATCHING", False)
+    @patch("src.whisper_infer.save_peaks")
+    @patch("src.whisper_infer.load_audio")
+    def test_peaks_come_from_the_same_decode(self, mock_load_audio, mock_save_peaks):
+        audio = np.zeros(600 * SAMPLE_RATE, dtype=np.float32)
+        mock_load_audio.return_value = audio
+
+        with patch("src.whisper_infer.get_backend", return_value=CountingBackend("tiny")):
+            transcribe_ranges("clip.mp4", [(60, 70)], cache_key="key")
+
+        mock_load_audio.assert_called_once()
+        mock_save_peaks.assert_called_once_with("key", audio, SAMPLE_RATE)
+
+    @patch("src.whisper_infer.load_audio")
+    def test_progress_spans_all_ranges(self, mock_load_audio):
+        mock_load_audio.return_value = np.zeros(600 * SAMPLE_RATE, dtype=np.float32)
+        token = CancelToken()
+        progress = []
+
+        def transcribe_half(audio, backend):
+            whisper_infer.report_progress(0.5)
+            progress.append(token.progress)
+            return []
+
+        context = contextvars.copy_context()
+        context.run(set_current_token, token)
+        with patch("src.whisper_infer.get_backend", return_value=CountingBackend("tiny")), \
+                patch("src.whisper_infer.transcribe_audio", side_effect=transcribe_half):
+            context.run(transcribe_ranges, "clip.mp4", [(60, 70), (300, 330)])
+
+        # Halfway through 10 s of 40 s, then through the remaining 30 s
+        self.assertEqual(progress, [0.125, 0.625])
+        self.assertEqual(token.progress, 1.0)
+
+
+class CountingBackend(FakeBackend):
+    def __init__(self, model_name):
+        super().__init__(model_name)
+        self.windows = 0
+
+    def transcribe(self, audio):
+        self.windows += 1
+        return super().transcribe(audio)
+
+
+@patch("src.whisper_infer.WHISPER_BATCHING", False)
+class TestChunkCache(unittest.TestCase):
+    def setUp(self):
+        self.chunk_dir = tempfile.mkdtemp()
+        patcher = patch("src.cache.CHUNK_CACHE_DIR", self.chunk_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.chunk_dir)
+
+        # Noise with short pauses at 22 s, 48 s and 73 s
+        rng = np.random.default_rng(1)
+        self.audio = rng.uniform(0.1, 0.5, 90 * SAMPLE_RATE).astype(np.float32)
+        for pause in (22, 48, 73):
+            self.audio[pause * SAMPLE_RATE:pause * SAMPLE_RATE + SAMPLE_RATE // 5] = 0.0
+
+    def transcribe(self, audio, backend):
+        return format_captions(transcribe_windows(audio, backend))
+
+    def test_identical_audio_is_served_from_chunk_cache(self):
+        first = CountingBackend("tiny")
+        captions = self.transcribe(self.audio, first)
+        self.assertEqual(first.windows, 4)
+
+        second = CountingBackend("tiny")
+        self.assertEqual(self.transcribe(self.audio, second), captions)
+        self.assertEqual(second.windows, 0)
+
+    def test_cut_points_realign_on_identical_samples(self):
+        # Only holds because the trimmed samples are bit-identical and the
+        # pauses are digital silence; real trims and re-encodes miss
+        self.transcribe(self.audio, CountingBackend("tiny"))
+
+        trimmed = CountingBackend("tiny")
+        self.transcribe(self.audio[12345:], trimmed)
+
+        self.assertEqual(trimmed.windows, 1)
+
+    @patch("src.whisper_infer.WHISPER_BATCH_SIZE", 1)
+    def test_cancelled_run_keeps_finished_chunks(self):
+        token = CancelToken()
+
+        class CancellingBackend(CountingBackend):
+            def transcribe(self, audio):
+                if self.windows == 1:
+                    token.cancel()
+                return super().transcribe(audio)
+
+        context = contextvars.copy_context()
+        context.run(set_current_token, token)
+        with self.assertRaises(JobCancelled):
+            context.run(self.transcribe, self.audio, CancellingBackend("tiny"))
+        self.assertEqual(token.progress, 0.5)
+
+        resumed = CountingBackend("tiny")
+        self.transcribe(self.audio, resumed)
+        self.assertEqual(resumed.windows, 2)
+
+    def test_chunks_are_not_shared_between_models(self):
+        self.transcribe(self.audio, CountingBackend("tiny"))
+
+        other_model = CountingBackend("base")
+        self.transcribe(self.audio, other_model)
+
+        self.assertEqual(other_model.windows, 4)
+
+    def test_chunks_depend_on_word_timestamps(self):
+        self.transcribe(self.audio, CountingBackend("tiny"))
+
+        without_words = CountingBackend("tiny")
+        with patch("src.whisper_infer.WHISPER_WORD_TIMESTAMPS", False):
+            self.transcribe(self.audio, without_words)
+
+        self.assertEqual(without_words.windows, 4)
+
+
+class TestFullTranscription(unittest.TestCase):
+    @patch("src.whisper_infer.WHISPER_BATCHING", True)
+    def test_long_audio_keeps_full_transcribe(self):
+        backend = CountingBackend("tiny")
+        seconds = int(whisper_infer.WHISPER_BATCH_MAX_CLIP_SECONDS) + 60
+        audio = np.ones(seconds * SAMPLE_RATE, dtype=np.float32)
+
+        with patch("src.whisper_infer.transcribe_windows") as mock_windows:
+            transcribe_audio(audio, backend)
+
+        mock_windows.assert_not_called()
+        self.assertEqual(backend.windows, 1)
+
+    @patch("src.whisper_infer.WHISPER_BATCHING", False)
+    def test_unbatched_audio_skips_windows_and_chunk_cache(self):
+        backend = CountingBackend("tiny")
+        with patch("src.whisper_infer.load_chunk_from_cache") as mock_load_chunk:
+            transcribe_audio(np.ones(60 * SAMPLE_RATE, dtype=np.float32), backend)
+
+        mock_load_chunk.assert_not_called()
+        self.assertEqual(backend.windows, 1)
+
+
+class TestSplitAudioWindows(unittest.TestCase):
+    def test_short_audio_is_one_window(self):
+        audio = np.ones(10 * SAMPLE_RATE, dtype=np.float32)
+        self.assertEqual(split_audio_windows(audio), [(0, len(audio))])
+
+    def test_empty_audio(self):
+        self.assertEqual(split_audio_windows(np.zeros(0, dtype=np.float32)), [])
+
+    def test_cuts_at_quietest_point(self):
+        audio = np.ones(50 * SAMPLE_RATE, dtype=np.float32)
+        silence = 27 * SAMPLE_RATE
+        audio[silence:silence + SAMPLE_RATE // 10] = 0.0
+
+        windows = split_audio_windows(audio)
+
+        self.assertEqual(windows, [(0, silence), (silence, len(audio))])
+
+    def test_windows_cover_audio_within_limit(self):
+        audio = np.random.default_rng(0).standard_normal(125 * SAMPLE_RATE).astype(np.float32)
+        windows = split_audio_windows(audio)
+
+        self.assertEqual(windows[0][0], 0)
+        self.assertEqual(windows[-1][1], len(audio))
+        for (_, end), (start, _) in zip(windows, windows[1:]):
+            self.assertEqual(end, start)
+        for start, end in windows:
+            self.assertLessEqual(end - start, 30 * SAMPLE_RATE)
+
+
+class TestSplitTimestampedTokens(unittest.TestCase):
+    TS = 1000  # timestamp_begin
+    EOT = 900
+
+    def decode(self, tokens):
+        return " ".join(str(t) for t in tokens)
+
+    def test_segments_from_timestamp_pairs(self):
+        tokens = [self.TS, 1, 2, self.TS + 120, self.TS + 120, 3, self.TS + 250]
+        segments = split_timestamped_tokens(
+            tokens, self.TS, self.EOT, self.decode, duration=30.0)
+        self.assertEqual(segments, [
+            {"start": 0.0, "end": 2.4, "text": "1 2", "tokens": [1, 2]},
+            {"start": 2.4, "end": 5.0, "text": "3", "tokens": [3]},
+        ])
+
+    def test_unterminated_text_ends_at_duration(self):
+        tokens = [self.TS + 50, 4, 5]
+        segments = split_timestamped_tokens(
+            tokens, self.TS, self.EOT, self.decode, duration=12.0)
+        self.assertEqual(segments, [{"start": 1.0, "end": 12.0, "text": "4 5", "tokens": [4, 5]}])
+
+    def test_special_tokens_are_dropped(self):
+        tokens = [self.TS, 7, self.EOT + 5, self.TS + 100]
+        segments = split_timestamped_tokens(
+            tokens, self.TS, self.EOT, self.decode, duration=30.0)
+        self.assertEqual(segments[0]["text"], "7")
+
+
+if __name__ == "__main__":
+    unittest.main()
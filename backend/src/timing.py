@@ -0,0 +1,116 @@
+import contextvars
+import functools
+import logging
+import time
+from contextlib import contextmanager
+
+from src.constants import SERVER_TIMING
+
+logger = logging.getLogger(__name__)
+
+# Spans recorded for the request the current task (or worker thread, which
+# inherits the context through asyncio.to_thread) works for; None when the
+# request is not timed, in which case span() does nothing
+_current_spans = contextvars.ContextVar("timing_spans", default=None)
+
+
+def detach_spans():
+    """Stops timing the current task into the request it was started from.
+
+    For background tasks that outlive the request, whose spans nobody reads
+    after its response.
+    """
+    _current_spans.set(None)
+
+
+@contextmanager
+def span(name: str):
+    """Times the block as the stage `name` of the current request."""
+    spans = _current_spans.get()
+    if spans is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append((name, time.perf_counter() - start))
+
+
+def timed(name: str):
+    """Decorator timing every call of the function as the stage `name`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def summarize(spans: list) -> dict:
+    """Total milliseconds and call count per stage, in the order stages first ran."""
+    stages = {}
+    for name, seconds in spans:
+        stage = stages.setdefault(name, {"ms": 0.0, "count": 0})
+        stage["ms"] += seconds * 1000
+        stage["count"] += 1
+    return stages
+
+
+def server_timing_header(stages: dict, total_ms: float) -> str:
+    entries = [
+        f'{name};dur={stage["ms"]:.1f}' + (f';desc="{stage["count"]} calls"' if stage["count"] > 1 else "")
+        for name, stage in stages.items()
+    ]
+    entries.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(entries)
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware adding per-stage durations of each request to a
+    Server-Timing header and logging them as the request's summary line.
+
+    Stages are recorded by span() and timed() anywhere in the request's
+    task or its worker threads. Durations of a stage that ran several
+    times (e.g. cache reads) are summed.
+    """
+
+    def __init__(self, app, enabled: bool = SERVER_TIMING):
+        self.app = app
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        spans = []
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                total_ms = (time.perf_counter() - start) * 1000
+                stages = summarize(spans)
+                header = server_timing_header(stages, total_ms)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", header.encode("latin-1")),
+                    # Lets the cross-origin frontend's devtools show the stages
+                    (b"timing-allow-origin", b"*"),
+                ]
+                logger.info("%s %s %d in %.1f ms", scope["method"], scope["path"],
+                            message["status"], total_ms, extra={
+                                "method": scope["method"],
+                                "path": scope["path"],
+                                "status": message["status"],
+                                "total_ms": round(total_ms, 1),
+                                "stages": {name: round(stage["ms"], 1) for name, stage in stages.items()},
+                            })
+            await send(message)
+
+        token = _current_spans.set(spans)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_spans.reset(token)
@@ -1,10 +1,458 @@
-import whisper
+import logging
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
-model = whisper.load_model("base")
+import ffmpeg
+import numpy as np
 
-def transcribe_with_whisper(file_path: str):
-    result = model.transcribe(file_path)
-    segments = result.get("segments", [])
+from src.batching import get_scheduler
+from src.cache import get_chunk_key, load_chunk_from_cache, save_chunk_to_cache
+from src.cancellation import (
+    POLL_SECONDS,
+    JobCancelled,
+    check_cancelled,
+    communicate,
+    progress_share,
+    report_progress,
+    uninterruptible,
+)
+from src.constants import (
+    CHUNK_CACHE_ENABLED,
+    CHUNK_SEARCH_SECONDS,
+    WHISPER_BACKEND,
+    WHISPER_BATCH_MAX_CLIP_SECONDS,
+    WHISPER_BATCH_SIZE,
+    WHISPER_BATCHING,
+    WHISPER_COMPUTE_TYPE,
+    WHISPER_CPU_THREADS,
+    WHISPER_MODEL,
+    WHISPER_WORD_TIMESTAMPS,
+)
+from src.model_scheduler import get_model_scheduler
+from src.peaks import save_peaks
+from src.segmentation import pack_words
+from src.timing import timed
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+WINDOW_SECONDS = 30  # Whisper's encoder input length
+
+
+class TranscriptionBackend:
+    """Base class for the speech-to-text engines behind transcribe_with_whisper.
+
+    Subclasses load their model in __init__ and implement transcribe(), which
+    returns raw segments as dicts with "start", "end" and "text" keys, plus
+    "words" (dicts with "start", "end" and "word") when WHISPER_WORD_TIMESTAMPS
+    is enabled.
+    """
+
+    name = "base"
+    # Whether transcribe_batch() decodes windows as one batch; backends
+    # without it transcribe whole files even when WHISPER_BATCHING is on
+    batches_windows = False
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    @property
+    def model_id(self) -> str:
+        return f"{self.name}:{self.model_name}"
+
+    @property
+    def decode_options(self) -> str:
+        """Settings besides the model that shape windowed output (transcribe_batch)."""
+        return "temperature=0,beam_size=1"
+
+    def transcribe(self, audio) -> list:
+        """Transcribes a media file path (or 16 kHz mono float32 samples).
+
+        Args:
+            audio: Path to a media file or a NumPy array of samples.
+
+        Returns:
+            list: Raw segments with "start", "end" and "text" keys.
+        """
+        raise NotImplementedError
+
+    def iter_segments(self, audio):
+        """Yields the raw segments of transcribe() as they are decoded.
+
+        Backends that decode incrementally override this, so a long
+        transcription can stop and report progress between segments. The
+        default runs transcribe() to the end first, which cannot be cancelled.
+        """
+        with uninterruptible():
+            segments = self.transcribe(audio)
+        yield from segments
+
+    def transcribe_batch(self, audios: list) -> list:
+        """Transcribes several windows of at most WINDOW_SECONDS each.
+
+        Backends that can run windows through the model as one batch override
+        this; the default transcribes them one after another.
+
+        Args:
+            audios (list): NumPy arrays of 16 kHz mono samples.
+
+        Returns:
+            list: One list of raw segments per window, timed from its start.
+        """
+        return [self.transcribe(audio) for audio in audios]
+
+
+class OpenAIWhisperBackend(TranscriptionBackend):
+    """Reference PyTorch implementation from the openai-whisper package."""
+
+    name = "openai-whisper"
+    batches_windows = True
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        import whisper
+
+        self.model = whisper.load_model(model_name)
+
+    def transcribe(self, audio) -> list:
+        result = self.model.transcribe(audio, word_timestamps=WHISPER_WORD_TIMESTAMPS)
+        return [
+            {
+                "start": seg["start"],
+                "end": seg["end"],
+                "text": seg["text"],
+                "words": [
+                    {"start": w["start"], "end": w["end"], "word": w["word"]}
+                    for w in seg.get("words", [])
+                ],
+            }
+            for seg in result.get("segments", [])
+        ]
+
+    def transcribe_batch(self, audios: list) -> list:
+        import torch
+        import whisper
+        from whisper.audio import HOP_LENGTH
+        from whisper.timing import add_word_timestamps
+        from whisper.tokenizer import get_tokenizer
+
+        mel = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), self.model.dims.n_mels)
+            for audio in audios
+        ]).to(self.model.device)
+        options = whisper.DecodingOptions(fp16=self.model.device.type != "cpu")
+        results = whisper.decode(self.model, mel, options)
+
+        batch_segments = []
+        for audio, window_mel, result in zip(audios, mel, results):
+            # Same silence heuristic as model.transcribe()
+            if result.no_speech_prob > 0.6 and result.avg_logprob < -1.0:
+                batch_segments.append([])
+                continue
+
+            tokenizer = get_tokenizer(
+                self.model.is_multilingual,
+                num_languages=self.model.num_languages,
+                language=result.language,
+                task="transcribe",
+            )
+            segments = split_timestamped_tokens(
+                result.tokens,
+                timestamp_begin=tokenizer.timestamp_begin,
+                eot=tokenizer.eot,
+                decode=tokenizer.decode,
+                duration=len(audio) / SAMPLE_RATE,
+            )
+            if WHISPER_WORD_TIMESTAMPS and segments:
+                for seg in segments:
+                    seg["seek"] = 0
+                add_word_timestamps(
+                    segments=segments,
+                    model=self.model,
+                    tokenizer=tokenizer,
+                    mel=window_mel,
+                    num_frames=len(audio) // HOP_LENGTH,
+                    last_speech_timestamp=0.0,
+                )
+
+            batch_segments.append([
+                {
+                    "start": seg["start"],
+                    "end": seg["end"],
+                    "text": seg["text"],
+                    "words": [
+                        {"start": w["start"], "end": w["end"], "word": w["word"]}
+                        for w in seg.get("words", [])
+                    ],
+                }
+                for seg in segments
+            ])
+        return batch_segments
+
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """CTranslate2 runtime from the faster-whisper package.
+
+    Weights are quantized to WHISPER_COMPUTE_TYPE (int8 by default), which is
+    several times faster than the PyTorch model on CPU-only hosts.
+    """
+
+    name = "faster-whisper"
+
+    def __init__(self,
+                 model_name: str,
+                 compute_type: str = WHISPER_COMPUTE_TYPE,
+                 cpu_threads: int = WHISPER_CPU_THREADS):
+        super().__init__(model_name)
+        from faster_whisper import WhisperModel
+
+        if WHISPER_BATCHING:
+            logger.info("faster-whisper has no batched window decoding; "
+                        "transcribing whole files with %s despite WHISPER_BATCHING", model_name)
+        self.compute_type = compute_type
+        self.model = WhisperModel(
+            model_name,
+            device="cpu",
+            compute_type=compute_type,
+            cpu_threads=cpu_threads,
+        )
+
+    @property
+    def decode_options(self) -> str:
+        return f"{super().decode_options},compute_type={self.compute_type}"
+
+    def transcribe(self, audio) -> list:
+        return list(self.iter_segments(audio))
+
+    def iter_segments(self, audio):
+        # Greedy decoding, matching openai-whisper's transcribe() default.
+        # Segments are decoded lazily as the generator is consumed.
+        segments, _info = self.model.transcribe(
+            audio, beam_size=1, word_timestamps=WHISPER_WORD_TIMESTAMPS)
+        for seg in segments:
+            yield {
+                "start": seg.start,
+                "end": seg.end,
+                "text": seg.text,
+                "words": [
+                    {"start": w.start, "end": w.end, "word": w.word}
+                    for w in seg.words or []
+                ],
+            }
+
+
+BACKENDS = {
+    OpenAIWhisperBackend.name: OpenAIWhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+_loaded_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(name: str = None, model_name: str = None) -> TranscriptionBackend:
+    """Returns a loaded transcription backend, loading its model on first use.
+
+    Args:
+        name (str): Backend name from BACKENDS. Defaults to WHISPER_BACKEND.
+        model_name (str): Whisper model size. Defaults to WHISPER_MODEL.
+
+    Returns:
+        TranscriptionBackend: The shared backend instance.
+    """
+    name = name or WHISPER_BACKEND
+    model_name = model_name or WHISPER_MODEL
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend: {name}")
+
+    with _backends_lock:
+        key = (name, model_name)
+        if key not in _loaded_backends:
+            logger.info("Loading %s backend with model %s", name, model_name)
+            _loaded_backends[key] = BACKENDS[name](model_name)
+        return _loaded_backends[key]
+
+
+@timed("audio_decode")
+def load_audio(file_path: str) -> np.ndarray:
+    """Decodes a media file into 16 kHz mono float32 samples with ffmpeg.
+
+    The decode is killed if the request it runs for is cancelled.
+    """
+    process = (
+        ffmpeg.input(file_path, threads=0)
+        .output("-", format="s16le", acodec="pcm_s16le", ac=1, ar=SAMPLE_RATE)
+        .run_async(cmd=["ffmpeg", "-nostdin"], pipe_stdout=True, pipe_stderr=True)
+    )
+    out, err = communicate(process)
+    if process.returncode:
+        raise ffmpeg.Error("ffmpeg", out, err)
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+
+def split_audio_windows(audio: np.ndarray,
+                        max_seconds: float = WINDOW_SECONDS,
+                        search_seconds: float = 5.0) -> list:
+    """Splits audio into windows of at most max_seconds.
+
+    Each cut is placed where the energy of the following 20 ms is lowest
+    within the last search_seconds of the window, so words are rarely split
+    between windows. The energy is evaluated at every sample rather than on a
+    fixed frame grid, so a cut does not move with the frame phase. Cut points
+    still depend on where the audio starts; see the chunk cache notes in
+    CACHE_README.md.
+
+    Returns:
+        list: (start_sample, end_sample) tuples covering the whole audio.
+    """
+    frame = SAMPLE_RATE // 50
+    max_len = int(max_seconds * SAMPLE_RATE)
+    search = int(search_seconds * SAMPLE_RATE)
+
+    windows = []
+    start = 0
+    while len(audio) - start > max_len:
+        lo = start + max_len - search
+        power = np.cumsum(np.square(audio[lo:start + max_len], dtype=np.float64))
+        power = np.concatenate(([0.0], power))
+        energy = power[frame:] - power[:-frame]
+        cut = lo + int(np.argmin(energy))
+        windows.append((start, cut))
+        start = cut
+
+    if start < len(audio):
+        windows.append((start, len(audio)))
+    return windows
+
+
+def split_timestamped_tokens(tokens: list,
+                             timestamp_begin: int,
+                             eot: int,
+                             decode,
+                             duration: float) -> list:
+    """Turns Whisper output tokens with timestamp tokens into raw segments.
+
+    Timestamp tokens (ids >= timestamp_begin) mark segment boundaries in
+    0.02 second steps; text without a closing timestamp ends at duration.
+    Each segment keeps its text "tokens" for word-level alignment.
+    """
+    segments = []
+    text_tokens = []
+    start = None
+    last_time = 0.0
+
+    for token in tokens:
+        if token >= timestamp_begin:
+            time = min((token - timestamp_begin) * 0.02, duration)
+            if text_tokens:
+                segments.append({
+                    "start": start if start is not None else last_time,
+                    "end": time,
+                    "text": decode(text_tokens),
+                    "tokens": text_tokens,
+                })
+                text_tokens = []
+                start = None
+            else:
+                start = time
+            last_time = time
+        elif token < eot:
+            text_tokens.append(token)
+
+    if text_tokens:
+        segments.append({
+            "start": start if start is not None else last_time,
+            "end": duration,
+            "text": decode(text_tokens),
+            "tokens": text_tokens,
+        })
+    return segments
+
+
+def chunk_model_id(backend: TranscriptionBackend) -> str:
+    """Everything besides the samples that a cached window's segments depend on."""
+    return f"{backend.model_id}|{backend.decode_options}|word_timestamps={WHISPER_WORD_TIMESTAMPS}"
+
+
+def transcribe_windows(audio: np.ndarray, backend: TranscriptionBackend) -> list:
+    """Transcribes audio as <=30 s windows and joins the results.
+
+    With CHUNK_CACHE_ENABLED, windows whose PCM samples were transcribed
+    before with the same model and decode settings are served from the chunk
+    cache. The remaining windows go through the backend's batch scheduler, so
+    windows from concurrent requests share encoder/decoder passes (or in
+    groups of WHISPER_BATCH_SIZE when batching is off). Finished windows are
+    saved to the chunk cache as they complete, and a cancelled request stops
+    between windows.
+    """
+    windows = split_audio_windows(audio, search_seconds=CHUNK_SEARCH_SECONDS)
+    results = [None] * len(windows)
+    chunk_keys = [None] * len(windows)
+
+    if CHUNK_CACHE_ENABLED:
+        model_id = chunk_model_id(backend)
+        for i, (start, end) in enumerate(windows):
+            chunk_keys[i] = get_chunk_key(audio[start:end], model_id)
+            results[i] = load_chunk_from_cache(chunk_keys[i])
+
+    pending = [i for i, segments in enumerate(results) if segments is None]
+    if CHUNK_CACHE_ENABLED:
+        logger.debug("Reusing %d/%d cached audio chunks", len(windows) - len(pending), len(windows))
+
+    def finish(i, segments):
+        results[i] = segments
+        if CHUNK_CACHE_ENABLED:
+            save_chunk_to_cache(chunk_keys[i], segments)
+        report_progress(1 - results.count(None) / len(windows))
+
+    if WHISPER_BATCHING:
+        scheduler = get_scheduler(backend)
+        futures = [scheduler.submit(audio[windows[i][0]:windows[i][1]]) for i in pending]
+        try:
+            for i, future in zip(pending, futures):
+                finish(i, wait_for_window(future))
+        except JobCancelled:
+            # Windows not picked up by the scheduler yet are dropped
+            for future in futures:
+                future.cancel()
+            raise
+    else:
+        for group_start in range(0, len(pending), WHISPER_BATCH_SIZE):
+            check_cancelled()
+            group = pending[group_start:group_start + WHISPER_BATCH_SIZE]
+            transcribed = backend.transcribe_batch(
+                [audio[windows[i][0]:windows[i][1]] for i in group])
+            for i, segments in zip(group, transcribed):
+                finish(i, segments)
+
+    segments = []
+    for (start, _end), window_segments in zip(windows, results):
+        offset = start / SAMPLE_RATE
+        for seg in window_segments:
+            segments.append({
+                "start": seg["start"] + offset,
+                "end": seg["end"] + offset,
+                "text": seg["text"],
+                "words": [
+                    {"start": w["start"] + offset, "end": w["end"] + offset, "word": w["word"]}
+                    for w in seg.get("words", [])
+                ],
+            })
+    return segments
+
+
+def wait_for_window(future):
+    """Waits for a scheduled window, raising JobCancelled if the request is cancelled."""
+    while True:
+        check_cancelled()
+        try:
+            return future.result(timeout=POLL_SECONDS)
+        except FutureTimeoutError:
+            pass
+
+
+def format_captions(segments: list) -> list:
+    """Converts raw backend segments into the {start, end, text} caption shape."""
     caption_list = []
 
     for seg in segments:
@@ -15,3 +463,148 @@ def transcribe_with_whisper(file_path: str):
         })
 
     return caption_list
+
+
+@timed("whisper")
+def transcribe_audio(audio: np.ndarray, backend: TranscriptionBackend) -> list:
+    """Transcribes samples, in batched windows for short clips.
+
+    Only clips that are batched go through fixed windows (and the chunk
+    cache): long files, and backends without batched decoding, keep the
+    backend's full transcribe(), with its temperature fallback and
+    conditioning on previous text.
+    """
+    check_cancelled()
+    if (not WHISPER_BATCHING or not backend.batches_windows
+            or len(audio) > WHISPER_BATCH_MAX_CLIP_SECONDS * SAMPLE_RATE):
+        return transcribe_whole(audio, backend)
+    return transcribe_windows(audio, backend)
+
+
+def transcribe_whole(audio: np.ndarray, backend: TranscriptionBackend) -> list:
+    """Runs the backend's full transcribe() over samples.
+
+    Progress is reported, and a cancelled request stops, between segments
+    when the backend decodes incrementally (see iter_segments).
+    """
+    duration = len(audio) / SAMPLE_RATE
+    segments = []
+    for seg in backend.iter_segments(audio):
+        check_cancelled()
+        segments.append(seg)
+        if duration:
+            report_progress(min(1.0, seg["end"] / duration))
+    return segments
+
+
+def transcribe_segments(file_path: str, backend: TranscriptionBackend) -> list:
+    if not WHISPER_BATCHING:
+        return backend.transcribe(file_path)
+    return transcribe_audio(load_audio(file_path), backend)
+
+
+def collect_words(segments: list) -> dict:
+    return pack_words([w for seg in segments for w in seg.get("words", [])])
+
+
+def transcribe_with_word_timings(file_path: str, backend: TranscriptionBackend = None):
+    """Transcribes a media file into captions plus packed word timings.
+
+    Returns:
+        tuple: (captions, words) where words is the compact millisecond form
+            from segmentation.pack_words(), empty if word timestamps are off.
+    """
+    backend = backend or get_backend()
+    segments = transcribe_segments(file_path, backend)
+    return format_captions(segments), collect_words(segments)
+
+
+def transcribe_with_budget(file_path: str,
+                           target_seconds: float = None,
+                           model_name: str = None,
+                           cache_key: str = None):
+    """Transcribes a media file with the largest model that fits the latency budget.
+
+    The model is chosen by the ModelScheduler from the media duration, the
+    measured throughput of each model and the work already in flight.
+
+    Args:
+        file_path (str): Media file to transcribe.
+        target_seconds (float): Completion-time budget. Defaults to WHISPER_TARGET_SECONDS.
+        model_name (str): Skip selection and use this model (e.g. for upgrades).
+        cache_key (str): Cache entry to store the audio's waveform peaks for.
+
+    Returns:
+        tuple: (captions, words, backend) where backend is the TranscriptionBackend used.
+    """
+    scheduler = get_model_scheduler()
+    audio = load_audio(file_path)
+    if cache_key:
+        save_peaks(cache_key, audio, SAMPLE_RATE)
+    media_seconds = len(audio) / SAMPLE_RATE
+    model_name = model_name or scheduler.choose_model(media_seconds, target_seconds)
+    backend = get_backend(model_name=model_name)
+    logger.info("Transcribing %.0fs of audio with %s", media_seconds, backend.model_id)
+
+    with scheduler.track(model_name, media_seconds):
+        segments = transcribe_audio(audio, backend)
+    return format_captions(segments), collect_words(segments), backend
+
+
+def transcribe_ranges(file_path: str, ranges: list, target_seconds: float = None, cache_key: str = None):
+    """Transcribes only the given time ranges of a media file.
+
+    The model is chosen for the total length of the ranges, so the cost
+    scales with the part of the media that needs transcribing.
+
+    Args:
+        file_path (str): Media file to transcribe.
+        ranges (list): (start, end) tuples in seconds.
+        target_seconds (float): Completion-time budget. Defaults to WHISPER_TARGET_SECONDS.
+        cache_key (str): Cache entry to store the waveform peaks of the whole file for.
+
+    Returns:
+        tuple: (captions, words, backend) with times relative to the whole file.
+    """
+    scheduler = get_model_scheduler()
+    audio = load_audio(file_path)
+    if cache_key:
+        save_peaks(cache_key, audio, SAMPLE_RATE)
+    bounds = [
+        (int(start * SAMPLE_RATE), min(int(end * SAMPLE_RATE), len(audio)))
+        for start, end in ranges
+    ]
+    media_seconds = sum(max(0, end - start) for start, end in bounds) / SAMPLE_RATE
+    model_name = scheduler.choose_model(media_seconds, target_seconds)
+    backend = get_backend(model_name=model_name)
+    logger.info("Transcribing %.0fs in %d ranges with %s", media_seconds, len(ranges), backend.model_id)
+
+    segments = []
+    done_seconds = 0.0
+    with scheduler.track(model_name, media_seconds):
+        for start, end in bounds:
+            if end <= start:
+                continue
+            offset = start / SAMPLE_RATE
+            range_seconds = (end - start) / SAMPLE_RATE
+            # Progress is of all ranges, not restarted by each one
+            with progress_share(done_seconds / media_seconds, range_seconds / media_seconds):
+                range_segments = transcribe_audio(audio[start:end], backend)
+                report_progress(1.0)
+            done_seconds += range_seconds
+            for seg in range_segments:
+                segments.append({
+                    "start": seg["start"] + offset,
+                    "end": seg["end"] + offset,
+                    "text": seg["text"],
+                    "words": [
+                        {"start": w["start"] + offset, "end": w["end"] + offset, "word": w["word"]}
+                        for w in seg.get("words", [])
+                    ],
+                })
+    return format_captions(segments), collect_words(segments), backend
+
+
+def transcribe_with_whisper(file_path: str, backend: TranscriptionBackend = None):
+    backend = backend or get_backend()
+    return format_captions(transcribe_segments(file_path, backend))
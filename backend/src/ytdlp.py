@@ -0,0 +1,29 @@
+import time
+
+from src.cancellation import run_subprocess
+from src.metrics import Counter, Histogram
+
+YTDLP_CALLS = Counter(
+    "shadowing_ytdlp_calls_total", "yt-dlp invocations by operation and outcome",
+    ("operation", "status"))
+YTDLP_SECONDS = Histogram(
+    "shadowing_ytdlp_duration_seconds", "yt-dlp wall-clock time by operation",
+    ("operation",))
+
+
+def run_ytdlp(operation: str, args: list, text: bool = True):
+    """Runs yt-dlp with `args`, capturing its output and recording call metrics.
+
+    Args:
+        operation (str): Metric label for the kind of call, e.g. "list_subs".
+        args (list): Arguments after the "yt-dlp" program name.
+        text (bool): Decode stdout and stderr.
+
+    Returns:
+        subprocess.CompletedProcess
+    """
+    start = time.perf_counter()
+    result = run_subprocess(["yt-dlp", *args], capture_output=True, text=text)
+    YTDLP_SECONDS.observe(time.perf_counter() - start, operation=operation)
+    YTDLP_CALLS.inc(operation=operation, status="ok" if result.returncode == 0 else "error")
+    return result
@@ -15,12 +15,27 @@ export async function uploadVideo(file: File) {
   return data.captions; // 배열 형태
 }
 
-export async function transcribeYoutube(url: string) {
-  const res = await fetch("http://localhost:8000/transcribe-youtube", {
+// Caption lookups try GET first, which only answers from the server's cache,
+// so the browser can store the response and revalidate it with
+// If-None-Match. A 404 means the captions do not exist yet, and the same
+// request is POSTed to create them.
+async function fetchCaptions(path: string, params: Record<string, string | number>) {
+  const query = new URLSearchParams();
+  Object.entries(params).forEach(([key, value]) => query.set(key, String(value)));
+  const res = await fetch(`http://localhost:8000/${path}?${query}`);
+  if (res.status !== 404) {
+    return res;
+  }
+
+  return fetch(`http://localhost:8000/${path}`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ url }),
+    body: JSON.stringify(params),
   });
+}
+
+export async function transcribeYoutube(url: string) {
+  const res = await fetchCaptions("transcribe-youtube", { url });
 
   if (!res.ok) {
     throw new Error("Failed to transcribe YouTube video");
@@ -31,11 +46,7 @@ export async function transcribeYoutube(url: string) {
 }
 
 export async function extractYoutubeCaptionsOnly(url: string) {
-  const res = await fetch("http://localhost:8000/extract-youtube-captions", {
-    method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ url }),
-  });
+  const res = await fetchCaptions("extract-youtube-captions", { url });
 
   if (!res.ok) {
     throw new Error("Failed to extract YouTube captions");
@@ -54,14 +65,10 @@ export async function extractYoutubeCaptionsWithDuration(
   url: string,
   minDuration: number
 ) {
-  const res = await fetch(
-    "http://localhost:8000/extract-youtube-captions-with-duration",
-    {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ url, min_duration: minDuration }),
-    }
-  );
+  const res = await fetchCaptions("extract-youtube-captions-with-duration", {
+    url,
+    min_duration: minDuration,
+  });
 
   if (!res.ok) {
     throw new Error("Failed to extract YouTube captions");
@@ -77,10 +84,9 @@ export async function extractYoutubeCaptionsWithDuration(
 }
 
 export async function smartExtractCaptions(url: string, minDuration: number) {
-  const res = await fetch("http://localhost:8000/smart-extract-captions", {
-    method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ url, min_duration: minDuration }),
+  const res = await fetchCaptions("smart-extract-captions", {
+    url,
+    min_duration: minDuration,
   });
 
   if (!res.ok) {